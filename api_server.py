@@ -0,0 +1,384 @@
+# api_server.py — headless HTTP API for StudyMate (asyncio, stdlib only)
+# ----------------------------------------------------------
+#   python api_server.py --port 8080
+#
+#  POST /v1/summarize   {text, mode?, target_words?, max_chars_input?, timeout_s?, stream?}
+#  POST /v1/mcq         {text, num_questions?, seed?, llm?, stream?}
+#  POST /v1/flashcards  {text, num_cards?, llm?, stream?}
+#  POST /v1/deadlines   {text, llm?}
+#  POST /v1/report      {notes, topic?, max_sources?, target_words?, stream?}
+#  POST /v1/query       {question, text, k?, llm?}          (RAG over the given text)
+#  GET  /healthz, GET /metrics (JSON), GET /metrics/prometheus (text exposition, see metrics.py)
+#
+#  - same result / LLM / article caches and model registry as the Streamlit app
+#  - request body limit (STUDYMATE_API_MAX_BODY_MB), per-endpoint concurrency limits
+#    (STUDYMATE_API_LIMITS="summarize=4,report=2,..."); a request that can't get a slot
+#    within STUDYMATE_API_QUEUE_S gets 503
+#  - stream=true: chunked transfer; text/plain deltas for summaries, NDJSON events otherwise
+
+import os, re, json, time, asyncio, threading
+from concurrent.futures import ThreadPoolExecutor
+from collections import defaultdict, deque
+from typing import Any, Callable, Dict, Iterator, Optional, Tuple
+
+MAX_BODY = int(float(os.getenv("STUDYMATE_API_MAX_BODY_MB", "10")) * 1024 * 1024)
+QUEUE_TIMEOUT_S = float(os.getenv("STUDYMATE_API_QUEUE_S", "30"))
+KEEPALIVE_S = 15.0
+
+_DEFAULT_LIMITS = {"summarize": 4, "mcq": 4, "flashcards": 4, "deadlines": 4, "report": 2, "query": 2}
+
+def _limits() -> Dict[str, int]:
+    out = dict(_DEFAULT_LIMITS)
+    for part in os.getenv("STUDYMATE_API_LIMITS", "").split(","):
+        name, _, n = part.partition("=")
+        if name.strip() in out and n.strip().isdigit():
+            out[name.strip()] = max(1, int(n))
+    return out
+
+class HTTPError(Exception):
+    def __init__(self, status: int, message: str):
+        super().__init__(message)
+        self.status = status
+
+_REASONS = {200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed",
+            413: "Payload Too Large", 500: "Internal Server Error", 503: "Service Unavailable"}
+
+# =========================
+# Metrics
+# =========================
+class _Metrics:
+    def __init__(self):
+        self.started = time.time()
+        self.lock = threading.Lock()
+        self.requests = defaultdict(int)              # (endpoint, status) -> count
+        self.latency = defaultdict(lambda: deque(maxlen=500))
+        self.in_flight = defaultdict(int)
+        self.rejected = defaultdict(int)
+
+    def observe(self, endpoint: str, status: int, dt: float):
+        with self.lock:
+            self.requests[(endpoint, status)] += 1
+            self.latency[endpoint].append(dt)
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self.lock:
+            lat = {}
+            for ep, xs in self.latency.items():
+                s = sorted(xs)
+                lat[ep] = {"n": len(s), "p50_s": round(s[len(s) // 2], 4),
+                           "p95_s": round(s[min(len(s) - 1, int(len(s) * 0.95))], 4)}
+            return {
+                "uptime_s": round(time.time() - self.started, 1),
+                "requests": {f"{ep} {st}": n for (ep, st), n in sorted(self.requests.items())},
+                "latency": lat,
+                "in_flight": dict(self.in_flight),
+                "rejected_busy": dict(self.rejected),
+            }
+
+METRICS = _Metrics()
+
+# =========================
+# Endpoint handlers (run in worker threads)
+# =========================
+def _text(body: Dict[str, Any], key: str = "text") -> str:
+    text = body.get(key)
+    if not isinstance(text, str) or not text.strip():
+        raise HTTPError(400, f"'{key}' (non-empty string) is required")
+    return text
+
+def _summarize(body):
+    from result_cache import cached_summary
+    text = re.sub(r"\s+", " ", _text(body)).strip()
+    mode = body.get("mode", "extractive")
+    if mode not in ("extractive", "neural", "llm"):
+        raise HTTPError(400, "mode must be extractive | neural | llm")
+    args = dict(mode=mode, target_words=int(body.get("target_words", 150)),
+                max_chars_input=int(body.get("max_chars_input", 12000)), timeout_s=float(body.get("timeout_s", 25)))
+    if body.get("stream") and mode == "llm":
+        from nlp_tasks import summarize_stream
+        return "text", summarize_stream(text, **args)
+    return "json", cached_summary(text, **args)
+
+def _mcq(body):
+    from result_cache import cached_mcq
+    text = re.sub(r"\s+", " ", _text(body))
+    n, seed, llm = int(body.get("num_questions", 6)), int(body.get("seed", 42)), bool(body.get("llm", False))
+    if body.get("stream") and llm:
+        from nlp_tasks import stream_mcq_llm
+        return "ndjson", ({"type": "question", **q} for q in stream_mcq_llm(text, num_questions=n, seed=seed))
+    return "json", {"questions": cached_mcq(text, n, seed, llm=llm)}
+
+def _flashcards(body):
+    from result_cache import cached_flashcards
+    text = _text(body)
+    n, llm = int(body.get("num_cards", 6)), bool(body.get("llm", False))
+    if body.get("stream") and llm:
+        from nlp_tasks import stream_flashcards_llm
+        return "ndjson", ({"type": "card", **c} for c in stream_flashcards_llm(text, num_cards=n))
+    cards = cached_flashcards(text, n, llm=llm)
+    # local generator returns [q, a] pairs; normalize to the LLM shape
+    return "json", {"cards": [c if isinstance(c, dict) else {"question": c[0], "answer": c[1]} for c in cards]}
+
+def _deadlines(body):
+    from result_cache import cached_deadlines
+    return "json", {"deadlines": cached_deadlines(_text(body), llm=bool(body.get("llm", False)))}
+
+def _report(body):
+    from nlp_tasks import make_report_llm, stream_report_llm
+    notes = _text(body, "notes")
+    args = dict(topic=body.get("topic") or None, max_sources=int(body.get("max_sources", 5)),
+                target_words=int(body.get("target_words", 1200)))
+    if body.get("stream"):
+        def _events():
+            sources, deltas = stream_report_llm(notes, **args)
+            yield {"type": "sources", "sources": sources}
+            for d in deltas:
+                yield {"type": "delta", "text": d}
+        return "ndjson", _events()
+    return "json", make_report_llm(notes, **args)
+
+def _query(body):
+    import numpy as np
+    from precompute import chunk_embeddings, EMBED_MODEL
+    from model_registry import get_service
+    question, text = _text(body, "question"), _text(body)
+    k = max(1, min(20, int(body.get("k", 4))))
+    chunks, embs = chunk_embeddings(text)
+    if not chunks:
+        return "json", {"answer": "", "contexts": []}
+    q = get_service().embed(EMBED_MODEL, [question], normalize=True)[0]
+    scores = embs @ q
+    top = np.argsort(-scores)[:k]
+    contexts = [{"text": chunks[i], "score": round(float(scores[i]), 4)} for i in top]
+    ctx = "\n\n".join(c["text"] for c in contexts)
+    if body.get("llm"):
+        from nlp_tasks import _call_llm_text
+        answer = _call_llm_text("Answer concisely using ONLY the context. Say so if the context doesn't contain it.",
+                                f"Context:\n{ctx}\n\nQuestion: {question}", max_output_tokens=400, site="query")
+    else:
+        from qa import T5Answerer
+        answer = T5Answerer().answer(question, [c["text"] for c in contexts])
+    return "json", {"answer": answer, "contexts": contexts}
+
+ROUTES: Dict[str, Tuple[str, Callable[[Dict[str, Any]], Tuple[str, Any]]]] = {
+    "/v1/summarize": ("summarize", _summarize),
+    "/v1/mcq": ("mcq", _mcq),
+    "/v1/flashcards": ("flashcards", _flashcards),
+    "/v1/deadlines": ("deadlines", _deadlines),
+    "/v1/report": ("report", _report),
+    "/v1/query": ("query", _query),
+}
+
+def _traced(name: str, handler, payload: Dict[str, Any]):
+    """Run a handler as the root span of its request trace."""
+    import metrics
+    with metrics.span(f"api.{name}"):
+        return handler(payload)
+
+def _metrics_payload() -> Dict[str, Any]:
+    out = {"api": METRICS.snapshot()}
+    for name, fn in (("llm", "llm_client:metrics_snapshot"), ("results", "result_cache:RESULTS.stats"),
+                     ("models", "model_registry:REGISTRY.stats"), ("tokens", "token_budget:report"),
+                     ("pipeline", "metrics:snapshot"), ("slowest_stages", "metrics:slowest_stages"),
+                     ("preload", "lazy_imports:preload_status"), ("dedup", "dedup:report")):
+        mod, _, attr = fn.partition(":")
+        try:
+            obj = __import__(mod)
+            for a in attr.split("."):
+                obj = getattr(obj, a)
+            out[name] = obj()
+        except Exception as e:
+            out[name] = {"error": f"{type(e).__name__}: {e}"}
+    return out
+
+# =========================
+# HTTP plumbing
+# =========================
+class Server:
+    def __init__(self, limits: Optional[Dict[str, int]] = None):
+        self.limits = limits or _limits()
+        self.sems: Dict[str, asyncio.Semaphore] = {}
+        self.executor = ThreadPoolExecutor(max_workers=sum(self.limits.values()) + 2, thread_name_prefix="api")
+
+    async def _read_request(self, reader: asyncio.StreamReader):
+        line = await asyncio.wait_for(reader.readline(), KEEPALIVE_S)
+        if not line:
+            return None
+        try:
+            method, target, version = line.decode("latin-1").split()
+        except ValueError:
+            raise HTTPError(400, "malformed request line")
+        headers = {}
+        while True:
+            h = await reader.readline()
+            if h in (b"\r\n", b"\n", b""):
+                break
+            k, _, v = h.decode("latin-1").partition(":")
+            headers[k.strip().lower()] = v.strip()
+        n = int(headers.get("content-length") or 0)
+        if n > MAX_BODY:
+            raise HTTPError(413, f"body larger than {MAX_BODY} bytes")
+        body = await reader.readexactly(n) if n else b""
+        return method.upper(), target.split("?", 1)[0], version, headers, body
+
+    @staticmethod
+    def _head(status: int, ctype: str, extra: str = "") -> bytes:
+        return (f"HTTP/1.1 {status} {_REASONS.get(status, 'OK')}\r\nContent-Type: {ctype}\r\n"
+                f"Connection: keep-alive\r\n{extra}").encode("latin-1")
+
+    async def _send_json(self, writer, status: int, payload: Any):
+        data = json.dumps(payload, ensure_ascii=False, default=str).encode("utf-8")
+        writer.write(self._head(status, "application/json; charset=utf-8", f"Content-Length: {len(data)}\r\n\r\n") + data)
+        await writer.drain()
+
+    async def _send_stream(self, writer, kind: str, it: Iterator[Any]):
+        """Drain a blocking iterator in a worker thread and forward each item as an HTTP chunk."""
+        loop = asyncio.get_running_loop()
+        q: asyncio.Queue = asyncio.Queue(maxsize=64)
+        stop = threading.Event()
+        DONE = object()
+
+        def _put(item):
+            asyncio.run_coroutine_threadsafe(q.put(item), loop).result()
+
+        def _pump():
+            try:
+                for item in it:
+                    if stop.is_set():          # client went away: stop pulling from the backend
+                        break
+                    _put(item)
+            except Exception as e:
+                _put(e)
+            finally:
+                close = getattr(it, "close", None)
+                if close:
+                    close()
+                _put(DONE)
+
+        ctype = "text/plain; charset=utf-8" if kind == "text" else "application/x-ndjson"
+        writer.write(self._head(200, ctype, "Transfer-Encoding: chunked\r\n\r\n"))
+        fut = loop.run_in_executor(self.executor, _pump)
+        try:
+            while True:
+                item = await q.get()
+                if item is DONE:
+                    break
+                if isinstance(item, Exception):
+                    item = {"type": "error", "error": f"{type(item).__name__}: {item}"}
+                    kind = "ndjson"
+                data = (item if kind == "text" else json.dumps(item, ensure_ascii=False) + "\n").encode("utf-8")
+                if data:
+                    writer.write(f"{len(data):x}\r\n".encode() + data + b"\r\n")
+                    await writer.drain()
+            writer.write(b"0\r\n\r\n")
+            await writer.drain()
+        finally:
+            stop.set()
+            while not fut.done():              # unblock a pump waiting on a full queue
+                try:
+                    q.get_nowait()
+                except asyncio.QueueEmpty:
+                    await asyncio.sleep(0.01)
+
+    async def _dispatch(self, writer, method: str, path: str, body: bytes) -> Tuple[str, int]:
+        if path == "/healthz":
+            await self._send_json(writer, 200, {"ok": True, "uptime_s": round(time.time() - METRICS.started, 1)})
+            return "healthz", 200
+        if path == "/metrics":
+            loop = asyncio.get_running_loop()
+            await self._send_json(writer, 200, await loop.run_in_executor(self.executor, _metrics_payload))
+            return "metrics", 200
+        if path == "/metrics/prometheus":
+            import metrics
+            data = metrics.prometheus_text().encode("utf-8")
+            writer.write(self._head(200, "text/plain; version=0.0.4; charset=utf-8",
+                                    f"Content-Length: {len(data)}\r\n\r\n") + data)
+            await writer.drain()
+            return "metrics", 200
+        if path not in ROUTES:
+            raise HTTPError(404, f"no route {path}")
+        name, handler = ROUTES[path]
+        if method != "POST":
+            raise HTTPError(405, "use POST with a JSON body")
+        try:
+            payload = json.loads(body or b"{}")
+            assert isinstance(payload, dict)
+        except Exception:
+            raise HTTPError(400, "body must be a JSON object")
+
+        sem = self.sems.setdefault(name, asyncio.Semaphore(self.limits.get(name, 2)))
+        try:
+            await asyncio.wait_for(sem.acquire(), QUEUE_TIMEOUT_S)
+        except asyncio.TimeoutError:
+            METRICS.rejected[name] += 1
+            raise HTTPError(503, f"{name} is at its concurrency limit ({self.limits.get(name)}); retry later")
+        METRICS.in_flight[name] += 1
+        try:
+            loop = asyncio.get_running_loop()
+            try:
+                kind, result = await loop.run_in_executor(self.executor, _traced, name, handler, payload)
+            except (ValueError, TypeError) as e:          # int("abc") etc. in request fields
+                raise HTTPError(400, f"bad request field: {e}")
+            if kind == "json":
+                await self._send_json(writer, 200, result)
+            else:
+                await self._send_stream(writer, kind, result)
+            return name, 200
+        finally:
+            METRICS.in_flight[name] -= 1
+            sem.release()
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            while True:
+                t0 = time.perf_counter()
+                endpoint, status = "?", 500
+                try:
+                    req = await self._read_request(reader)
+                    if req is None:
+                        break
+                    method, path, _, headers, body = req
+                    endpoint = ROUTES[path][0] if path in ROUTES else path.strip("/") or "/"
+                    endpoint, status = await self._dispatch(writer, method, path, body)
+                    if headers.get("connection", "").lower() == "close":
+                        break
+                except HTTPError as e:
+                    status = e.status
+                    await self._send_json(writer, e.status, {"error": str(e)})
+                    if e.status in (400, 413):
+                        break            # request framing may be off; don't reuse the connection
+                except (asyncio.TimeoutError, asyncio.IncompleteReadError, ConnectionError):
+                    break
+                except Exception as e:
+                    await self._send_json(writer, 500, {"error": f"{type(e).__name__}: {e}"})
+                finally:
+                    if endpoint != "?":
+                        METRICS.observe(endpoint, status, time.perf_counter() - t0)
+        finally:
+            try:
+                writer.close()
+                await writer.wait_closed()
+            except Exception:
+                pass
+
+async def serve(host: str = "127.0.0.1", port: int = 8080, ready: Optional[threading.Event] = None):
+    app = Server()
+    srv = await asyncio.start_server(app.handle, host, port, limit=2 ** 20)
+    print(f"StudyMate API on http://{host}:{port}  limits={app.limits}")
+    if ready is not None:
+        ready.set()
+    import lazy_imports
+    lazy_imports.start_preload()        # listening: warm heavy libraries off the request path
+    async with srv:
+        await srv.serve_forever()
+
+if __name__ == "__main__":
+    import argparse
+    ap = argparse.ArgumentParser(description="Headless StudyMate HTTP API.")
+    ap.add_argument("--host", default="127.0.0.1")
+    ap.add_argument("--port", type=int, default=8080)
+    args = ap.parse_args()
+    try:
+        asyncio.run(serve(args.host, args.port))
+    except KeyboardInterrupt:
+        pass
@@ -6,17 +6,17 @@
 
 # app.py — StudyMate (page functions to prevent bleed)
 import streamlit as st
-import re, os, tempfile
-from datetime import datetime
+import re, os
+import tts
+import metrics
+import lazy_imports
 from ui_utils import load_css, uploader_block
-from nlp_tasks import (
-    summarize,
-    make_mcq, make_mcq_llm,
-    make_flashcards, make_flashcards_llm,
-    extract_deadlines, extract_deadlines_llm,
-    make_report_llm, save_report_pdf  
-
+from nlp_tasks import make_flashcards, stream_flashcards_llm
+from quiz_report import infer_topic_from_question, build_quiz_pdf_bytes
+from result_cache import (
+    RESULTS, cached_summary, cached_mcq, cached_flashcards, cached_deadlines, flashcards_key
 )
+from jobs import JOBS, summary_job, report_job, quiz_job
 
 # ---------------- Page Config ----------------
 st.set_page_config(page_title="StudyMate — NLP Toolkit", page_icon="🧠", layout="wide")
@@ -24,158 +24,83 @@ load_css()
 
 # ---------------- TTS helpers ----------------
 def tts_say(text: str, filename_prefix: str = "voice"):
-    """gTTS → MP3 (simple)"""
-    if not text or not text.strip():
-        return None
+    """gTTS → MP3 bytes (cached by text)"""
     try:
-        from gtts import gTTS
-        mp3_path = os.path.join(tempfile.gettempdir(), f"{filename_prefix}_{next(tempfile._get_candidate_names())}.mp3")
-        gTTS(text.strip(), lang="en").save(mp3_path)
-        return mp3_path
+        return tts.synthesize(text, engine="gtts")
     except Exception as e:
         st.error(f"TTS failed: {e}")
         return None
 
 def tts_say_single_wav(text: str, fname_prefix: str = "summary_onefile"):
-    """pyttsx3 → single WAV (offline, no chunking)"""
-    if not text or not text.strip():
-        return None
+    """pyttsx3 → single WAV bytes (offline, shared engine, cached by text)"""
     try:
-        import pyttsx3
-        engine = pyttsx3.init()
-        engine.setProperty("rate", 180)
-        engine.setProperty("volume", 1.0)
-        wav_path = os.path.join(
-            tempfile.gettempdir(),
-            f"{fname_prefix}_{next(tempfile._get_candidate_names())}.wav"
-        )
-        engine.save_to_file(text, wav_path)
-        engine.runAndWait()
-        return wav_path if os.path.exists(wav_path) else None
+        return tts.synthesize(text, engine="pyttsx3")
     except Exception as e:
         st.error(f"TTS failed: {e}")
         return None
 
-# ---------------- Quiz helpers ----------------
-def infer_topic_from_question(q: str) -> str:
-    toks = re.findall(r"[A-Za-z][A-Za-z\-']+", q or "")
-    stop = {
-        "the","a","an","and","or","but","if","while","with","into","onto","from","of","in","on","for","to",
-        "is","are","was","were","be","been","being","this","that","these","those","it","its","their","his",
-        "her","your","our","they","you","we","as","at","by","not","no","do","does","did","so","such","than",
-        "then","there","here","over","under","between","within","without","about","above","below","out"
-    }
-    toks = [t for t in toks if t.lower() not in stop]
-    return " ".join(toks[:3]) if toks else "General"
-
-def build_quiz_pdf(student_name: str, qs, answers_map, out_name="StudyMate_Quiz_Report.pdf"):
-    """
-    Detailed PDF:
-     • Overall correct/wrong bar
-     • Topic-wise accuracy bar
-     • Summary of strong/weak topics
-     • Question review
-    """
-    from collections import defaultdict
-    import matplotlib.pyplot as plt
-    from reportlab.pdfgen import canvas
-    from reportlab.lib.pagesizes import A4
-    from reportlab.lib.units import cm
-
-    # --- compute stats ---
-    total = len(qs)
-    correct, wrong = 0, 0
-    topic_stats = defaultdict(lambda: {"correct": 0, "total": 0})
-    q_review = []  # (qtext, your, corr, right, topic)
-
-    for i, q in enumerate(qs, start=1):
-        topic = q.get("topic") or infer_topic_from_question(q["question"])
-        your_ans = answers_map.get(f"q_{i}")
-        right = (your_ans == q["answer"])
-        topic_stats[topic]["total"] += 1
-        if right:
-            topic_stats[topic]["correct"] += 1
-            correct += 1
-        else:
-            wrong += 1
-        q_review.append((q["question"], your_ans or "—", q["answer"], right, topic))
-        q["topic"] = topic
-
-    # --- graphs ---
-    tmp = tempfile.gettempdir()
-    chart_overall = os.path.join(tmp, f"quiz_overall_{next(tempfile._get_candidate_names())}.png")
-    chart_topics  = os.path.join(tmp, f"quiz_topics_{next(tempfile._get_candidate_names())}.png")
-
-    # overall correct/wrong
-    plt.figure(figsize=(3.8, 3))
-    plt.bar(["Correct", "Wrong"], [correct, wrong], color=["#43e97b", "#ff758c"])
-    plt.title("Overall Performance")
-    plt.tight_layout()
-    plt.savefig(chart_overall, dpi=150)
-    plt.close()
-
-    # per-topic accuracy
-    topics = list(topic_stats.keys())
-    acc = [round(100 * v["correct"] / v["total"], 1) for v in topic_stats.values()]
-    plt.figure(figsize=(5, 3.5))
-    plt.barh(topics, acc, color="#00c6ff")
-    plt.xlabel("Accuracy (%)")
-    plt.title("Topic-wise Accuracy")
-    plt.tight_layout()
-    plt.savefig(chart_topics, dpi=150)
-    plt.close()
-
-    # summaries
-    strong = [t for t, v in topic_stats.items() if v["correct"] / v["total"] >= 0.8]
-    weak   = [t for t, v in topic_stats.items() if v["correct"] / v["total"] < 0.5]
-    summary_txt = []
-    if strong: summary_txt.append(f"Strong topics: {', '.join(strong)}.")
-    if weak:   summary_txt.append(f"Needs improvement: {', '.join(weak)}.")
-    if not summary_txt: summary_txt.append("Performance balanced across topics.")
-    summary_txt = " ".join(summary_txt)
-
-    # --- PDF write ---
-    pdf_path = os.path.join(tmp, out_name)
-    c = canvas.Canvas(pdf_path, pagesize=A4)
-    W, H = A4
-    x, y = 2*cm, H - 2*cm
-
-    c.setFont("Helvetica-Bold", 16); c.drawString(x, y, "StudyMate — Quiz Performance Report")
-    y -= 20
-    c.setFont("Helvetica", 11)
-    c.drawString(x, y, f"Student: {student_name or '—'}"); y -= 14
-    c.drawString(x, y, f"Date: {datetime.now().strftime('%Y-%m-%d %H:%M')}"); y -= 18
-    c.setFont("Helvetica-Bold", 12); c.drawString(x, y, f"Score: {correct}/{total}  ({round(100*correct/total,1)}%)"); y -= 18
-
-    # charts
+def tts_progressive(text: str, slot):
+    """pyttsx3 in sentence chunks: the opening plays in `slot` while the rest renders → full WAV bytes"""
+    def _first(audio: bytes):
+        with slot.container():
+            st.caption("Playing the opening while the rest is rendered…")
+            st.audio(audio, format="audio/wav", autoplay=True)
     try:
-        c.drawImage(chart_overall, x, y-7*cm, width=8*cm, height=6*cm, preserveAspectRatio=True); y -= 7*cm + 12
-    except: pass
-    try:
-        c.drawImage(chart_topics,  x, y-7*cm, width=10*cm, height=6*cm, preserveAspectRatio=True); y -= 7*cm + 16
-    except: pass
-
-    c.setFont("Helvetica-Bold", 12); c.drawString(x, y, "Summary:"); y -= 14
-    c.setFont("Helvetica", 11)
-    for line in summary_txt.split(". "):
-        c.drawString(x, y, line.strip()); y -= 14
-        if y < 3*cm: c.showPage(); y = H - 3*cm; c.setFont("Helvetica", 11)
-
-    # question review
-    c.showPage(); y = H - 2*cm
-    c.setFont("Helvetica-Bold", 14); c.drawString(x, y, "Question Review"); y -= 18
-    c.setFont("Helvetica", 10)
-    for qtext, your, corr, right, topic in q_review:
-        mark = "✅" if right else "❌"
-        line = f"{mark} {topic} | Your: {your} | Ans: {corr}"
-        for seg in [qtext, line]:
-            for chunk in [seg[i:i+95] for i in range(0, len(seg), 95)]:
-                c.drawString(x, y, chunk); y -= 12
-                if y < 3*cm: c.showPage(); y = H - 2*cm; c.setFont("Helvetica", 10)
-        y -= 8
-
-    c.save()
-    return pdf_path
+        return tts.synthesize_progressive(text, on_first=_first, engine="pyttsx3")
+    except Exception as e:
+        st.error(f"TTS failed: {e}")
+        return None
+
+def _speech_from_markdown(md: str) -> str:
+    md = re.sub(r"\[([^\]]*)\]\([^)]*\)", r"\1", md or "")     # [text](url) -> text
+    md = re.sub(r"^\s{0,3}(#+|[-*+]|\d+\.)\s+", "", md, flags=re.M)
+    return re.sub(r"[*_`>|]+", "", md)
+
+def _fc_speech(card, flipped: bool) -> str:
+    q, a = card
+    return f"Answer: {a}" if flipped else f"Question: {q}"
+
+# ---------------- Background jobs ----------------
+_fragment = getattr(st, "fragment", None) or st.experimental_fragment
+
+def start_job(slot: str, kind: str, fn, *args, **kwargs):
+    """Run fn on the shared job pool; only the job id lives in session_state (one job per slot)."""
+    ss = st.session_state
+    ss.setdefault("jobs", {})
+    JOBS.cancel(ss.jobs.get(slot))
+    ss.jobs[slot] = JOBS.submit(kind, fn, *args, owner=ss.get("session_id"), **kwargs)
+
+def job_panel(slot: str, title: str, on_done, render_partial=None):
+    """Progress + partial output for the slot's job, polled every second; on_done(result) when finished."""
+    ss = st.session_state
+    errors = ss.setdefault("job_errors", {})
+    if slot in errors:
+        st.error(f"{title} failed: {errors.pop(slot)}")
+    job = JOBS.get(ss.get("jobs", {}).get(slot))
+    if job is None:
+        ss.get("jobs", {}).pop(slot, None)
+        return
+
+    @_fragment(run_every=1.0)
+    def _panel():
+        snap = job.snapshot()
+        if job.done:
+            ss.jobs.pop(slot, None)
+            if job.status == "done":
+                on_done(job.result)
+            elif job.status == "failed":
+                errors[slot] = snap["error"]
+            st.rerun()
+        pct = snap["fraction"]
+        label = "waiting for a free worker…" if snap["status"] == "queued" else snap["stage"]
+        st.progress(pct, text=f"{title}: {label} ({snap['elapsed_s']:.0f}s)")
+        if render_partial and snap["partial"]:
+            render_partial(snap["partial"])
+        if st.button("✖ Cancel", key=f"cancel_{slot}"):
+            JOBS.cancel(job.id)
+            ss.jobs.pop(slot, None)
+            st.rerun()
+    _panel()
 
 # ---------------- State: current page ----------------
 if "page" not in st.session_state:
@@ -185,11 +110,18 @@ if "page" not in st.session_state:
 if "page" in st.query_params:
     st.session_state.page = st.query_params["page"]
 
+if "session_id" not in st.session_state:
+    import uuid
+    st.session_state.session_id = uuid.uuid4().hex
+
 # ---------------- Sidebar: Student ----------------
 st.sidebar.header("👤 Student")
 student_name = st.sidebar.text_input("Your name", value=st.session_state.get("student_name", ""))
 if student_name != st.session_state.get("student_name"):
     st.session_state["student_name"] = student_name
+_running = JOBS.active(owner=st.session_state.session_id)
+if _running:
+    st.sidebar.caption("⏳ Working in the background: " + ", ".join(f"{j['kind']} ({j['stage']})" for j in _running))
 
 # ---------------- Top Nav CSS ----------------
 st.markdown("""
@@ -256,6 +188,24 @@ def render_home():
       </p>
     </div>
     """, unsafe_allow_html=True)
+    with st.expander("⚡ Result cache"):
+        st.json(RESULTS.stats())
+    debug_panel()
+
+def debug_panel(n_requests: int = 20):
+    """Slowest stages of the last requests (STUDYMATE_METRICS=1; memory columns with STUDYMATE_MEMPROFILE=1)."""
+    if not metrics.enabled():
+        return
+    with st.expander("🐞 Debug: slowest stages"):
+        traces = metrics.recent_traces(n_requests)
+        if not traces:
+            st.caption("No requests traced yet.")
+            return
+        st.caption(f"Last {len(traces)} requests")
+        st.dataframe(metrics.slowest_stages(n_requests), use_container_width=True, hide_index=True)
+        for t in reversed(traces[-5:]):
+            st.markdown(f"**{t['name']}** — {t['duration_s']:.2f}s" + (f" ({t['error']})" if t["error"] else ""))
+            st.code(metrics.format_trace(t))
 
 def render_summarize():
     st.header("📄 Summarizer")
@@ -263,7 +213,7 @@ def render_summarize():
         st.header("Summarizer Settings")
         engine_choice = st.radio("Engine", ["extractive (instant)", "neural (abstractive)", "llm (OpenAI)"], index=0)
         target_words = st.slider("Target words (for neural/llm)", 80, 400, 150, 10)
-        max_chars_input = st.slider("Max input size", 4000, 20000, 12000, 1000)
+        max_chars_input = st.slider("Max input size (extractive/neural)", 4000, 20000, 12000, 1000)
         timeout_s = st.slider("Timeout (s)", 10, 60, 25, 5)
 
         st.markdown("---")
@@ -277,10 +227,11 @@ def render_summarize():
     # persistent summary + report
     ss = st.session_state
     ss.setdefault("summary_text", "")
-    ss.setdefault("summary_audio_path", None)
+    ss.setdefault("summary_audio", None)
     ss.setdefault("report_md", "")
-    ss.setdefault("report_pdf_path", None)
+    ss.setdefault("report_pdf", None)
     ss.setdefault("report_sources", [])
+    ss.setdefault("report_audio", None)
 
     # --- Summarize ---
     if st.button("✨ Summarize", type="primary"):
@@ -289,16 +240,25 @@ def render_summarize():
         else:
             clean = re.sub(r"\s+", " ", text).strip()
             mode = "llm" if engine_choice.startswith("llm") else ("neural" if engine_choice.startswith("neural") else "extractive")
-            with st.spinner("Summarizing…"):
-                out = summarize(
-                    text=clean,
+            if mode == "extractive":
+                out = cached_summary(
+                    clean,
                     mode=mode,
                     target_words=target_words,
                     max_chars_input=max_chars_input,
                     timeout_s=float(timeout_s),
                 )
-            ss.summary_text = out["summary"] or "(No output)"
-            ss.summary_audio_path = None
+                ss.summary_text = out["summary"] or "(No output)"
+                ss.summary_audio = None
+            else:
+                # neural / LLM run in the background: reruns and page switches don't interrupt them
+                start_job("summary", "summary", summary_job, clean, mode, int(target_words),
+                          int(max_chars_input), float(timeout_s))
+
+    def _summary_done(out):
+        ss.summary_text = (out.get("summary") or "").strip() or "(No output)"
+        ss.summary_audio = None
+    job_panel("summary", "Summary", _summary_done, render_partial=lambda txt: st.markdown(txt))
 
     if ss.summary_text:
         st.subheader("Summary")
@@ -313,14 +273,15 @@ def render_summarize():
         with c2:
             clear_voice = st.button("🗑️ Clear Voice")
         if clear_voice:
-            st.session_state.summary_audio_path = None
+            st.session_state.summary_audio = None
             st.rerun()
         if make_voice:
+            first_slot = st.empty()
             with st.spinner("Generating voice…"):
-                path = tts_say_single_wav(ss.summary_text, "summary_onefile")
-            if path: ss.summary_audio_path = path
-        if ss.summary_audio_path:
-            st.audio(ss.summary_audio_path)
+                audio = tts_progressive(ss.summary_text, first_slot)
+            if audio: ss.summary_audio = audio
+        if ss.summary_audio:
+            st.audio(ss.summary_audio, format="audio/wav")
     else:
         st.info("Upload/paste text and click **Summarize** to see your summary here.")
 
@@ -336,8 +297,9 @@ def render_summarize():
 
     if clear_report:
         ss.report_md = ""
-        ss.report_pdf_path = None
+        ss.report_pdf = None
         ss.report_sources = []
+        ss.report_audio = None
         st.rerun()
 
     if build_report:
@@ -345,27 +307,18 @@ def render_summarize():
         if not base_notes:
             st.warning("Upload a PDF or paste notes before building the report.")
         else:
-            with st.spinner("Researching + drafting report…"):
-                result = make_report_llm(
-                    base_notes,
-                    topic=(topic_hint or None),
-                    max_sources=int(max_sources),
-                    target_words=int(report_words),
-                )
-            ss.report_md = result.get("report_md", "")
-            ss.report_sources = result.get("sources", [])
-            # save PDF
-            
-            if ss.report_md:
-                try:
-                    with tempfile.NamedTemporaryFile(delete=False, suffix=".pdf") as tmp:
-                        pdf_path = tmp.name
-                    save_report_pdf(ss.report_md, pdf_path)
-                    ss.report_pdf_path = pdf_path
-                    st.success("Report ready.")
-                except Exception as e:
-                    ss.report_pdf_path = None
-                    st.error(f"Failed to generate PDF: {e}")
+            start_job("report", "report", report_job, base_notes, topic_hint or None,
+                      int(max_sources), int(report_words))
+
+    def _report_done(res):
+        ss.report_md = res.get("report_md", "")
+        ss.report_sources = res.get("sources", [])
+        ss.report_pdf = res.get("pdf")
+        ss.report_audio = None
+    def _report_partial(md):
+        st.markdown("#### Drafting…")
+        st.markdown(md)
+    job_panel("report", "Report", _report_done, render_partial=_report_partial)
 
     if ss.report_md:
         st.markdown("#### Preview")
@@ -376,14 +329,20 @@ def render_summarize():
             for i, s in enumerate(ss.report_sources, start=1):
                 st.markdown(f"{i}. [{s.get('title','source')}]({s.get('url','')})")
 
-        if ss.report_pdf_path:
-            with open(ss.report_pdf_path, "rb") as f:
-                st.download_button(
-                    "⬇️ Download Report (.pdf)",
-                    f.read(),
-                    file_name="StudyMate_Summary_Report.pdf",
-                    mime="application/pdf"
-                )
+        if ss.report_pdf:
+            st.download_button(
+                "⬇️ Download Report (.pdf)",
+                ss.report_pdf,
+                file_name="StudyMate_Summary_Report.pdf",
+                mime="application/pdf"
+            )
+
+        if st.button("🔊 Listen to Report", key="report_listen_btn"):
+            first_slot = st.empty()
+            with st.spinner("Generating voice…"):
+                ss.report_audio = tts_progressive(_speech_from_markdown(ss.report_md), first_slot)
+        if ss.report_audio:
+            st.audio(ss.report_audio, format="audio/wav")
 def render_quiz():
     st.header("🧩 Quiz")
     with st.sidebar:
@@ -394,22 +353,29 @@ def render_quiz():
 
     text, _ = uploader_block("📂 Upload / paste text for quiz")
 
+    def _quiz_ready(qs):
+        if not qs:
+            st.error("Could not generate questions. Try longer/cleaner text.")
+            return
+        for q in qs:
+            q["topic"] = infer_topic_from_question(q["question"])
+        st.session_state.quiz_qs = qs
+        st.session_state.quiz_answers = {}
+        st.session_state.quiz_pdf = None
+        st.success(f"Generated {len(qs)} questions.")
+
     if st.button("🧩 Generate Quiz", type="primary"):
         if not (text or "").strip():
             st.warning("Upload or paste text first.")
         else:
-            with st.spinner("Generating…"):
-                qs = make_mcq_llm(re.sub(r"\s+"," ", text), num_questions=int(num_q), seed=int(seed)) if use_llm \
-                     else make_mcq(re.sub(r"\s+"," ", text), num_questions=int(num_q), seed=int(seed))
-            if not qs:
-                st.error("Could not generate questions. Try longer/cleaner text.")
+            clean = re.sub(r"\s+"," ", text)
+            if use_llm:
+                start_job("quiz", "quiz", quiz_job, clean, int(num_q), int(seed))
             else:
-                for q in qs:
-                    q["topic"] = infer_topic_from_question(q["question"])
-                st.session_state.quiz_qs = qs
-                st.session_state.quiz_answers = {}
-                st.session_state.quiz_pdf_path = None
-                st.success(f"Generated {len(qs)} questions.")
+                _quiz_ready(cached_mcq(clean, num_questions=int(num_q), seed=int(seed)))
+
+    job_panel("quiz", "Quiz", _quiz_ready,
+              render_partial=lambda qs: st.markdown("\n".join(f"{i}. {x['question']}" for i, x in enumerate(qs, start=1))))
 
     if "quiz_qs" in st.session_state and st.session_state.quiz_qs:
         # Render questions
@@ -424,7 +390,7 @@ def render_quiz():
             st.session_state.quiz_answers[f"q_{i}"] = sel
             if st.button(f"🔊 Read Q{i}", key=f"read_q_{i}"):
                 mp3 = tts_say(f"Question {i}. {q['question']}. Options: {', '.join(q['options'])}", f"q_{i}")
-                if mp3: st.audio(mp3)
+                if mp3: st.audio(mp3, format="audio/mp3")
 
         # Controls row (kept strictly inside Quiz page)
         colA, colB, colC = st.columns([1,1,1])
@@ -440,7 +406,7 @@ def render_quiz():
                 if k.startswith("q_"): del st.session_state[k]
             st.session_state.pop("quiz_qs", None)
             st.session_state.pop("quiz_answers", None)
-            st.session_state.pop("quiz_pdf_path", None)
+            st.session_state.pop("quiz_pdf", None)
             st.rerun()
 
         def _all_answered():
@@ -467,27 +433,24 @@ def render_quiz():
                 st.warning("Please answer all questions before building the report.")
             else:
                 try:
-                    pdf_path = build_quiz_pdf(
+                    st.session_state.quiz_pdf = build_quiz_pdf_bytes(
                         student_name=st.session_state.get("student_name",""),
                         qs=st.session_state.quiz_qs,
                         answers_map=st.session_state.quiz_answers,
-                        out_name="StudyMate_Quiz_Report.pdf"
                     )
-                    st.session_state.quiz_pdf_path = pdf_path
                     st.success("Report generated.")
                 except Exception as e:
                     st.error(f"Failed to build PDF report: {e}")
-                    st.session_state.quiz_pdf_path = None
-
-        if st.session_state.get("quiz_pdf_path"):
-            with open(st.session_state.quiz_pdf_path, "rb") as f:
-                st.download_button(
-                    "⬇️ Download Quiz Report (.pdf)",
-                    f.read(),
-                    file_name="StudyMate_Quiz_Report.pdf",
-                    mime="application/pdf",
-                    key="quiz_pdf_download_btn"
-                )
+                    st.session_state.quiz_pdf = None
+
+        if st.session_state.get("quiz_pdf"):
+            st.download_button(
+                "⬇️ Download Quiz Report (.pdf)",
+                st.session_state.quiz_pdf,
+                file_name="StudyMate_Quiz_Report.pdf",
+                mime="application/pdf",
+                key="quiz_pdf_download_btn"
+            )
     else:
         st.info("Generate a quiz to begin.")
 
@@ -520,15 +483,24 @@ def render_flashcards():
     if "flashcards" not in ss: ss.flashcards = []
     if "idx" not in ss: ss.idx = 0
     if "flipped" not in ss: ss.flipped = False
-    if "fc_audio_path" not in ss: ss.fc_audio_path = None
+    if "fc_audio" not in ss: ss.fc_audio = None
 
     if st.button("🃏 Generate Flashcards", type="primary", key="fc_generate_btn"):
         if not (text or "").strip():
             st.warning("Upload or paste text first.")
         else:
             try:
-                raw_cards = make_flashcards_llm(text, num_cards=num_cards) if use_llm_fc \
-                            else make_flashcards(text, num_cards=num_cards)
+                fkey = flashcards_key(text, num_cards, use_llm_fc)
+                raw_cards = RESULTS.lookup("flashcards", fkey) if use_llm_fc else None
+                if raw_cards is None and use_llm_fc:
+                    raw_cards, live = [], st.empty()
+                    for c in stream_flashcards_llm(text, num_cards=num_cards):
+                        raw_cards.append(c)
+                        live.caption(f"Received {len(raw_cards)} / {num_cards} cards… latest: {c['question']}")
+                    live.empty()
+                    if raw_cards: RESULTS.store(fkey, raw_cards)
+                elif raw_cards is None:
+                    raw_cards = cached_flashcards(text, num_cards=num_cards)
             except TypeError:
                 raw_cards = make_flashcards(text, max_cards=num_cards)
             except Exception as e:
@@ -538,23 +510,20 @@ def render_flashcards():
             if not cards:
                 st.error("Could not generate flashcards. Try longer/cleaner text.")
             else:
-                ss.flashcards = cards; ss.idx = 0; ss.flipped = False; ss.fc_audio_path = None
+                ss.flashcards = cards; ss.idx = 0; ss.flipped = False; ss.fc_audio = None
                 st.success(f"Generated {len(cards)} flashcards.")
 
     def _clamp():
         if not ss.flashcards: ss.idx = 0; ss.flipped = False; return
         ss.idx = max(0, min(ss.idx, len(ss.flashcards)-1))
 
-    def _fc_first(): ss.idx = 0; ss.flipped = False; ss.fc_audio_path=None; _clamp()
-    def _fc_prev():  ss.idx -= 1; ss.flipped = False; ss.fc_audio_path=None; _clamp()
-    def _fc_flip():  ss.flipped = not ss.flipped; ss.fc_audio_path=None; _clamp()
-    def _fc_next():  ss.idx += 1; ss.flipped = False; ss.fc_audio_path=None; _clamp()
+    def _fc_first(): ss.idx = 0; ss.flipped = False; ss.fc_audio=None; _clamp()
+    def _fc_prev():  ss.idx -= 1; ss.flipped = False; ss.fc_audio=None; _clamp()
+    def _fc_flip():  ss.flipped = not ss.flipped; ss.fc_audio=None; _clamp()
+    def _fc_next():  ss.idx += 1; ss.flipped = False; ss.fc_audio=None; _clamp()
     def _fc_speak():
         if not ss.flashcards: return
-        q, a = ss.flashcards[ss.idx]
-        side = "Answer" if ss.flipped else "Question"
-        txt = f"{side}: {a if ss.flipped else q}"
-        path = tts_say_single_wav(txt, "flashcard_onefile"); ss.fc_audio_path = path
+        ss.fc_audio = tts_say_single_wav(_fc_speech(ss.flashcards[ss.idx], ss.flipped), "flashcard_onefile")
 
     cards = ss.flashcards
     if cards:
@@ -580,8 +549,12 @@ def render_flashcards():
         c5.button("🔊 Speak", key="fc_speak_btn", on_click=_fc_speak, use_container_width=True)
 
         st.caption(f"Card {ss.idx + 1} / {len(cards)}")
-        if ss.get("fc_audio_path"):
-            st.audio(ss.fc_audio_path, format="audio/wav")
+        # warm the audio cache for what is likely spoken next: this card's other side, the next card
+        tts.prefetch(_fc_speech(cards[ss.idx], not ss.flipped), engine="pyttsx3")
+        if ss.idx + 1 < len(cards):
+            tts.prefetch(_fc_speech(cards[ss.idx + 1], False), engine="pyttsx3")
+        if ss.get("fc_audio"):
+            st.audio(ss.fc_audio, format="audio/wav")
     else:
         st.info("No flashcards yet. Paste text above and click **Generate Flashcards**.")
 
@@ -610,7 +583,7 @@ def render_deadlines():
         else:
             with st.spinner("Finding dates…"):
                 try:
-                    dl = extract_deadlines_llm(text) if use_llm_dl else extract_deadlines(text)
+                    dl = cached_deadlines(text, llm=use_llm_dl)
                 except Exception as e:
                     st.error(f"Deadline extractor failed: {e}")
                     dl = []
@@ -652,7 +625,61 @@ def render_deadlines():
                     for i, d in enumerate(dl, start=1)
                 ) or "No deadlines found"
                 mp3 = tts_say(speak_txt, "deadlines")
-                if mp3: st.audio(mp3)
+                if mp3: st.audio(mp3, format="audio/mp3")
+
+    # --- Persistent index across all of this student's documents ---
+    st.markdown("---")
+    st.subheader("📚 All my deadlines")
+    owner = (st.session_state.get("student_name") or "").strip()
+    if not owner:
+        # the index is per student: without a name there is nobody to keep it for
+        st.info("Enter your name in the sidebar to keep an index of deadlines across your documents.")
+        return
+    from deadline_index import DeadlineIndex
+    idx = DeadlineIndex(owner=owner)
+    colD, colE = st.columns([2,1])
+    with colD:
+        doc_name = st.text_input("Document name (re-adding the same name updates it)", key="dl_doc_name",
+                                 placeholder=st.session_state.get("upload_name") or "e.g. CS101 syllabus")
+    with colE:
+        add_doc = st.button("➕ Add to my index", key="dl_index_add_btn")
+    if add_doc:
+        # the name is the document's id: it must survive edits and restarts
+        name = (doc_name or "").strip() or st.session_state.get("upload_name") or ""
+        if not (text or "").strip():
+            st.warning("Upload or paste text first.")
+        elif not name:
+            st.warning("Give the document a name first.")
+        else:
+            with st.spinner("Indexing changed parts…"):
+                res = idx.add_document(name, text, name=name)
+            st.success(f"Indexed '{name}': {res['extracted']} chunk(s) scanned, {res['reused']} reused.")
+    st.caption("Only dated deadlines are indexed; relative ones (\"Friday\", \"tomorrow\") stay in the list above.")
+
+    docs = idx.documents()
+    if docs:
+        colF, colG = st.columns([2,1])
+        with colF:
+            to_remove = st.selectbox("Indexed documents", [d["doc_id"] for d in docs], key="dl_index_doc",
+                                     format_func=lambda i: next(d["name"] for d in docs if d["doc_id"] == i))
+        with colG:
+            if st.button("🗑️ Remove from index", key="dl_index_remove_btn"):
+                idx.remove_document(to_remove)
+                st.rerun()
+
+    horizon = st.slider("Show deadlines due in the next N days", 1, 120, 7, 1, key="dl_index_days")
+    upcoming = idx.upcoming(days=int(horizon))
+    if not docs:
+        st.caption("No documents indexed yet.")
+    elif not upcoming:
+        st.info(f"Nothing due in the next {horizon} day(s).")
+    else:
+        for d in upcoming:
+            line = f"**{d['iso_date']}**" + (f" at **{d['time']}**" if d.get("time") else "") + f" — {d['match']}"
+            st.markdown(
+                f'<div class="card">{line}<br><span class="small-muted">{", ".join(d["documents"])}</span></div>',
+                unsafe_allow_html=True
+            )
 
 
 # ---------------- Dispatcher ----------------
@@ -666,3 +693,6 @@ elif choice == "Flashcards":
     render_flashcards()
 elif choice == "Deadlines":
     render_deadlines()
+
+# first paint is done: warm the heavy libraries in the background (STUDYMATE_PRELOAD)
+lazy_imports.start_preload()
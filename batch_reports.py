@@ -0,0 +1,217 @@
+# batch_reports.py — class-wide quiz reports (per-student PDFs + class summary)
+# ----------------------------------------------------------
+# Usage:
+#   python batch_reports.py --quiz quiz.json --answers answers.csv --out reports/
+#
+#  quiz.json    {"questions": [{"question","options","answer","topic"?}, ...]}  (or a bare list)
+#  answers.csv  student,q_1,q_2,...         (q_i = chosen option text)
+#  answers.jsonl {"student": "...", "answers": {"q_1": "...", ...}} per line
+#
+# Stats are computed with vectorized pandas per input chunk; PDFs are rendered
+# across a process pool with a bounded number of in-flight jobs, and written
+# straight to disk by the workers so memory stays flat for any class size.
+
+import os, re, sys, json, hashlib, argparse
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+import pandas as pd
+
+from quiz_report import infer_topic_from_question, render_quiz_pdf, summary_text
+
+CHUNK_ROWS = 500
+
+def load_quiz(path: str) -> List[Dict[str, Any]]:
+    with open(path, "r", encoding="utf-8") as f:
+        data = json.load(f)
+    qs = data.get("questions", []) if isinstance(data, dict) else data
+    for q in qs:
+        q["topic"] = q.get("topic") or infer_topic_from_question(q["question"])
+    return qs
+
+def _iter_answer_chunks(path: str, n_questions: int) -> Iterator[pd.DataFrame]:
+    """Yields DataFrames indexed by student with columns q_1..q_n (strings / NaN)."""
+    cols = [f"q_{i}" for i in range(1, n_questions + 1)]
+    if path.endswith((".jsonl", ".ndjson")):
+        reader = pd.read_json(path, lines=True, chunksize=CHUNK_ROWS)
+        for chunk in reader:
+            ans = pd.DataFrame(list(chunk["answers"]), index=chunk["student"].astype(str))
+            yield ans.reindex(columns=cols)
+    else:
+        for chunk in pd.read_csv(path, chunksize=CHUNK_ROWS, dtype=str):
+            chunk = chunk.set_index(chunk.columns[0])
+            chunk.index = chunk.index.astype(str)
+            yield chunk.reindex(columns=cols)
+
+def chunk_stats(answers: pd.DataFrame, qs: List[Dict[str, Any]]) -> Tuple[pd.DataFrame, pd.DataFrame]:
+    """Vectorized: boolean correctness matrix -> per-student score + per-topic correct/total."""
+    key = pd.Series([q["answer"] for q in qs], index=answers.columns)
+    topics = pd.Series([q["topic"] for q in qs], index=answers.columns)
+    right = answers.eq(key, axis=1)
+    by_topic = right.T.groupby(topics).sum().T        # students × topics (correct counts)
+    out = pd.DataFrame({"correct": right.sum(axis=1), "total": len(qs)}, index=answers.index)
+    out["wrong"] = out["total"] - out["correct"]
+    out["pct"] = (100 * out["correct"] / max(1, len(qs))).round(1)
+    # positional: a student listed twice must not be joined with itself by label
+    for t in by_topic.columns:
+        out[f"topic::{t}"] = by_topic[t].to_numpy()
+    return out, right
+
+def _student_stats(row: pd.Series, answers: pd.Series, right: pd.Series,
+                   qs: List[Dict[str, Any]], topic_totals: Dict[str, int]) -> Dict[str, Any]:
+    """quiz_report-shaped stats for one student, from the vectorized row."""
+    topic_stats = {t: {"correct": int(row[f"topic::{t}"]), "total": n} for t, n in topic_totals.items()}
+    q_review = []
+    for i, q in enumerate(qs, start=1):
+        your = answers.get(f"q_{i}")
+        your = "—" if pd.isna(your) else str(your)
+        q_review.append((q["question"], your, q["answer"], bool(right.get(f"q_{i}", False)), q["topic"]))
+    strong = [t for t, v in topic_stats.items() if v["correct"] / v["total"] >= 0.8]
+    weak = [t for t, v in topic_stats.items() if v["correct"] / v["total"] < 0.5]
+    return {"total": int(row["total"]), "correct": int(row["correct"]), "wrong": int(row["wrong"]),
+            "topic_stats": topic_stats, "q_review": q_review, "strong": strong, "weak": weak}
+
+def _safe_name(name: str) -> str:
+    return re.sub(r"[^A-Za-z0-9_.-]+", "_", name).strip("_") or "student"
+
+def _report_path(student: str, out_dir: str, used: Dict[str, int]) -> str:
+    """Unique per row: names that sanitize alike (Zoë / Zoé) get different hash suffixes, repeats a counter."""
+    stem = f"{_safe_name(student)}_{hashlib.sha1(student.encode('utf-8')).hexdigest()[:8]}"
+    used[stem] = used.get(stem, 0) + 1
+    if used[stem] > 1:
+        stem += f"_{used[stem]}"
+    return os.path.join(out_dir, f"{stem}_quiz_report.pdf")
+
+def _render_to_file(student: str, stats: Dict[str, Any], path: str) -> str:
+    # runs in a worker process; only the path travels back
+    with open(path, "wb") as f:
+        f.write(render_quiz_pdf(student, stats))
+    return path
+
+# =========================
+# Class summary
+# =========================
+def render_class_summary_pdf(summary: Dict[str, Any]) -> bytes:
+    import io
+    from reportlab.pdfgen import canvas
+    from reportlab.lib.pagesizes import A4
+    from reportlab.lib.units import cm
+    from reportlab.lib.utils import ImageReader
+    from quiz_report import _figure, _png, chart_topics_png
+
+    fig = _figure((5, 3))
+    ax = fig.add_subplot()
+    ax.hist(summary["scores_pct"], bins=10, range=(0, 100), color="#6e48aa")
+    ax.set_xlabel("Score (%)"); ax.set_ylabel("Students"); ax.set_title("Score distribution")
+    hist_png = _png(fig)
+
+    buf = io.BytesIO()
+    c = canvas.Canvas(buf, pagesize=A4)
+    W, H = A4
+    x, y = 2*cm, H - 2*cm
+    c.setFont("Helvetica-Bold", 16); c.drawString(x, y, "StudyMate — Class Quiz Summary"); y -= 20
+    c.setFont("Helvetica", 11)
+    c.drawString(x, y, f"Students: {summary['students']}   Mean: {summary['mean_pct']}%   "
+                       f"Median: {summary['median_pct']}%"); y -= 18
+    c.drawImage(ImageReader(io.BytesIO(hist_png)), x, y-7*cm, width=10*cm, height=6*cm, preserveAspectRatio=True)
+    y -= 7*cm + 12
+    c.drawImage(ImageReader(io.BytesIO(chart_topics_png(summary["topic_stats"]))), x, y-7*cm,
+                width=10*cm, height=6*cm, preserveAspectRatio=True)
+    y -= 7*cm + 16
+    c.setFont("Helvetica-Bold", 12); c.drawString(x, y, "Summary:"); y -= 14
+    c.setFont("Helvetica", 11)
+    c.drawString(x, y, summary_text(summary["strong"], summary["weak"])[:110]); y -= 18
+
+    c.showPage(); y = H - 2*cm
+    c.setFont("Helvetica-Bold", 14); c.drawString(x, y, "Per-question accuracy"); y -= 18
+    c.setFont("Helvetica", 10)
+    for i, (qtext, acc) in enumerate(summary["questions"], start=1):
+        c.drawString(x, y, f"Q{i}  {acc:5.1f}%  {qtext[:85]}"); y -= 12
+        if y < 3*cm: c.showPage(); y = H - 2*cm; c.setFont("Helvetica", 10)
+    c.save()
+    return buf.getvalue()
+
+# =========================
+# Driver
+# =========================
+def generate_class_reports(
+    quiz_path: str,
+    answers_path: str,
+    out_dir: str,
+    workers: Optional[int] = None,
+    progress: Optional[Callable[[int, str], None]] = None,
+) -> Dict[str, Any]:
+    qs = load_quiz(quiz_path)
+    os.makedirs(out_dir, exist_ok=True)
+    topic_totals: Dict[str, int] = {}
+    for q in qs:
+        topic_totals[q["topic"]] = topic_totals.get(q["topic"], 0) + 1
+
+    workers = workers or os.cpu_count() or 1
+    max_in_flight = workers * 2
+    scores, q_right = [], pd.Series(0, index=[f"q_{i}" for i in range(1, len(qs) + 1)])
+    topic_right = pd.Series(0, index=list(topic_totals))
+    n_students, done, paths, used_names = 0, 0, [], {}
+
+    with ProcessPoolExecutor(max_workers=workers) as ex:
+        pending = set()
+        for answers in _iter_answer_chunks(answers_path, len(qs)):
+            stats, right = chunk_stats(answers, qs)
+            n_students += len(stats)
+            scores.extend(stats["pct"].tolist())
+            q_right = q_right.add(right.sum(axis=0), fill_value=0)
+            topic_right = topic_right.add(stats[[f"topic::{t}" for t in topic_totals]]
+                                          .sum(axis=0).rename(lambda c: c.split("::", 1)[1]), fill_value=0)
+            for pos, student in enumerate(stats.index):
+                if len(pending) >= max_in_flight:
+                    finished, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    for f in finished:
+                        paths.append(f.result()); done += 1
+                        if progress: progress(done, paths[-1])
+                s = _student_stats(stats.iloc[pos], answers.iloc[pos], right.iloc[pos], qs, topic_totals)
+                pending.add(ex.submit(_render_to_file, student, s, _report_path(student, out_dir, used_names)))
+        for f in wait(pending).done:
+            paths.append(f.result()); done += 1
+            if progress: progress(done, paths[-1])
+
+    ser = pd.Series(scores, dtype=float)
+    topic_stats = {t: {"correct": int(topic_right[t]), "total": n * max(1, n_students)} for t, n in topic_totals.items()}
+    summary = {
+        "students": n_students,
+        "mean_pct": round(float(ser.mean()), 1) if n_students else 0.0,
+        "median_pct": round(float(ser.median()), 1) if n_students else 0.0,
+        "scores_pct": scores,
+        "topic_stats": topic_stats,
+        "strong": [t for t, v in topic_stats.items() if v["correct"] / v["total"] >= 0.8],
+        "weak": [t for t, v in topic_stats.items() if v["correct"] / v["total"] < 0.5],
+        "questions": [(q["question"], 100 * float(q_right[f"q_{i}"]) / max(1, n_students))
+                      for i, q in enumerate(qs, start=1)],
+    }
+    summary_pdf = os.path.join(out_dir, "class_summary.pdf")
+    with open(summary_pdf, "wb") as f:
+        f.write(render_class_summary_pdf(summary))
+    pd.DataFrame({"question": [q for q, _ in summary["questions"]],
+                  "accuracy_pct": [round(a, 1) for _, a in summary["questions"]]}
+                 ).to_csv(os.path.join(out_dir, "class_questions.csv"), index=False)
+    return {"students": n_students, "reports": paths, "summary_pdf": summary_pdf,
+            "mean_pct": summary["mean_pct"], "median_pct": summary["median_pct"]}
+
+def main(argv: Optional[List[str]] = None) -> int:
+    ap = argparse.ArgumentParser(description="Render per-student quiz reports + a class summary.")
+    ap.add_argument("--quiz", required=True, help="quiz definition JSON")
+    ap.add_argument("--answers", required=True, help="CSV (student,q_1..q_n) or JSONL ({student, answers})")
+    ap.add_argument("--out", default=os.path.join("data", "reports"), help="output directory")
+    ap.add_argument("--workers", type=int, default=None, help="processes (default: all cores)")
+    args = ap.parse_args(argv)
+
+    def _progress(n: int, path: str):
+        sys.stderr.write(f"\r[{n}] {os.path.basename(path)[:60]:<60}")
+        sys.stderr.flush()
+
+    res = generate_class_reports(args.quiz, args.answers, args.out, workers=args.workers, progress=_progress)
+    sys.stderr.write("\n")
+    print(f"{res['students']} reports in {args.out} • mean {res['mean_pct']}% • summary: {res['summary_pdf']}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,352 @@
+# bench.py — reproducible benchmarks for the nlp_tasks entry points
+# ----------------------------------------------------------
+# Usage:
+#   python bench.py                                  # all cases, all tiers -> data/bench/bench-<commit>.json
+#   python bench.py --tiers 10KB,1MB --cases mcq,deadlines --repeat 5
+#   python bench.py --fixtures course/notes          # tile real .txt/.md notes instead of synthetic text
+#   python bench.py --compare data/bench/bench-abc123.json            # run, then diff against a baseline
+#   python bench.py --compare old.json --current new.json             # diff two result files, no run
+#
+#  - corpora: seeded synthetic study text (same bytes on every machine) or fixture notes,
+#    at 10 KB / 1 MB / 20 MB; PDFs for the extraction cases are rendered once and kept in data/bench
+#  - every (case, tier) runs in a fresh spawned process: one warm-up call (model loads etc.,
+#    reported as first_s), then --repeat timed calls -> p50 / p99 latency, MB/s, peak RSS
+#  - cases whose optional dependency is missing are reported as skipped, not failed; the *_llm
+#    cases need STUDYMATE_LLM_BACKEND=mock (offline, see mock_llm.py) or an OpenAI key
+#  - --compare exits 1 when any p50 or peak RSS got worse by more than --threshold
+
+import os, sys, json, time, random, platform, subprocess, argparse, importlib.util
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+BENCH_DIR = os.path.join("data", "bench")
+TIERS: Dict[str, int] = {"10KB": 10 * 1024, "1MB": 1024 ** 2, "20MB": 20 * 1024 ** 2}
+DEFAULT_REPEAT = {"10KB": 20, "1MB": 5, "20MB": 3}
+SEED = 1234
+NOISE_FLOOR_S = 0.001
+
+# =========================
+# Corpora
+# =========================
+_TOPICS = ["photosynthesis", "mitochondria", "supply and demand", "the French Revolution", "linear algebra",
+           "plate tectonics", "the immune system", "thermodynamics", "cell division", "market equilibrium",
+           "the Industrial Revolution", "probability theory", "organic chemistry", "climate systems"]
+_VERBS = ["explains", "describes", "determines", "depends on", "is related to", "controls", "converts",
+          "influences", "defines", "is measured by"]
+_OBJECTS = ["energy transfer", "population growth", "the rate of change", "chemical bonds", "price levels",
+            "genetic information", "heat flow", "political power", "vector spaces", "sediment layers"]
+_MONTHS = ["January", "February", "March", "April", "May", "June", "July", "August", "September",
+           "October", "November", "December"]
+
+def _sentence(rng: random.Random) -> str:
+    r = rng.random()
+    if r < 0.06:
+        return (f"The {rng.choice(['essay', 'lab report', 'problem set', 'project'])} on {rng.choice(_TOPICS)} "
+                f"is due {rng.choice(_MONTHS)} {rng.randint(1, 28)}, 2026 at {rng.randint(1, 11)}pm.")
+    if r < 0.09:
+        return f"The midterm exam covering {rng.choice(_TOPICS)} will be held on {rng.randint(1, 12)}/{rng.randint(1, 28)}/2026."
+    words = [rng.choice(_TOPICS).capitalize(), rng.choice(_VERBS), rng.choice(_OBJECTS)]
+    if rng.random() < 0.5:
+        words += ["because", rng.choice(_TOPICS), rng.choice(_VERBS), rng.choice(_OBJECTS)]
+    return " ".join(words) + "."
+
+def synthetic_corpus(n_bytes: int, seed: int = SEED) -> str:
+    rng = random.Random(seed)
+    parts, size = [], 0
+    while size < n_bytes:
+        para = " ".join(_sentence(rng) for _ in range(rng.randint(3, 8))) + "\n\n"
+        parts.append(para)
+        size += len(para)
+    return "".join(parts)[:n_bytes]
+
+def fixture_corpus(fixture_dir: str, n_bytes: int) -> str:
+    texts = []
+    for dirpath, dirnames, filenames in os.walk(fixture_dir):
+        dirnames.sort()
+        for fn in sorted(filenames):
+            if fn.lower().endswith((".txt", ".md")):
+                with open(os.path.join(dirpath, fn), "r", encoding="utf-8", errors="replace") as f:
+                    texts.append(f.read())
+    base = "\n\n".join(t for t in texts if t.strip())
+    if not base:
+        raise SystemExit(f"no .txt/.md fixtures under {fixture_dir}")
+    return (base * (n_bytes // len(base) + 1))[:n_bytes]
+
+def corpus(tier: str, fixtures: Optional[str]) -> str:
+    n = TIERS[tier]
+    return fixture_corpus(fixtures, n) if fixtures else synthetic_corpus(n)
+
+def corpus_pdf(tier: str, fixtures: Optional[str]) -> str:
+    """The tier's corpus rendered to a PDF once (reportlab), cached next to the results."""
+    from cache_store import text_hash
+    text = corpus(tier, fixtures)
+    os.makedirs(BENCH_DIR, exist_ok=True)
+    path = os.path.join(BENCH_DIR, f"corpus-{tier}-{text_hash(text)[:10]}.pdf")
+    if os.path.exists(path):
+        return path
+    import textwrap
+    from reportlab.pdfgen import canvas
+    from reportlab.lib.pagesizes import A4
+    from reportlab.lib.units import cm
+    c = canvas.Canvas(path + ".tmp", pagesize=A4)
+    W, H = A4
+    y = H - 2 * cm
+    c.setFont("Helvetica", 9)
+    for para in text.split("\n"):
+        for line in textwrap.wrap(para, 110) or [""]:
+            c.drawString(2 * cm, y, line)
+            y -= 11
+            if y < 2 * cm:
+                c.showPage(); c.setFont("Helvetica", 9); y = H - 2 * cm
+    c.save()
+    os.replace(path + ".tmp", path)
+    return path
+
+# =========================
+# Cases: name -> (required modules, setup(tier, fixtures) -> run callable)
+# =========================
+def _case_extractive(tier, fixtures):
+    from nlp_tasks import _extractive_summary
+    text = corpus(tier, fixtures)
+    return lambda: _extractive_summary(text, max_sentences=6)
+
+def _case_neural(tier, fixtures):
+    from nlp_tasks import _neural_summary
+    text = corpus(tier, fixtures)
+    return lambda: _neural_summary(text, target_words=150)
+
+def _case_mcq(tier, fixtures):
+    from nlp_tasks import make_mcq
+    text = corpus(tier, fixtures)
+    return lambda: make_mcq(text, num_questions=6, seed=42)
+
+def _case_flashcards(tier, fixtures):
+    from nlp_tasks import make_flashcards
+    text = corpus(tier, fixtures)
+    return lambda: make_flashcards(text, num_cards=6)
+
+def _case_deadlines(tier, fixtures):
+    from nlp_tasks import extract_deadlines, _parse_window
+    text = corpus(tier, fixtures)
+
+    def run():
+        _parse_window.cache_clear()       # the warm-up would otherwise turn every timed repeat into cache hits
+        return extract_deadlines(text)
+    return run
+
+def _case_chunks(tier, fixtures):
+    from preprocess import make_chunks
+    text = corpus(tier, fixtures)
+    return lambda: make_chunks(text, chunk_size=800, overlap=150)
+
+def _case_pdf_pdfminer(tier, fixtures):
+    from ingest import from_pdf
+    path = corpus_pdf(tier, fixtures)
+    return lambda: from_pdf(path)
+
+def _case_pdf_pypdf2(tier, fixtures):
+    from nlp_tasks import extract_text_from_pdf
+    path = corpus_pdf(tier, fixtures)
+    return lambda: extract_text_from_pdf(path)
+
+def _llm_case(fn_name: str, **kwargs):
+    def _setup(tier, fixtures):
+        import nlp_tasks
+        nlp_tasks.LLM_CACHE_ENABLED = False        # measure the pipeline, not the response cache
+        fn, text = getattr(nlp_tasks, fn_name), corpus(tier, fixtures)
+        return lambda: fn(text, **kwargs)
+    return _setup
+
+def _vectorstore(tier, fixtures):
+    import tempfile
+    from preprocess import make_chunks
+    from vectorstore import VectorStore
+    from precompute import EMBED_MODEL
+    chunks = make_chunks(corpus(tier, fixtures), chunk_size=800, overlap=150)
+    vs = VectorStore(EMBED_MODEL, index_dir=tempfile.mkdtemp(prefix="bench-index-"))
+    return vs, chunks
+
+def _case_vs_build(tier, fixtures):
+    vs, chunks = _vectorstore(tier, fixtures)
+    meta = [{"i": i} for i in range(len(chunks))]
+    return lambda: vs.build(chunks, meta)
+
+def _case_vs_search(tier, fixtures):
+    vs, chunks = _vectorstore(tier, fixtures)
+    vs.build(chunks, [{"i": i} for i in range(len(chunks))])
+    queries = [f"How does {t} work?" for t in _TOPICS]
+    it = iter(range(10 ** 9))
+    return lambda: vs.search(queries[next(it) % len(queries)], chunks, k=6)
+
+CASES: Dict[str, Tuple[List[str], Callable[[str, Optional[str]], Callable[[], Any]]]] = {
+    "extractive_summary": ([], _case_extractive),
+    "neural_summary": (["transformers", "torch"], _case_neural),
+    "mcq": ([], _case_mcq),
+    "flashcards": ([], _case_flashcards),
+    "deadlines": ([], _case_deadlines),
+    "make_chunks": ([], _case_chunks),
+    "pdf_pdfminer": (["pdfminer", "bs4", "reportlab"], _case_pdf_pdfminer),
+    "pdf_pypdf2": (["PyPDF2", "reportlab"], _case_pdf_pypdf2),
+    "vectorstore_build": (["faiss", "sentence_transformers"], _case_vs_build),
+    "vectorstore_search": (["faiss", "sentence_transformers"], _case_vs_search),
+    # LLM paths: STUDYMATE_LLM_BACKEND=mock for offline runs (mock_llm), or a real key
+    "summary_llm": (["llm"], _llm_case("summarize", mode="llm", target_words=150)),
+    "mcq_llm": (["llm"], _llm_case("make_mcq_llm", num_questions=6)),
+    "flashcards_llm": (["llm"], _llm_case("make_flashcards_llm", num_cards=6)),
+    "deadlines_llm": (["llm"], _llm_case("extract_deadlines_llm")),
+}
+
+# =========================
+# Measurement (runs in a spawned child per case)
+# =========================
+def _rss_mb() -> float:
+    from model_registry import _rss_bytes
+    return _rss_bytes() / 2 ** 20
+
+def _peak_rss_mb() -> float:
+    import resource
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / 2 ** 20 if sys.platform == "darwin" else peak / 1024     # bytes on macOS, KiB elsewhere
+
+def _available(req: str) -> bool:
+    if req == "llm":
+        return (os.getenv("STUDYMATE_LLM_BACKEND", "openai").lower() == "mock"
+                or (bool(os.getenv("OPENAI_API_KEY")) and importlib.util.find_spec("openai") is not None))
+    return importlib.util.find_spec(req) is not None
+
+def _percentile(xs: List[float], p: float) -> float:
+    xs = sorted(xs)
+    k = (len(xs) - 1) * p / 100
+    lo = int(k)
+    hi = min(lo + 1, len(xs) - 1)
+    return xs[lo] + (xs[hi] - xs[lo]) * (k - lo)
+
+def run_case(case: str, tier: str, repeat: int, fixtures: Optional[str]) -> Dict[str, Any]:
+    missing = [m for m in CASES[case][0] if not _available(m)]
+    if missing:
+        reason = ("no LLM backend (STUDYMATE_LLM_BACKEND=mock or OPENAI_API_KEY)" if missing == ["llm"]
+                  else f"missing {', '.join(missing)}")
+        return {"case": case, "tier": tier, "status": "skipped", "reason": reason}
+    rss0 = _rss_mb()
+    try:
+        t0 = time.perf_counter()
+        fn = CASES[case][1](tier, fixtures)
+        setup_s = time.perf_counter() - t0
+        t0 = time.perf_counter()
+        fn()                                   # warm-up: lazy imports, model loads, caches
+        first_s = time.perf_counter() - t0
+        times = []
+        for _ in range(repeat):
+            t0 = time.perf_counter()
+            fn()
+            times.append(time.perf_counter() - t0)
+    except Exception as e:
+        return {"case": case, "tier": tier, "status": "error", "reason": f"{type(e).__name__}: {e}"}
+    p50 = _percentile(times, 50)
+    return {
+        "case": case, "tier": tier, "status": "ok", "bytes": TIERS[tier], "repeat": repeat,
+        "setup_s": round(setup_s, 4), "first_s": round(first_s, 4),
+        "p50_s": round(p50, 6), "p99_s": round(_percentile(times, 99), 6),
+        "mean_s": round(sum(times) / len(times), 6),
+        "mb_per_s": round(TIERS[tier] / 2 ** 20 / p50, 3) if p50 > 0 else None,
+        "rss_start_mb": round(rss0, 1), "peak_rss_mb": round(_peak_rss_mb(), 1),
+    }
+
+def _run_isolated(case: str, tier: str, repeat: int, fixtures: Optional[str]) -> Dict[str, Any]:
+    import multiprocessing as mp
+    with mp.get_context("spawn").Pool(1) as pool:
+        return pool.apply(run_case, (case, tier, repeat, fixtures))
+
+# =========================
+# Results / comparison
+# =========================
+def _git_commit() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__)), timeout=10).stdout.strip() or "unknown"
+    except Exception:
+        return "unknown"
+
+def run_suite(cases: List[str], tiers: List[str], repeat: Optional[int] = None, fixtures: Optional[str] = None,
+              progress: Optional[Callable[[Dict[str, Any]], None]] = None) -> Dict[str, Any]:
+    results = []
+    for tier in tiers:
+        for case in cases:
+            r = _run_isolated(case, tier, repeat or DEFAULT_REPEAT[tier], fixtures)
+            results.append(r)
+            if progress:
+                progress(r)
+    return {
+        "meta": {"commit": _git_commit(), "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+                 "python": platform.python_version(), "platform": platform.platform(),
+                 "cpus": os.cpu_count(), "corpus": f"fixtures:{fixtures}" if fixtures else f"synthetic:{SEED}"},
+        "results": results,
+    }
+
+def compare(base: Dict[str, Any], cur: Dict[str, Any], threshold: float = 0.10) -> Tuple[List[str], int]:
+    """Report lines and the number of regressions (p50 or peak RSS up by more than threshold)."""
+    old = {(r["case"], r["tier"]): r for r in base["results"] if r["status"] == "ok"}
+    lines = [f"{'case':<20} {'tier':>5} {'p50 old':>10} {'p50 new':>10} {'Δp50':>8} {'rss old':>9} {'rss new':>9}"]
+    regressions = 0
+    for r in cur["results"]:
+        o = old.get((r["case"], r["tier"]))
+        if r["status"] != "ok" or o is None:
+            continue
+        d_t = r["p50_s"] / o["p50_s"] - 1 if o["p50_s"] else 0.0
+        d_m = r["peak_rss_mb"] / o["peak_rss_mb"] - 1 if o["peak_rss_mb"] else 0.0
+        # sub-millisecond differences are timer noise, not regressions
+        bad = (d_t > threshold and r["p50_s"] - o["p50_s"] > NOISE_FLOOR_S) or d_m > threshold
+        regressions += bad
+        lines.append(f"{r['case']:<20} {r['tier']:>5} {o['p50_s']:>10.4f} {r['p50_s']:>10.4f} {d_t:>+7.1%} "
+                     f"{o['peak_rss_mb']:>9.1f} {r['peak_rss_mb']:>9.1f}" + ("  REGRESSION" if bad else ""))
+    return lines, regressions
+
+def _print_row(r: Dict[str, Any]) -> None:
+    if r["status"] != "ok":
+        print(f"{r['case']:<20} {r['tier']:>5}  {r['status']}: {r['reason']}", flush=True)
+        return
+    print(f"{r['case']:<20} {r['tier']:>5}  p50 {r['p50_s']:.4f}s  p99 {r['p99_s']:.4f}s  "
+          f"{r['mb_per_s'] or 0:>9.2f} MB/s  first {r['first_s']:.2f}s  peak {r['peak_rss_mb']:.0f} MB", flush=True)
+
+def main(argv: Optional[List[str]] = None) -> int:
+    ap = argparse.ArgumentParser(description="Benchmark StudyMate's NLP entry points.")
+    ap.add_argument("--cases", default=",".join(CASES), help=f"comma list of: {', '.join(CASES)}")
+    ap.add_argument("--tiers", default=",".join(TIERS), help=f"comma list of: {', '.join(TIERS)}")
+    ap.add_argument("--repeat", type=int, default=None, help="timed calls per case (default per tier)")
+    ap.add_argument("--fixtures", default=None, help="directory of .txt/.md notes to use instead of synthetic text")
+    ap.add_argument("--out", default=None, help="result JSON (default data/bench/bench-<commit>.json)")
+    ap.add_argument("--compare", default=None, metavar="BASELINE", help="baseline JSON to compare against")
+    ap.add_argument("--current", default=None, help="with --compare: existing result JSON instead of a new run")
+    ap.add_argument("--threshold", type=float, default=0.10, help="allowed slowdown / RSS growth (0.10 = 10%%)")
+    args = ap.parse_args(argv)
+
+    if args.current:
+        if not args.compare:
+            ap.error("--current needs --compare")
+        with open(args.current, "r", encoding="utf-8") as f:
+            cur = json.load(f)
+    else:
+        cases = [c.strip() for c in args.cases.split(",") if c.strip()]
+        tiers = [t.strip() for t in args.tiers.split(",") if t.strip()]
+        unknown = [c for c in cases if c not in CASES] + [t for t in tiers if t not in TIERS]
+        if unknown:
+            ap.error(f"unknown case/tier: {', '.join(unknown)}")
+        cur = run_suite(cases, tiers, repeat=args.repeat, fixtures=args.fixtures, progress=_print_row)
+        out = args.out or os.path.join(BENCH_DIR, f"bench-{cur['meta']['commit']}.json")
+        os.makedirs(os.path.dirname(out) or ".", exist_ok=True)
+        with open(out, "w", encoding="utf-8") as f:
+            json.dump(cur, f, indent=2)
+        print(f"results: {out}")
+
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            base = json.load(f)
+        lines, regressions = compare(base, cur, args.threshold)
+        print(f"\nvs {base['meta'].get('commit')} ({args.compare}):")
+        print("\n".join(lines))
+        if regressions:
+            print(f"{regressions} regression(s) above {args.threshold:.0%}")
+            return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,195 @@
+# cache_store.py — small bounded on-disk key/value store (SQLite)
+# ----------------------------------------------------------
+# Used for anything StudyMate wants to keep between reruns / sessions:
+#  - DiskCache(name): one SQLite file under CACHE_DIR per cache
+#  - values: str / bytes / JSON-serializable objects
+#  - bounded by entry count and/or total bytes (least-recently-used evicted)
+#  - optional TTL per cache
+#  - make_key(): stable hash for composite keys
+#  - SingleFlight: concurrent identical computations share one in-flight call
+
+import os, json, time, sqlite3, hashlib, threading
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, Optional, Tuple
+
+CACHE_DIR = os.getenv("STUDYMATE_CACHE_DIR", os.path.join("data", "cache"))
+
+def make_key(*parts: Any) -> str:
+    raw = json.dumps(parts, sort_keys=True, default=str, ensure_ascii=False)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+def text_hash(text: str) -> str:
+    return hashlib.sha256((text or "").encode("utf-8")).hexdigest()
+
+_MISSING = object()
+
+class DiskCache:
+    def __init__(self, name: str, max_entries: Optional[int] = 5000, max_bytes: Optional[int] = None,
+                 ttl_s: Optional[float] = None, cache_dir: Optional[str] = None):
+        self.name = name
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl_s = ttl_s
+        self.dir = cache_dir or CACHE_DIR
+        os.makedirs(self.dir, exist_ok=True)
+        self.path = os.path.join(self.dir, f"{name}.sqlite3")
+        self._local = threading.local()
+        self._write_lock = threading.Lock()
+        with self._conn() as c:
+            c.execute(
+                "CREATE TABLE IF NOT EXISTS entries ("
+                " key TEXT PRIMARY KEY, kind TEXT, value BLOB, size INTEGER,"
+                " created REAL, accessed REAL)"
+            )
+            c.execute("CREATE INDEX IF NOT EXISTS entries_accessed ON entries(accessed)")
+
+    def _conn(self) -> sqlite3.Connection:
+        c = getattr(self._local, "conn", None)
+        if c is None:
+            c = sqlite3.connect(self.path, timeout=30, isolation_level=None, check_same_thread=False)
+            c.execute("PRAGMA journal_mode=WAL")
+            c.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = c
+        return c
+
+    @staticmethod
+    def _encode(value: Any):
+        if isinstance(value, (bytes, bytearray)):
+            return "b", bytes(value)
+        if isinstance(value, str):
+            return "s", value.encode("utf-8")
+        return "j", json.dumps(value, ensure_ascii=False).encode("utf-8")
+
+    @staticmethod
+    def _decode(kind: str, blob: bytes) -> Any:
+        if kind == "b":
+            return bytes(blob)
+        if kind == "s":
+            return bytes(blob).decode("utf-8")
+        return json.loads(bytes(blob).decode("utf-8"))
+
+    def get(self, key: str, default: Any = None) -> Any:
+        try:
+            row = self._conn().execute("SELECT kind, value, created FROM entries WHERE key=?", (key,)).fetchone()
+        except sqlite3.Error:
+            return default
+        if row is None:
+            return default
+        kind, blob, created = row
+        now = time.time()
+        if self.ttl_s is not None and now - created > self.ttl_s:
+            self.delete(key)
+            return default
+        try:
+            self._conn().execute("UPDATE entries SET accessed=? WHERE key=?", (now, key))
+        except sqlite3.Error:
+            pass
+        return self._decode(kind, blob)
+
+    def __contains__(self, key: str) -> bool:
+        return self.get(key, _MISSING) is not _MISSING
+
+    def set(self, key: str, value: Any) -> None:
+        kind, blob = self._encode(value)
+        now = time.time()
+        with self._write_lock:
+            try:
+                c = self._conn()
+                c.execute(
+                    "INSERT OR REPLACE INTO entries(key, kind, value, size, created, accessed) VALUES (?,?,?,?,?,?)",
+                    (key, kind, blob, len(blob), now, now),
+                )
+                self._evict(c)
+            except sqlite3.Error:
+                pass
+
+    def delete(self, key: str) -> None:
+        try:
+            self._conn().execute("DELETE FROM entries WHERE key=?", (key,))
+        except sqlite3.Error:
+            pass
+
+    def clear(self) -> None:
+        try:
+            self._conn().execute("DELETE FROM entries")
+        except sqlite3.Error:
+            pass
+
+    def _evict(self, c: sqlite3.Connection) -> None:
+        if self.ttl_s is not None:
+            c.execute("DELETE FROM entries WHERE created < ?", (time.time() - self.ttl_s,))
+        if self.max_entries is not None:
+            (n,) = c.execute("SELECT COUNT(*) FROM entries").fetchone()
+            if n > self.max_entries:
+                c.execute(
+                    "DELETE FROM entries WHERE key IN (SELECT key FROM entries ORDER BY accessed ASC LIMIT ?)",
+                    (n - self.max_entries,),
+                )
+        if self.max_bytes is not None:
+            (total,) = c.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()
+            if total > self.max_bytes:
+                # drop oldest-accessed rows until we are back under budget
+                excess = total - self.max_bytes
+                doomed, freed = [], 0
+                for key, size in c.execute("SELECT key, size FROM entries ORDER BY accessed ASC"):
+                    doomed.append(key); freed += size
+                    if freed >= excess:
+                        break
+                c.executemany("DELETE FROM entries WHERE key=?", [(k,) for k in doomed])
+
+    def stats(self) -> dict:
+        try:
+            n, total = self._conn().execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM entries").fetchone()
+        except sqlite3.Error:
+            n, total = 0, 0
+        return {"name": self.name, "entries": n, "bytes": total, "path": self.path}
+
+
+class SingleFlight:
+    """Coalesce concurrent calls with the same key: one leader runs, the rest wait for its result."""
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls: Dict[str, Future] = {}
+
+    def do(self, key: str, fn: Callable[[], Any]) -> Any:
+        """
+        fn() once per key at a time. Waiters share the leader's result or exception, except when
+        the leader was interrupted (a non-Exception BaseException such as a cancelled job): that
+        failure is the leader's own, so a waiter takes over and runs fn() itself.
+        """
+        while True:
+            leader, fut = self.join(key)
+            if leader:
+                break
+            exc = fut.exception()
+            if exc is None or isinstance(exc, Exception):
+                return fut.result()
+        try:
+            res = fn()
+        except BaseException as e:
+            self.end(key, fut, error=e)
+            raise
+        self.end(key, fut, res)
+        return res
+
+    def join(self, key: str) -> Tuple[bool, Future]:
+        """(leader?, future) for callers that can't run under do(), e.g. streams; the leader must end()."""
+        with self._lock:
+            fut = self._calls.get(key)
+            if fut is not None:
+                return False, fut
+            fut = self._calls[key] = Future()
+            return True, fut
+
+    def end(self, key: str, fut: Future, result: Any = None, error: Optional[BaseException] = None) -> None:
+        with self._lock:
+            if self._calls.get(key) is fut:
+                del self._calls[key]
+        if error is not None:
+            fut.set_exception(error)
+        else:
+            fut.set_result(result)
+
+    def in_flight(self) -> int:
+        with self._lock:
+            return len(self._calls)
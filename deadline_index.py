@@ -0,0 +1,158 @@
+# deadline_index.py — persistent, incremental deadline index across documents
+# ----------------------------------------------------------
+#  - add_document(): chunk + hash; only new / changed chunks are re-extracted
+#    (chunks already seen in any document reuse their stored deadlines)
+#  - upcoming(days) / between(start, end): range queries on a date-sorted index
+#  - results are de-duplicated across documents (same date + same wording)
+#  - only absolute dates are kept ("May 5", "2026-05-05", "5/5"): relative ones ("Friday",
+#    "tomorrow") resolve against the day a chunk was read and would go stale in a stored index
+
+import os, re, time, sqlite3, hashlib, threading
+from datetime import date, timedelta
+from typing import Dict, List, Optional
+
+INDEX_DIR = os.path.join("data", "index")
+CHUNK_CHARS = 2000
+
+def _hash(text: str) -> str:
+    return hashlib.sha256((text or "").encode("utf-8")).hexdigest()
+
+def _norm(s: str) -> str:
+    return re.sub(r"\s+", " ", (s or "").lower()).strip()
+
+_MONTH = r"(?:jan|feb|mar|apr|may|jun|jul|aug|sep|oct|nov|dec)[a-z]*\.?"
+_ABSOLUTE = re.compile(
+    r"\b" + _MONTH + r"\s+\d{1,2}\b|\b\d{1,2}(?:st|nd|rd|th)?\s+(?:of\s+)?" + _MONTH
+    + r"|\b\d{4}-\d{1,2}-\d{1,2}\b|\b\d{1,2}[/.]\d{1,2}\b",
+    flags=re.I)
+
+def _absolute(match: str) -> bool:
+    return bool(_ABSOLUTE.search(match or ""))
+
+def _chunks(text: str) -> List[str]:
+    # no overlap: appending a page leaves earlier chunk hashes untouched
+    from preprocess import make_chunks
+    return make_chunks(text, chunk_size=CHUNK_CHARS, overlap=0)
+
+class DeadlineIndex:
+    def __init__(self, owner: str = "default", index_dir: Optional[str] = None):
+        self.dir = index_dir or INDEX_DIR
+        os.makedirs(self.dir, exist_ok=True)
+        safe = re.sub(r"[^A-Za-z0-9_-]+", "_", owner or "default").strip("_") or "default"
+        # the hash keeps owners apart whose names sanitize alike ("Zoë" / "Zoé")
+        self.path = os.path.join(self.dir, f"deadlines_{safe}_{_hash(owner or 'default')[:8]}.sqlite3")
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+        self._db.executescript("""
+            PRAGMA journal_mode=WAL;
+            CREATE TABLE IF NOT EXISTS docs (
+                doc_id TEXT PRIMARY KEY, name TEXT, doc_hash TEXT, updated REAL);
+            CREATE TABLE IF NOT EXISTS chunks (
+                doc_id TEXT, idx INTEGER, chunk_hash TEXT, PRIMARY KEY (doc_id, idx));
+            CREATE TABLE IF NOT EXISTS deadlines (
+                doc_id TEXT, chunk_idx INTEGER, chunk_hash TEXT,
+                iso_date TEXT, time TEXT, match TEXT, context TEXT);
+            CREATE INDEX IF NOT EXISTS deadlines_date ON deadlines(iso_date);
+            CREATE INDEX IF NOT EXISTS deadlines_chunk ON deadlines(chunk_hash);
+        """)
+
+    # ---------- writes ----------
+    def add_document(self, doc_id: str, text: str, name: Optional[str] = None, extractor=None) -> Dict[str, int]:
+        """
+        Index (or re-index) one document. Returns counts of reused / extracted chunks.
+        `extractor(text) -> [{match, iso_date, time, context}]` defaults to nlp_tasks.extract_deadlines.
+        """
+        if extractor is None:
+            from nlp_tasks import extract_deadlines as extractor
+        doc_hash = _hash(text)
+        with self._lock:
+            row = self._db.execute("SELECT doc_hash FROM docs WHERE doc_id=?", (doc_id,)).fetchone()
+            if row and row[0] == doc_hash:
+                n = self._db.execute("SELECT COUNT(*) FROM chunks WHERE doc_id=?", (doc_id,)).fetchone()[0]
+                return {"chunks": n, "reused": n, "extracted": 0}
+            old = dict(self._db.execute("SELECT idx, chunk_hash FROM chunks WHERE doc_id=?", (doc_id,)).fetchall())
+
+        chunks = _chunks(text)
+        hashes = [_hash(c) for c in chunks]
+        reused, todo = 0, []
+        for i, h in enumerate(hashes):
+            if old.get(i) == h:
+                reused += 1
+            else:
+                todo.append(i)
+
+        # chunks seen before (this or another doc) reuse their stored rows
+        fresh: Dict[int, List[Dict[str, str]]] = {}
+        for i in todo:
+            with self._lock:
+                known = self._db.execute(
+                    "SELECT DISTINCT iso_date, time, match, context FROM deadlines WHERE chunk_hash=?",
+                    (hashes[i],)).fetchall()
+                seen = self._db.execute("SELECT 1 FROM chunks WHERE chunk_hash=? LIMIT 1", (hashes[i],)).fetchone()
+            if seen:
+                fresh[i] = [{"iso_date": r[0], "time": r[1], "match": r[2], "context": r[3]} for r in known]
+                reused += 1
+            else:
+                found = extractor(chunks[i]) or []
+                fresh[i] = [d for d in found if isinstance(d, dict) and d.get("iso_date")
+                            and d.get("context") != "INSTALL_DATEPARSER" and _absolute(d.get("match"))]
+
+        with self._lock, self._db:
+            # chunks that changed or disappeared lose their rows
+            stale = [i for i in old if i >= len(hashes) or old[i] != hashes[i]]
+            self._db.executemany("DELETE FROM deadlines WHERE doc_id=? AND chunk_idx=?", [(doc_id, i) for i in stale])
+            self._db.execute("DELETE FROM chunks WHERE doc_id=? AND idx>=?", (doc_id, len(hashes)))
+            self._db.executemany("INSERT OR REPLACE INTO chunks(doc_id, idx, chunk_hash) VALUES (?,?,?)",
+                                 [(doc_id, i, hashes[i]) for i in fresh])
+            self._db.executemany(
+                "INSERT INTO deadlines(doc_id, chunk_idx, chunk_hash, iso_date, time, match, context) VALUES (?,?,?,?,?,?,?)",
+                [(doc_id, i, hashes[i], d.get("iso_date") or "", d.get("time") or "",
+                  d.get("match") or "", d.get("context") or "")
+                 for i, rows in fresh.items() for d in rows])
+            self._db.execute("INSERT OR REPLACE INTO docs(doc_id, name, doc_hash, updated) VALUES (?,?,?,?)",
+                             (doc_id, name or doc_id, doc_hash, time.time()))
+        return {"chunks": len(hashes), "reused": reused, "extracted": len(hashes) - reused}
+
+    def remove_document(self, doc_id: str) -> None:
+        with self._lock, self._db:
+            for table in ("deadlines", "chunks", "docs"):
+                self._db.execute(f"DELETE FROM {table} WHERE doc_id=?", (doc_id,))
+
+    # ---------- reads ----------
+    def documents(self) -> List[Dict[str, str]]:
+        with self._lock:
+            rows = self._db.execute("SELECT doc_id, name, updated FROM docs ORDER BY updated DESC").fetchall()
+        return [{"doc_id": r[0], "name": r[1], "updated": r[2]} for r in rows]
+
+    def between(self, start: str, end: str) -> List[Dict[str, object]]:
+        """Deadlines with start <= iso_date <= end (ISO strings), sorted by date, merged across documents."""
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT d.iso_date, d.time, d.match, d.context, d.doc_id, COALESCE(docs.name, d.doc_id) "
+                "FROM deadlines d LEFT JOIN docs ON docs.doc_id = d.doc_id "
+                "WHERE d.iso_date BETWEEN ? AND ? ORDER BY d.iso_date, d.time",
+                (start, end)).fetchall()
+        merged: Dict[tuple, Dict[str, object]] = {}
+        for iso, tm, match, ctx, doc_id, name in rows:
+            if not _absolute(match):      # rows stored before relative dates were filtered out
+                continue
+            key = (iso, _norm(match))
+            item = merged.get(key)
+            if item is None:
+                item = merged[key] = {"iso_date": iso, "time": tm, "match": match, "context": ctx, "documents": []}
+            if name not in item["documents"]:
+                item["documents"].append(name)
+            if tm and not item["time"]:
+                item["time"] = tm
+        return list(merged.values())
+
+    def upcoming(self, days: int = 7, today: Optional[date] = None) -> List[Dict[str, object]]:
+        today = today or date.today()
+        return self.between(today.isoformat(), (today + timedelta(days=days)).isoformat())
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            docs = self._db.execute("SELECT COUNT(*) FROM docs").fetchone()[0]
+            chunks = self._db.execute("SELECT COUNT(*) FROM chunks").fetchone()[0]
+            dls = self._db.execute("SELECT COUNT(*) FROM deadlines").fetchone()[0]
+        return {"documents": docs, "chunks": chunks, "deadlines": dls}
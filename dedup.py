@@ -0,0 +1,257 @@
+# dedup.py — near-duplicate filtering (MinHash + LSH) before embedding and LLM prompts
+# ----------------------------------------------------------
+# Usage:
+#   python dedup.py data/uploads              # dedup rate across a folder of notes (.txt/.md/.pdf)
+#   python dedup.py deck1.pdf deck2.pdf --threshold 0.7 --json dedup.json
+#
+#  - signature(): 64 MinHash values over word 5-shingles, from crc32 + multiply-shift hashing, so
+#    signatures are the same in every process and run (numpy-vectorized when installed)
+#  - NearDupFilter: streaming LSH index (16 bands x 4 rows); add(text) returns the position of an
+#    earlier near-duplicate (estimated Jaccard >= threshold) or indexes the text and returns None
+#  - dedup_chunks(): embedding inputs (VectorStore.build, precompute.chunk_embeddings)
+#  - whole documents: research.collect_sources() skips mirrored copies of a fetched article,
+#    `python dedup.py` reports duplicate documents in a folder
+#  - dedup_text(): LLM inputs — split into content-defined passages (cut points depend only on the
+#    sentence text, so a slide repeated in another deck splits the same way), near-duplicate
+#    passages dropped, everything else returned byte-for-byte
+#  - texts under MIN_WORDS words (headings, "Questions?") are always kept and never indexed
+#  - every call is recorded per site: units / chars seen and dropped -> report() (rate, chars and
+#    estimated tokens saved; for embedding sites each dropped unit is one embedding not computed),
+#    studymate_dedup_* counters
+#  - STUDYMATE_DEDUP=0 disables filtering; STUDYMATE_DEDUP_THRESHOLD (default 0.8)
+
+import os, re, sys, json, zlib, random, threading
+from collections import defaultdict
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+import metrics
+
+DEDUP_ENABLED = os.getenv("STUDYMATE_DEDUP", "1") != "0"
+THRESHOLD = float(os.getenv("STUDYMATE_DEDUP_THRESHOLD", "0.8"))
+SHINGLE_WORDS = 5
+MIN_WORDS = 8
+NUM_PERM, BANDS = 64, 16
+ROWS = NUM_PERM // BANDS
+PASSAGE_CUT_EVERY = 4            # a passage ends after ~1 in 4 sentences (content-defined)
+PASSAGE_MAX_CHARS = 1200
+
+_M64 = (1 << 64) - 1
+_rng = random.Random(0x5EED)
+_A = [_rng.randrange(1, 1 << 64) | 1 for _ in range(NUM_PERM)]
+_B = [_rng.randrange(0, 1 << 64) for _ in range(NUM_PERM)]
+_WORD = re.compile(r"[a-z0-9]+")
+
+# =========================
+# MinHash
+# =========================
+_NP = None
+
+def _numpy():
+    global _NP
+    if _NP is None:
+        try:
+            import numpy
+            _NP = (numpy, numpy.array(_A, dtype=numpy.uint64), numpy.array(_B, dtype=numpy.uint64))
+        except ImportError:
+            _NP = False
+    return _NP or None
+
+def _words(text: str) -> List[str]:
+    return _WORD.findall((text or "").lower())
+
+def _shingle_hashes(words: List[str]) -> List[int]:
+    k = min(SHINGLE_WORDS, len(words))
+    return list({zlib.crc32(" ".join(words[i:i + k]).encode("utf-8")) for i in range(len(words) - k + 1)})
+
+def signature(text: str) -> Optional[Tuple[int, ...]]:
+    """MinHash signature, or None for texts too short to compare (under MIN_WORDS words)."""
+    words = _words(text)
+    if len(words) < MIN_WORDS:
+        return None
+    hs = _shingle_hashes(words)
+    np_ = _numpy()
+    if np_ is not None:
+        np, a, b = np_
+        x = np.array(hs, dtype=np.uint64)
+        sig = np.full(NUM_PERM, np.iinfo(np.uint64).max, dtype=np.uint64)
+        for i in range(0, len(x), 4096):        # bounded (4096 x 64) temporaries for whole documents
+            block = (x[i:i + 4096, None] * a + b) >> np.uint64(32)      # uint64 wraps mod 2^64
+            np.minimum(sig, block.min(axis=0), out=sig)
+        return tuple(int(v) for v in sig)
+    return tuple(min(((ai * h + bi) & _M64) >> 32 for h in hs) for ai, bi in zip(_A, _B))
+
+def similarity(a: Tuple[int, ...], b: Tuple[int, ...]) -> float:
+    """Estimated Jaccard similarity of the two shingle sets."""
+    return sum(x == y for x, y in zip(a, b)) / NUM_PERM
+
+class NearDupFilter:
+    """Streaming near-duplicate index; positions count every add() call, short texts included."""
+
+    def __init__(self, threshold: Optional[float] = None):
+        self.threshold = THRESHOLD if threshold is None else threshold
+        self._bands: List[Dict[Tuple[int, ...], List[int]]] = [defaultdict(list) for _ in range(BANDS)]
+        self._sigs: Dict[int, Tuple[int, ...]] = {}
+        self._n = 0
+
+    def find(self, sig: Tuple[int, ...]) -> Optional[int]:
+        best, best_sim = None, self.threshold
+        seen = set()
+        for b in range(BANDS):
+            for pos in self._bands[b].get(sig[b * ROWS:(b + 1) * ROWS], ()):
+                if pos in seen:
+                    continue
+                seen.add(pos)
+                sim = similarity(sig, self._sigs[pos])
+                if sim >= best_sim:
+                    best, best_sim = pos, sim
+        return best
+
+    def add(self, text: str) -> Optional[int]:
+        pos, self._n = self._n, self._n + 1
+        sig = signature(text)
+        if sig is None:
+            return None
+        dup = self.find(sig)
+        if dup is not None:
+            return dup
+        self._sigs[pos] = sig
+        for b in range(BANDS):
+            self._bands[b][sig[b * ROWS:(b + 1) * ROWS]].append(pos)
+        return None
+
+    def filter(self, texts: Iterable[str]) -> Iterator[Tuple[int, str]]:
+        """(position, text) for every text that isn't a near-duplicate of an earlier one."""
+        for i, t in enumerate(texts):
+            if self.add(t) is None:
+                yield i, t
+
+# =========================
+# Stats
+# =========================
+_LOCK = threading.Lock()
+_STATS: Dict[str, List[int]] = defaultdict(lambda: [0, 0, 0, 0, 0])   # calls, units, dropped, chars, chars_dropped
+
+def record(site: str, units: int, dropped: int, chars: int, chars_dropped: int) -> None:
+    with _LOCK:
+        s = _STATS[site]
+        s[0] += 1; s[1] += units; s[2] += dropped; s[3] += chars; s[4] += chars_dropped
+    metrics.inc("studymate_dedup_units_total", units - dropped, site=site, outcome="kept")
+    metrics.inc("studymate_dedup_units_total", dropped, site=site, outcome="dropped")
+    metrics.inc("studymate_dedup_chars_total", chars_dropped, site=site, outcome="dropped")
+
+def report() -> Dict[str, Dict[str, Any]]:
+    """Per site: units seen / dropped, dedup rate, and the input it saved."""
+    with _LOCK:
+        return {site: {"calls": c, "units": u, "dropped": d, "rate": round(d / u, 4) if u else 0.0,
+                       "chars_dropped": cd, "chars_rate": round(cd / ch, 4) if ch else 0.0,
+                       "est_tokens_saved": cd // 4}
+                for site, (c, u, d, ch, cd) in _STATS.items()}
+
+def reset() -> None:
+    with _LOCK:
+        _STATS.clear()
+
+# =========================
+# Chunks / passages
+# =========================
+def dedup_chunks(chunks: List[str], site: str = "embed",
+                 threshold: Optional[float] = None) -> Tuple[List[str], List[int]]:
+    """(kept chunks, their positions in `chunks`), first occurrence wins."""
+    if not DEDUP_ENABLED or len(chunks) < 2:
+        return list(chunks), list(range(len(chunks)))
+    with metrics.span("dedup", site=site, units=len(chunks)):
+        kept = list(NearDupFilter(threshold).filter(chunks))
+    dropped = len(chunks) - len(kept)
+    total = sum(len(c) for c in chunks)
+    record(site, len(chunks), dropped, total, total - sum(len(c) for _, c in kept))
+    return [c for _, c in kept], [i for i, _ in kept]
+
+_SENT_END = re.compile(r"(?<=[.!?])\s+|\n+")
+
+def passages(text: str) -> List[str]:
+    """Content-defined passages; "".join(passages(t)) == t."""
+    out, start, cur = [], 0, 0
+    for m in _SENT_END.finditer(text):
+        sent = text[cur:m.start()]
+        cur = m.end()
+        if (zlib.crc32(" ".join(_words(sent)).encode("utf-8")) % PASSAGE_CUT_EVERY == 0
+                or cur - start >= PASSAGE_MAX_CHARS):
+            out.append(text[start:cur])
+            start = cur
+    if start < len(text):
+        out.append(text[start:])
+    return out
+
+def dedup_text(text: str, site: str = "llm", threshold: Optional[float] = None) -> str:
+    """text without its near-duplicate passages; unchanged (same object) when nothing repeats."""
+    if not DEDUP_ENABLED or not text:
+        return text
+    with metrics.span("dedup", site=site):
+        parts = passages(text)
+        kept = [p for _, p in NearDupFilter(threshold).filter(parts)] if len(parts) > 1 else parts
+    dropped = len(parts) - len(kept)
+    out = "".join(kept) if dropped else text
+    record(site, len(parts), dropped, len(text), len(text) - len(out))
+    return out
+
+# =========================
+# CLI: how much overlap is in a set of notes?
+# =========================
+def _read(path: str) -> str:
+    if path.lower().endswith(".pdf"):
+        from ingest import from_pdf
+        return from_pdf(path)[1]
+    with open(path, "r", encoding="utf-8", errors="replace") as f:
+        return f.read()
+
+def scan(paths: List[str], threshold: Optional[float] = None) -> Dict[str, Any]:
+    """Document-level duplicates, then passage-level overlap across all remaining documents."""
+    files = []
+    for p in paths:
+        if os.path.isdir(p):
+            for dirpath, dirnames, filenames in os.walk(p):
+                dirnames.sort()
+                files += [os.path.join(dirpath, fn) for fn in sorted(filenames)
+                          if fn.lower().endswith((".txt", ".md", ".pdf"))]
+        else:
+            files.append(p)
+    doc_filter, dup_docs, chars, chars_saved = NearDupFilter(threshold), [], 0, 0
+    pass_filter, n_pass, n_drop = NearDupFilter(threshold), 0, 0
+    for path in files:
+        text = _read(path)
+        chars += len(text)
+        dup = doc_filter.add(text)
+        if dup is not None:
+            dup_docs.append({"document": path, "duplicate_of": files[dup]})
+            chars_saved += len(text)
+            continue
+        for p in passages(text):
+            n_pass += 1
+            if pass_filter.add(p) is not None:
+                n_drop += 1
+                chars_saved += len(p)
+    return {"documents": len(files), "duplicate_documents": dup_docs, "passages": n_pass,
+            "duplicate_passages": n_drop, "chars": chars, "chars_saved": chars_saved,
+            "rate": round(chars_saved / chars, 4) if chars else 0.0, "est_tokens_saved": chars_saved // 4}
+
+def main(argv: Optional[List[str]] = None) -> int:
+    import argparse
+    ap = argparse.ArgumentParser(description="Near-duplicate report for a set of notes / slide decks.")
+    ap.add_argument("paths", nargs="+", help="files or directories (.txt, .md, .pdf)")
+    ap.add_argument("--threshold", type=float, default=None, help=f"estimated Jaccard (default {THRESHOLD})")
+    ap.add_argument("--json", default=None, help="also write the report as JSON")
+    args = ap.parse_args(argv)
+    rep = scan(args.paths, args.threshold)
+    for d in rep["duplicate_documents"]:
+        print(f"duplicate document: {d['document']}  ~  {d['duplicate_of']}")
+    print(f"{rep['documents']} documents • {len(rep['duplicate_documents'])} near-duplicate documents • "
+          f"{rep['duplicate_passages']}/{rep['passages']} repeated passages in the rest")
+    print(f"{rep['chars_saved']:,} of {rep['chars']:,} chars redundant ({rep['rate']:.1%}, "
+          f"~{rep['est_tokens_saved']:,} tokens / embedding input saved)")
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(rep, f, indent=2)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
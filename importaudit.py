@@ -0,0 +1,195 @@
+# importaudit.py — import-time audit of StudyMate's entry points (python -X importtime, per target)
+# ----------------------------------------------------------
+# Usage:
+#   python importaudit.py                                   # audit -> data/bench/importtime.json + table
+#   python importaudit.py --targets ingest,vectorstore --top 20
+#   python importaudit.py --check                           # exit 1 if a target imports a heavy library
+#   python importaudit.py --compare data/bench/importtime.json          # run, then diff against the report
+#
+#  - a target is a module name or a script (app.py, pages/*.py); scripts are not executed, their
+#    top-level import statements are (what Streamlit pays before drawing anything)
+#  - every target is imported in a fresh interpreter --repeat times; the median run is kept with
+#    its slowest direct imports, slowest modules by self time, and the heavy packages it loaded
+#  - "eager heavy" = packages from lazy_imports.HEAVY loaded at import time, minus those streamlit
+#    itself loads for script targets; they belong behind lazy_imports.lazy() / function-level imports
+#  - data/bench/importtime.json is the checked-in report; --compare flags targets whose import got
+#    slower by more than --threshold (and NOISE_FLOOR_MS) or that gained an eager heavy package
+#  - regenerate the report with requirements.txt installed: a target that fails to import has no
+#    baseline, and --compare lists it as such instead of comparing it
+
+import os, re, sys, ast, glob, json, time, platform, subprocess, argparse
+from typing import Any, Dict, List, Optional, Tuple
+
+from lazy_imports import HEAVY
+
+REPORT = os.path.join("data", "bench", "importtime.json")
+NOISE_FLOOR_MS = 5.0
+_ROOT = os.path.dirname(os.path.abspath(__file__))
+_START = "--importaudit-start--"
+_MODS = "--importaudit-modules--"
+_LINE = re.compile(r"^import time:\s+(\d+) \|\s+(\d+) \| ( *)(\S.*)$")
+
+def default_targets() -> List[str]:
+    pages = sorted(os.path.relpath(p, _ROOT) for p in glob.glob(os.path.join(_ROOT, "pages", "*.py")))
+    return ["app.py", *pages, "api_server", "nlp_tasks", "ingest", "vectorstore", "qa", "precompute"]
+
+def script_imports(path: str) -> List[str]:
+    """Modules named by a script's top-level import statements, in order."""
+    with open(os.path.join(_ROOT, path), "r", encoding="utf-8") as f:
+        tree = ast.parse(f.read(), path)
+    mods: List[str] = []
+    for node in tree.body:
+        if isinstance(node, ast.Import):
+            names = [a.name for a in node.names]
+        elif isinstance(node, ast.ImportFrom) and node.level == 0 and node.module:
+            names = [node.module]
+        else:
+            continue
+        mods += [n for n in names if n not in mods]
+    return mods
+
+# =========================
+# One interpreter per run
+# =========================
+def _probe(modules: List[str]) -> str:
+    return "\n".join([
+        "import sys, json",
+        f"sys.stderr.write({_START!r} + '\\n'); sys.stderr.flush()",
+        *[f"import {m}" for m in modules],
+        f"print({_MODS!r} + json.dumps(sorted({{m.split('.')[0] for m in sys.modules}})))",
+    ])
+
+def _parse(stderr: str) -> List[Tuple[int, int, int, str]]:
+    """(depth, self_us, cumulative_us, module) for every import after the start marker."""
+    rows, started = [], False
+    for line in stderr.splitlines():
+        if line == _START:
+            started = True
+            continue
+        m = _LINE.match(line) if started else None
+        if m:
+            rows.append((len(m.group(3)) // 2, int(m.group(1)), int(m.group(2)), m.group(4)))
+    return rows
+
+def _run_once(modules: List[str]) -> Dict[str, Any]:
+    proc = subprocess.run([sys.executable, "-X", "importtime", "-c", _probe(modules)], capture_output=True,
+                          text=True, cwd=_ROOT, timeout=600)
+    loaded = next((json.loads(l[len(_MODS):]) for l in proc.stdout.splitlines() if l.startswith(_MODS)), None)
+    if proc.returncode != 0 or loaded is None:
+        err = (proc.stderr.strip().splitlines() or ["exit status %d" % proc.returncode])[-1]
+        return {"status": "error", "error": err}
+    rows = _parse(proc.stderr)
+    return {"status": "ok", "rows": rows, "loaded": loaded,
+            "total_ms": round(sum(c for d, _, c, _ in rows if d == 0) / 1000, 1)}
+
+def audit(target: str, repeat: int = 3, top: int = 10,
+          allowed: Optional[List[str]] = None) -> Dict[str, Any]:
+    is_script = target.endswith(".py")
+    modules = script_imports(target) if is_script else [target]
+    runs = [_run_once(modules) for _ in range(max(1, repeat))]
+    ok = [r for r in runs if r["status"] == "ok"]
+    if not ok:
+        return {"target": target, "status": "error", "error": runs[-1]["error"]}
+    run = sorted(ok, key=lambda r: r["total_ms"])[len(ok) // 2]
+    rows = run["rows"]
+    top_depth = 0 if is_script else 1            # a script's own imports / a module's direct imports
+    heavy = sorted(set(HEAVY) & set(run["loaded"]))
+    exempt = set(allowed or []) if "streamlit" in modules else set()
+    return {
+        "target": target, "status": "ok", "total_ms": run["total_ms"],
+        "runs_ms": [r["total_ms"] for r in ok], "modules": len(run["loaded"]),
+        "direct": [{"module": m, "cumulative_ms": round(c / 1000, 1)}
+                   for d, _, c, m in sorted((r for r in rows if r[0] == top_depth), key=lambda r: -r[2])[:top]],
+        "slowest_self": [{"module": m, "self_ms": round(s / 1000, 1)}
+                         for _, s, _, m in sorted(rows, key=lambda r: -r[1])[:top]],
+        "heavy": heavy, "eager_heavy": [h for h in heavy if h not in exempt],
+    }
+
+def run_audit(targets: List[str], repeat: int = 3, top: int = 10) -> Dict[str, Any]:
+    base = _run_once(["streamlit"])          # what the framework loads anyway
+    allowed = sorted(set(HEAVY) & set(base["loaded"])) if base["status"] == "ok" else []
+    return {
+        "meta": {"created": time.strftime("%Y-%m-%dT%H:%M:%S"), "python": platform.python_version(),
+                 "platform": platform.platform(), "repeat": repeat,
+                 "streamlit_ms": base.get("total_ms"), "streamlit_heavy": allowed},
+        "results": [audit(t, repeat, top, allowed) for t in targets],
+    }
+
+# =========================
+# Report / comparison
+# =========================
+def format_report(rep: Dict[str, Any], top: int = 5) -> str:
+    meta = rep["meta"]
+    out = [f"python {meta['python']} • streamlit alone: "
+           + (f"{meta['streamlit_ms']:.0f} ms" if meta.get("streamlit_ms") is not None else "not installed")]
+    for r in rep["results"]:
+        if r["status"] != "ok":
+            out.append(f"\n{r['target']}: ERROR {r['error']}")
+            continue
+        out.append(f"\n{r['target']}: {r['total_ms']:.1f} ms, {r['modules']} packages"
+                   + (f"  EAGER HEAVY: {', '.join(r['eager_heavy'])}" if r["eager_heavy"] else ""))
+        for d in r["direct"][:top]:
+            out.append(f"  {d['cumulative_ms']:>9.1f} ms  {d['module']}")
+    return "\n".join(out)
+
+def compare(base: Dict[str, Any], cur: Dict[str, Any], threshold: float = 0.25) -> Tuple[List[str], int]:
+    """Report lines and the number of regressions (slower import or a new eager heavy package)."""
+    old = {r["target"]: r for r in base["results"]}
+    lines = [f"{'target':<34} {'old ms':>9} {'new ms':>9} {'Δ':>8}"]
+    regressions = 0
+    for r in cur["results"]:
+        o = old.get(r["target"])
+        if r["status"] != "ok" or o is None or o["status"] != "ok":
+            why = (f"not compared: {r['error']}" if r["status"] != "ok" else
+                   "not compared: no baseline" if o is None else f"not compared: baseline failed ({o['error']})")
+            lines.append(f"{r['target']:<34} {why}")
+            continue
+        d = r["total_ms"] / o["total_ms"] - 1 if o["total_ms"] else 0.0
+        new_heavy = sorted(set(r["eager_heavy"]) - set(o["eager_heavy"]))
+        bad = (d > threshold and r["total_ms"] - o["total_ms"] > NOISE_FLOOR_MS) or bool(new_heavy)
+        regressions += bad
+        lines.append(f"{r['target']:<34} {o['total_ms']:>9.1f} {r['total_ms']:>9.1f} {d:>+7.1%}"
+                     + (f"  now imports {', '.join(new_heavy)}" if new_heavy else "") + ("  REGRESSION" if bad else ""))
+    return lines, regressions
+
+def main(argv: Optional[List[str]] = None) -> int:
+    ap = argparse.ArgumentParser(description="Import-time audit of StudyMate's entry points.")
+    ap.add_argument("--targets", default=None, help="comma list of modules / scripts (default: app, pages, "
+                                                     "API server and the heavy-feature modules)")
+    ap.add_argument("--repeat", type=int, default=3, help="fresh interpreters per target (median is kept)")
+    ap.add_argument("--top", type=int, default=10, help="slowest imports kept per target")
+    ap.add_argument("--out", default=REPORT, help="report JSON (the checked-in one by default; '' to skip)")
+    ap.add_argument("--compare", default=None, metavar="BASELINE", help="report JSON to compare against")
+    ap.add_argument("--threshold", type=float, default=0.25, help="allowed import slowdown (0.25 = 25%%)")
+    ap.add_argument("--check", action="store_true", help="exit 1 when any target imports a heavy package")
+    args = ap.parse_args(argv)
+
+    base = None
+    if args.compare:                      # read first: --out may overwrite the same file
+        with open(args.compare, "r", encoding="utf-8") as f:
+            base = json.load(f)
+    targets = [t.strip() for t in args.targets.split(",") if t.strip()] if args.targets else default_targets()
+    rep = run_audit(targets, repeat=args.repeat, top=args.top)
+    print(format_report(rep))
+    if args.out:
+        os.makedirs(os.path.dirname(args.out) or ".", exist_ok=True)
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(rep, f, indent=2, ensure_ascii=False)
+        print(f"\nreport: {args.out}")
+
+    status = 0
+    if base is not None:
+        lines, regressions = compare(base, rep, args.threshold)
+        print(f"\nvs {args.compare} ({base['meta'].get('created')}):")
+        print("\n".join(lines))
+        if regressions:
+            print(f"{regressions} regression(s)")
+            status = 1
+    eager = [r["target"] for r in rep["results"] if r["status"] == "ok" and r["eager_heavy"]]
+    if args.check and eager:
+        print(f"\nheavy libraries imported eagerly by: {', '.join(eager)}")
+        status = 1
+    return status
+
+if __name__ == "__main__":
+    sys.exit(main())
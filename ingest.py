@@ -1,21 +1,34 @@
 from typing import Tuple
-import os, io, re, requests
-from bs4 import BeautifulSoup
-from pdfminer.high_level import extract_text
+import os, io, re
+from lazy_imports import lazy
 from preprocess import clean_text
+from metrics import span, traced
 
+# deferred: each is imported by the first call that needs it
+requests = lazy("requests")
+bs4 = lazy("bs4")
+pdfminer_high_level = lazy("pdfminer.high_level")
+
+@traced("ingest")
 def from_pdf(path: str) -> Tuple[str, str]:
-    raw = extract_text(path) or ""
-    return os.path.basename(path), clean_text(raw)
+    with span("pdf_extract"):
+        raw = pdfminer_high_level.extract_text(path) or ""
+    with span("clean"):
+        return os.path.basename(path), clean_text(raw)
 
+@traced("ingest")
 def from_text_string(name: str, text: str) -> Tuple[str, str]:
-    return name, clean_text(text)
+    with span("clean"):
+        return name, clean_text(text)
 
+@traced("ingest")
 def from_url(url: str) -> Tuple[str, str]:
-    r = requests.get(url, timeout=30)
+    with span("fetch"):
+        r = requests.get(url, timeout=30)
     r.raise_for_status()
-    soup = BeautifulSoup(r.text, "html.parser")
+    soup = bs4.BeautifulSoup(r.text, "html.parser")
     for s in soup(["script", "style", "noscript"]):
         s.extract()
     txt = re.sub(r'\n{2,}', '\n', soup.get_text(separator="\n"))
-    return url, clean_text(txt)
+    with span("clean"):
+        return url, clean_text(txt)
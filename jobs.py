@@ -0,0 +1,217 @@
+# jobs.py — background jobs for long-running pipelines (summary, report, quiz)
+# ----------------------------------------------------------
+#  - JOBS.submit(kind, fn, ...): runs fn(ctx, ...) on a bounded, process-wide worker pool
+#    (STUDYMATE_JOB_WORKERS caps concurrent heavy jobs across all sessions; the rest queue)
+#  - the page keeps only the job id in session_state; reruns and navigation don't interrupt it
+#  - ctx.progress(stage, fraction, partial=...) publishes progress events and partial output
+#  - JOBS.cancel(id): queued jobs never start, running ones stop at their next progress() call
+#    (a cancelled job that was computing a shared cached result doesn't fail the other sessions
+#    waiting for it: SingleFlight hands the computation to one of them)
+#  - finished jobs are kept for STUDYMATE_JOB_TTL seconds so a later rerun can collect the result
+
+import os, time, uuid, threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional
+
+import metrics
+
+JOB_WORKERS = int(os.getenv("STUDYMATE_JOB_WORKERS", "2"))
+JOB_TTL_S = float(os.getenv("STUDYMATE_JOB_TTL", "3600"))
+
+class JobCancelled(BaseException):
+    """Raised inside a job when it has been cancelled (BaseException, like asyncio.CancelledError,
+    so pipeline code that falls back on `except Exception` doesn't swallow it)."""
+
+class JobContext:
+    def __init__(self, job: "Job"):
+        self._job = job
+
+    @property
+    def cancelled(self) -> bool:
+        return self._job._cancel.is_set()
+
+    def check(self) -> None:
+        if self.cancelled:
+            raise JobCancelled(self._job.id)
+
+    def progress(self, stage: str, fraction: Optional[float] = None, message: str = "", partial: Any = None) -> None:
+        """Record a progress event (and optional partial output); raises JobCancelled if cancelled."""
+        j = self._job
+        with j._lock:
+            j.stage = stage
+            if fraction is not None:
+                j.fraction = max(0.0, min(1.0, float(fraction)))
+            if partial is not None:
+                j.partial = partial
+            j.events.append((time.time(), stage, j.fraction, message))
+            del j.events[:-50]
+        self.check()
+
+class Job:
+    def __init__(self, kind: str, owner: Optional[str] = None):
+        self.id = uuid.uuid4().hex[:12]
+        self.kind = kind
+        self.owner = owner
+        self.status = "queued"          # queued | running | done | failed | cancelled
+        self.stage = "queued"
+        self.fraction = 0.0
+        self.partial: Any = None
+        self.result: Any = None
+        self.error: Optional[str] = None
+        self.events: List[tuple] = []
+        self.created = time.time()
+        self.started: Optional[float] = None
+        self.finished: Optional[float] = None
+        self._cancel = threading.Event()
+        self._lock = threading.Lock()
+        self._future: Optional[Future] = None
+
+    @property
+    def done(self) -> bool:
+        return self.status in ("done", "failed", "cancelled")
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            end = self.finished or time.time()
+            return {
+                "id": self.id, "kind": self.kind, "status": self.status, "stage": self.stage,
+                "fraction": self.fraction, "partial": self.partial, "error": self.error,
+                "elapsed_s": round(end - (self.started or end), 2),
+                "queued_s": round((self.started or time.time()) - self.created, 2),
+                "events": list(self.events[-5:]),
+            }
+
+class JobRunner:
+    def __init__(self, max_workers: int = JOB_WORKERS, ttl_s: float = JOB_TTL_S):
+        self.max_workers = max_workers
+        self.ttl_s = ttl_s
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="job")
+        self._jobs: Dict[str, Job] = {}
+        self._lock = threading.Lock()
+
+    def submit(self, kind: str, fn: Callable[..., Any], *args, owner: Optional[str] = None, **kwargs) -> str:
+        self._prune()
+        job = Job(kind, owner)
+        ctx = JobContext(job)
+
+        def _run():
+            if job._cancel.is_set():
+                job.status, job.finished = "cancelled", time.time()
+                return
+            job.status, job.started, job.stage = "running", time.time(), "starting"
+            try:
+                with metrics.span(f"job.{kind}"):
+                    res = fn(ctx, *args, **kwargs)
+                ctx.check()
+                job.result, job.status, job.fraction = res, "done", 1.0
+            except JobCancelled:
+                job.status = "cancelled"
+            except Exception as e:
+                job.status, job.error = "failed", f"{type(e).__name__}: {e}"
+            finally:
+                job.finished = time.time()
+
+        with self._lock:
+            self._jobs[job.id] = job
+        job._future = self._pool.submit(_run)
+        return job.id
+
+    def get(self, job_id: Optional[str]) -> Optional[Job]:
+        if not job_id:
+            return None
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def cancel(self, job_id: Optional[str]) -> bool:
+        job = self.get(job_id)
+        if job is None or job.done:
+            return False
+        job._cancel.set()
+        if job._future is not None and job._future.cancel():
+            job.status, job.finished = "cancelled", time.time()
+        return True
+
+    def active(self, owner: Optional[str] = None) -> List[Dict[str, Any]]:
+        with self._lock:
+            jobs = [j for j in self._jobs.values() if not j.done and (owner is None or j.owner == owner)]
+        return [j.snapshot() for j in jobs]
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            jobs = list(self._jobs.values())
+        out = {"workers": self.max_workers}
+        for s in ("queued", "running", "done", "failed", "cancelled"):
+            out[s] = sum(1 for j in jobs if j.status == s)
+        return out
+
+    def _prune(self) -> None:
+        cutoff = time.time() - self.ttl_s
+        with self._lock:
+            for jid in [jid for jid, j in self._jobs.items() if j.done and (j.finished or 0) < cutoff]:
+                del self._jobs[jid]
+
+JOBS = JobRunner()
+
+# =========================
+# Pipelines as jobs
+# =========================
+def summary_job(ctx: JobContext, text: str, mode: str, target_words: int, max_chars_input: int,
+                timeout_s: float) -> Dict[str, Any]:
+    if mode == "llm":
+        from nlp_tasks import summarize_stream
+        from result_cache import RESULTS, summary_key
+        key = summary_key(text, mode, target_words, max_chars_input)
+        hit = RESULTS.lookup("summarize", key)
+        if hit is not None:
+            return hit
+        ctx.progress("drafting", 0.0)
+        t0, out, info = time.time(), "", {}
+        for delta in summarize_stream(text, mode=mode, target_words=target_words,
+                                      max_chars_input=max_chars_input, timeout_s=timeout_s, info=info):
+            out += delta
+            ctx.progress("drafting", min(0.99, len(out.split()) / max(1, target_words)), partial=out)
+        res = {"summary": out.strip(), "backend": info.get("backend", "llm"),
+               "stats": {"time_s": round(time.time() - t0, 3)}}
+        if res["backend"] == "llm" and res["summary"]:
+            RESULTS.store(key, res)     # same entry as cached_summary: the page and the API reuse it
+        return res
+    from result_cache import cached_summary
+    ctx.progress("summarizing", 0.0)
+    return cached_summary(text, mode=mode, target_words=target_words, max_chars_input=max_chars_input,
+                          timeout_s=timeout_s, progress=lambda stage, frac: ctx.progress(stage, frac))
+
+def report_job(ctx: JobContext, notes: str, topic: Optional[str], max_sources: int, target_words: int) -> Dict[str, Any]:
+    from nlp_tasks import stream_report_llm, render_report_pdf
+    ctx.progress("researching", 0.05)
+    sources, deltas = stream_report_llm(notes, topic=topic, max_sources=max_sources, target_words=target_words)
+    ctx.progress("drafting", 0.2, message=f"{len(sources)} sources")
+    md = ""
+    for delta in deltas:
+        md += delta
+        ctx.progress("drafting", 0.2 + 0.75 * min(1.0, len(md.split()) / max(1, target_words)), partial=md)
+    md = md.strip()
+    ctx.progress("rendering PDF", 0.97)
+    pdf = None
+    if md:
+        try:
+            pdf = render_report_pdf(md)
+        except Exception:
+            pdf = None
+    return {"report_md": md, "sources": sources, "pdf": pdf}
+
+def quiz_job(ctx: JobContext, text: str, num_questions: int, seed: int) -> List[Dict[str, Any]]:
+    from nlp_tasks import stream_mcq_llm
+    from result_cache import RESULTS, mcq_key
+    key = mcq_key(text, num_questions, seed, True)
+    hit = RESULTS.lookup("mcq", key)
+    if hit is not None:
+        return hit
+    qs: List[Dict[str, Any]] = []
+    ctx.progress("generating", 0.0)
+    for q in stream_mcq_llm(text, num_questions=num_questions, seed=seed):
+        qs.append(q)
+        ctx.progress("generating", len(qs) / max(1, num_questions), partial=list(qs))
+    if not qs:
+        raise RuntimeError("could not generate questions; try longer/cleaner text")
+    RESULTS.store(key, qs)
+    return qs
@@ -0,0 +1,115 @@
+# lazy_imports.py — deferred heavy imports + optional background preload
+# ----------------------------------------------------------
+#  - lazy("faiss") returns a stand-in module; the real import runs on first attribute access
+#    (inside an "import" span), so importing vectorstore / ingest / the pages costs nothing until
+#    the feature that needs the library is used
+#  - FEATURES maps app features to the heavy modules behind them; preload() imports them on a
+#    daemon thread, start_preload() does it once per process for STUDYMATE_PRELOAD (called by the
+#    app after the first page is drawn, and by the API server once it is listening)
+#  - STUDYMATE_PRELOAD: comma list of features, "all", or "0" to disable (default "pdf,dates")
+#  - importaudit.py reports what each entry module pulls in at import time and fails when one of
+#    HEAVY is imported eagerly
+
+import os, sys, time, types, threading, importlib
+from typing import Dict, List, Optional
+
+import metrics
+
+FEATURES: Dict[str, List[str]] = {
+    "pdf": ["PyPDF2", "pdfminer.high_level"],
+    "web": ["requests", "bs4"],
+    "dates": ["dateparser.search"],
+    "tokens": ["tiktoken"],
+    "llm": ["openai"],
+    "reports": ["reportlab.pdfgen.canvas"],
+    "neural": ["torch", "transformers"],
+    "embeddings": ["numpy", "faiss", "sentence_transformers"],
+}
+# top-level packages no entry module may import at module load
+HEAVY = sorted({m.split(".")[0] for mods in FEATURES.values() for m in mods} | {"pandas", "sklearn", "nltk"})
+PRELOAD = os.getenv("STUDYMATE_PRELOAD", "pdf,dates").strip().lower()
+
+# =========================
+# Lazy modules
+# =========================
+def _import(name: str) -> types.ModuleType:
+    mod = sys.modules.get(name)
+    if mod is not None:
+        return mod
+    t0 = time.perf_counter()
+    with metrics.span("import", module=name):
+        mod = importlib.import_module(name)
+    metrics.observe("studymate_import_seconds", time.perf_counter() - t0, module=name.split(".")[0])
+    return mod
+
+class LazyModule(types.ModuleType):
+    """Module stand-in; the first attribute lookup imports the real module and adopts its namespace."""
+
+    def __init__(self, name: str):
+        super().__init__(name)
+        self.__dict__["_lazy_lock"] = threading.Lock()
+
+    def _load(self) -> types.ModuleType:
+        with self.__dict__["_lazy_lock"]:
+            mod = _import(self.__name__)
+            self.__dict__.update(mod.__dict__)   # later lookups are plain attribute hits
+            return mod
+
+    def __getattr__(self, attr: str):
+        if attr.startswith("__") and attr.endswith("__"):
+            raise AttributeError(attr)           # copy / pickle / inspect probes don't trigger the import
+        return getattr(self._load(), attr)
+
+    def __repr__(self) -> str:
+        return f"<lazy module {self.__name__!r}>"
+
+def lazy(name: str) -> types.ModuleType:
+    """The module if it is already imported, else a LazyModule (ImportError surfaces on first use)."""
+    return sys.modules.get(name) or LazyModule(name)
+
+# =========================
+# Background preload
+# =========================
+_LOCK = threading.Lock()
+_REQUESTED: set = set()
+_STATUS: Dict[str, Dict[str, object]] = {}        # module -> {"seconds": ..} or {"error": ..}
+
+def _modules(features: Optional[List[str]]) -> List[str]:
+    names = list(FEATURES) if features is None else features
+    out = []
+    for f in names:
+        if f not in FEATURES:
+            raise ValueError(f"unknown preload feature {f!r} (known: {', '.join(FEATURES)})")
+        out += [m for m in FEATURES[f] if m not in out]
+    return out
+
+def _run(modules: List[str]) -> None:
+    with metrics.span("preload", modules=len(modules)):
+        for name in modules:
+            t0 = time.perf_counter()
+            try:
+                _import(name)
+                _STATUS[name] = {"seconds": round(time.perf_counter() - t0, 3)}
+            except Exception as e:                 # optional dependency not installed, etc.
+                _STATUS[name] = {"error": f"{type(e).__name__}: {e}"}
+
+def preload(features: Optional[List[str]] = None) -> Optional[threading.Thread]:
+    """Import the modules behind `features` (None = all) on a daemon thread; each module is tried once."""
+    with _LOCK:
+        todo = [m for m in _modules(features) if m not in _REQUESTED and m not in sys.modules]
+        _REQUESTED.update(todo)
+    if not todo:
+        return None
+    t = threading.Thread(target=_run, args=(todo,), name="studymate-preload", daemon=True)
+    t.start()
+    return t
+
+def start_preload() -> Optional[threading.Thread]:
+    """preload() for STUDYMATE_PRELOAD; a no-op after the first call or when disabled."""
+    if PRELOAD in ("", "0", "off", "none"):
+        return None
+    features = None if PRELOAD == "all" else [f.strip() for f in PRELOAD.split(",") if f.strip() in FEATURES]
+    return preload(features)
+
+def preload_status() -> Dict[str, Dict[str, object]]:
+    return {m: dict(_STATUS.get(m) or {"state": "pending"}) for m in sorted(_REQUESTED)}
@@ -0,0 +1,223 @@
+# llm_client.py — process-wide OpenAI client pool + rate / concurrency control
+# ----------------------------------------------------------
+#  - get_client(): one OpenAI client (and one keep-alive HTTP pool) per key/base_url
+#  - call(site, fn, ...): token-bucket rate limit, bounded concurrency,
+#    jittered exponential backoff on 429 / 5xx / connection errors, per-call timeout
+#  - stream(site, fn, ...): the same for stream=True requests; the slot is held (and latency
+#    measured) until the events are consumed or the generator is closed
+#  - metrics_snapshot(): latency + token usage per call site (summary, mcq, ...)
+
+import os, time, random, threading
+from collections import defaultdict, deque
+from typing import Any, Callable, Dict, Iterator, Optional
+
+LLM_TIMEOUT_S = float(os.getenv("STUDYMATE_LLM_TIMEOUT", "60"))
+LLM_MAX_RETRIES = int(os.getenv("STUDYMATE_LLM_RETRIES", "4"))
+LLM_MAX_CONCURRENCY = int(os.getenv("STUDYMATE_LLM_CONCURRENCY", "8"))
+LLM_RATE_PER_S = float(os.getenv("STUDYMATE_LLM_RATE", "5"))    # sustained requests / second
+LLM_RATE_BURST = int(os.getenv("STUDYMATE_LLM_BURST", "10"))
+LLM_BACKOFF_BASE_S = 0.5
+LLM_BACKOFF_MAX_S = 20.0
+
+# =========================
+# Client pool
+# =========================
+_CLIENTS: Dict[Any, Any] = {}
+_CLIENTS_LOCK = threading.Lock()
+
+def _build_client(api_key: str, base_url: Optional[str]):
+    from openai import OpenAI
+    kwargs = {"api_key": api_key, "max_retries": 0, "timeout": LLM_TIMEOUT_S}
+    if base_url:
+        kwargs["base_url"] = base_url
+    try:
+        import httpx
+        kwargs["http_client"] = httpx.Client(
+            timeout=LLM_TIMEOUT_S,
+            limits=httpx.Limits(max_connections=LLM_MAX_CONCURRENCY * 2,
+                                max_keepalive_connections=LLM_MAX_CONCURRENCY,
+                                keepalive_expiry=60),
+        )
+    except Exception:
+        pass  # openai falls back to its own default pool
+    return OpenAI(**kwargs)
+
+def get_client(api_key: str, base_url: Optional[str] = None):
+    key = (api_key, base_url)
+    client = _CLIENTS.get(key)
+    if client is None:
+        with _CLIENTS_LOCK:
+            client = _CLIENTS.get(key)
+            if client is None:
+                client = _CLIENTS[key] = _build_client(api_key, base_url)
+    return client
+
+# =========================
+# Rate + concurrency limits
+# =========================
+class TokenBucket:
+    def __init__(self, rate_per_s: float, burst: int):
+        self.rate = max(rate_per_s, 1e-6)
+        self.capacity = max(1, burst)
+        self.tokens = float(self.capacity)
+        self.t_last = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self, n: float = 1.0) -> None:
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.t_last) * self.rate)
+                self.t_last = now
+                if self.tokens >= n:
+                    self.tokens -= n
+                    return
+                wait = (n - self.tokens) / self.rate
+            time.sleep(wait)
+
+_BUCKET = TokenBucket(LLM_RATE_PER_S, LLM_RATE_BURST)
+_SLOTS = threading.BoundedSemaphore(LLM_MAX_CONCURRENCY)
+
+def _status_code(exc: Exception) -> Optional[int]:
+    code = getattr(exc, "status_code", None)
+    if code is None:
+        code = getattr(getattr(exc, "response", None), "status_code", None)
+    return code
+
+def _is_retryable(exc: Exception) -> bool:
+    code = _status_code(exc)
+    if code is not None:
+        return code in (408, 409, 429) or code >= 500
+    name = type(exc).__name__
+    return "Timeout" in name or "Connection" in name
+
+def _retry_after(exc: Exception) -> Optional[float]:
+    headers = getattr(getattr(exc, "response", None), "headers", None) or {}
+    try:
+        return float(headers.get("retry-after"))
+    except (TypeError, ValueError):
+        return None
+
+def _backoff_s(attempt: int, exc: Exception) -> float:
+    hinted = _retry_after(exc)
+    if hinted is not None:
+        return min(hinted, LLM_BACKOFF_MAX_S)
+    # full jitter
+    return random.uniform(0, min(LLM_BACKOFF_MAX_S, LLM_BACKOFF_BASE_S * (2 ** attempt)))
+
+# =========================
+# Per-site metrics
+# =========================
+_METRICS_LOCK = threading.Lock()
+_METRICS: Dict[str, Dict[str, Any]] = defaultdict(lambda: {
+    "calls": 0, "errors": 0, "retries": 0,
+    "input_tokens": 0, "output_tokens": 0,
+    "latency_s": deque(maxlen=500),
+})
+
+def _record(site: str, latency_s: Optional[float] = None, usage: Any = None,
+            error: bool = False, retry: bool = False) -> None:
+    _export(site, latency_s, usage, "retry" if retry else "error" if error else "ok")
+    with _METRICS_LOCK:
+        m = _METRICS[site]
+        if retry:
+            m["retries"] += 1
+            return
+        m["calls"] += 1
+        if error:
+            m["errors"] += 1
+        if latency_s is not None:
+            m["latency_s"].append(latency_s)
+        if usage is not None:
+            m["input_tokens"] += int(getattr(usage, "input_tokens", 0) or 0)
+            m["output_tokens"] += int(getattr(usage, "output_tokens", 0) or 0)
+
+def _export(site: str, latency_s: Optional[float], usage: Any, outcome: Optional[str]) -> None:
+    """Mirror into the process-wide metrics registry (Prometheus / JSON export)."""
+    import metrics
+    if not metrics.enabled():
+        return
+    if outcome:
+        metrics.inc("studymate_llm_requests_total", site=site, outcome=outcome)
+    if latency_s is not None and outcome != "retry":
+        metrics.observe("studymate_llm_seconds", latency_s, site=site)
+    if usage is not None:
+        for kind in ("input", "output"):
+            metrics.inc("studymate_llm_tokens_total", int(getattr(usage, f"{kind}_tokens", 0) or 0), site=site, kind=kind)
+
+def _pct(vals, q: float) -> Optional[float]:
+    if not vals:
+        return None
+    vals = sorted(vals)
+    return round(vals[min(len(vals) - 1, int(q * len(vals)))], 3)
+
+def metrics_snapshot() -> Dict[str, Dict[str, Any]]:
+    with _METRICS_LOCK:
+        out = {}
+        for site, m in _METRICS.items():
+            lat = list(m["latency_s"])
+            out[site] = {k: v for k, v in m.items() if k != "latency_s"}
+            out[site].update({"p50_s": _pct(lat, 0.50), "p95_s": _pct(lat, 0.95)})
+        return out
+
+# =========================
+# Guarded call
+# =========================
+def call(site: str, fn: Callable[..., Any], *args, timeout_s: Optional[float] = None, **kwargs) -> Any:
+    """Run one API request under the shared limits, retrying transient failures."""
+    kwargs.setdefault("timeout", timeout_s or LLM_TIMEOUT_S)
+    attempt = 0
+    while True:
+        _BUCKET.acquire()
+        with _SLOTS:
+            t0 = time.perf_counter()
+            try:
+                resp = fn(*args, **kwargs)
+            except Exception as e:
+                if attempt >= LLM_MAX_RETRIES or not _is_retryable(e):
+                    _record(site, time.perf_counter() - t0, error=True)
+                    raise
+                _record(site, retry=True)
+                delay = _backoff_s(attempt, e)
+            else:
+                _record(site, time.perf_counter() - t0, usage=getattr(resp, "usage", None))
+                return resp
+        attempt += 1
+        time.sleep(delay)
+
+def stream(site: str, fn: Callable[..., Any], *args, timeout_s: Optional[float] = None, **kwargs) -> Iterator[Any]:
+    """call() for a streamed request: yields its events under the shared limits, closes it when done."""
+    kwargs.setdefault("timeout", timeout_s or LLM_TIMEOUT_S)
+    kwargs["stream"] = True
+    attempt = 0
+    while True:
+        _BUCKET.acquire()
+        with _SLOTS:
+            t0 = time.perf_counter()
+            try:
+                events = fn(*args, **kwargs)
+            except Exception as e:
+                if attempt >= LLM_MAX_RETRIES or not _is_retryable(e):
+                    _record(site, time.perf_counter() - t0, error=True)
+                    raise
+                _record(site, retry=True)
+                delay = _backoff_s(attempt, e)
+            else:
+                # only opening the stream is retried: deltas may already have been handed out
+                usage, failed = None, False
+                try:
+                    for ev in events:
+                        if getattr(ev, "type", "") == "response.completed":
+                            usage = getattr(getattr(ev, "response", None), "usage", None)
+                        yield ev
+                except Exception:
+                    failed = True
+                    raise
+                finally:
+                    close = getattr(events, "close", None)
+                    if close is not None:
+                        close()          # consumer stopped early: drop the HTTP stream now
+                    _record(site, time.perf_counter() - t0, usage=usage, error=failed)
+                return
+        attempt += 1
+        time.sleep(delay)
@@ -0,0 +1,170 @@
+# memprofile.py — profile one document end to end: time, heap and RSS per stage + top allocation sites
+# ----------------------------------------------------------
+# Usage:
+#   python memprofile.py notes.pdf
+#   python memprofile.py lecture.txt --actions summary,chunks,embeddings --mode neural --frames 10
+#   python memprofile.py https://example.org/article --llm --json profile.json
+#
+#  - runs the same steps as the app (read bytes → PDF text → whitespace normalize → page actions),
+#    uncached, inside metrics spans with tracemalloc + RSS sampling on (metrics.enable_memory)
+#  - prints the stage tree (duration, heap still held, heap peak, RSS peak) and the source lines
+#    holding the most memory at the end, overall and per stage
+#  - the same per-stage numbers appear in the running app / API metrics with STUDYMATE_MEMPROFILE=1
+
+import os, re, sys, json, time, argparse, tempfile, tracemalloc, importlib.util
+from typing import Any, Callable, Dict, List, Optional
+
+import metrics
+
+ACTIONS = ["summary", "mcq", "flashcards", "deadlines", "chunks", "embeddings"]
+_IGNORE = [tracemalloc.Filter(False, tracemalloc.__file__), tracemalloc.Filter(False, "<frozen importlib._bootstrap*>"),
+           tracemalloc.Filter(False, "<unknown>"), tracemalloc.Filter(False, metrics.__file__)]
+
+def _snapshot() -> tracemalloc.Snapshot:
+    return tracemalloc.take_snapshot().filter_traces(_IGNORE)
+
+def top_sites(after: tracemalloc.Snapshot, before: tracemalloc.Snapshot, n: int = 15,
+              group: str = "lineno") -> List[Dict[str, Any]]:
+    """Allocation sites whose retained size grew the most between the two snapshots."""
+    out = []
+    for st in after.compare_to(before, group)[:n]:
+        if st.size_diff <= 0:
+            break
+        frames = [f"{f.filename}:{f.lineno}" for f in st.traceback]
+        out.append({"site": frames[-1] if group == "traceback" else frames[0], "traceback": frames,
+                    "size_mb": round(st.size_diff / 2 ** 20, 3), "blocks": st.count_diff})
+    return out
+
+# =========================
+# Document steps (mirror ui_utils.uploader_block + the pages)
+# =========================
+def load_text(source: str, extractor: str) -> str:
+    if re.match(r"https?://", source):
+        from ingest import from_url
+        return from_url(source)[1]
+    with metrics.span("read"):
+        with open(source, "rb") as f:
+            raw = f.read()                        # the app holds uploaded.read() like this
+    if source.lower().endswith(".pdf"):
+        with metrics.span("pdf_extract", extractor=extractor):
+            with tempfile.NamedTemporaryFile(delete=False, suffix=".pdf") as tmp:
+                tmp.write(raw)
+            try:
+                if extractor == "pypdf2":
+                    from nlp_tasks import extract_text_from_pdf
+                    text = extract_text_from_pdf(tmp.name)
+                else:
+                    from ingest import from_pdf
+                    text = from_pdf(tmp.name)[1]
+            finally:
+                os.unlink(tmp.name)
+    else:
+        with metrics.span("decode"):
+            text = raw.decode("utf-8", errors="replace")
+    with metrics.span("normalize"):
+        return re.sub(r"\s+", " ", text or "").strip()
+
+def _action(name: str, text: str, mode: str, llm: bool) -> Callable[[], Any]:
+    import nlp_tasks
+    from preprocess import make_chunks
+    if name == "summary":
+        return lambda: nlp_tasks.summarize(text, mode="llm" if llm else mode, target_words=150)
+    if name == "mcq":
+        return lambda: (nlp_tasks.make_mcq_llm if llm else nlp_tasks.make_mcq)(text, num_questions=6)
+    if name == "flashcards":
+        return lambda: (nlp_tasks.make_flashcards_llm if llm else nlp_tasks.make_flashcards)(text, num_cards=6)
+    if name == "deadlines":
+        return lambda: (nlp_tasks.extract_deadlines_llm if llm else nlp_tasks.extract_deadlines)(text)
+    if name == "chunks":
+        return lambda: make_chunks(text, chunk_size=800, overlap=150)
+    if name == "embeddings":
+        from model_registry import get_service
+        from precompute import EMBED_MODEL
+        return lambda: get_service().embed(EMBED_MODEL, make_chunks(text, chunk_size=800, overlap=150), normalize=True)
+    raise ValueError(f"unknown action {name!r}")
+
+def profile_document(source: str, actions: List[str], mode: str = "extractive", llm: bool = False,
+                     extractor: Optional[str] = None, frames: int = 1, top: int = 15,
+                     per_stage: int = 3) -> Dict[str, Any]:
+    metrics.enable_memory(frames=frames)
+    metrics.reset()
+    if extractor is None:
+        extractor = "pypdf2" if importlib.util.find_spec("PyPDF2") else "pdfminer"
+    group = "traceback" if frames > 1 else "lineno"
+    skipped, stage_sites, results = {}, {}, {}
+    base = _snapshot()
+
+    with metrics.span("document", source=os.path.basename(source) or source):
+        before = base
+        text = load_text(source, extractor)
+        after = _snapshot()
+        stage_sites["load"] = top_sites(after, before, per_stage, group)
+        for name in actions:
+            if name == "embeddings" and importlib.util.find_spec("sentence_transformers") is None:
+                skipped[name] = "sentence-transformers not installed"
+                continue
+            before = after
+            try:
+                with metrics.span(f"action.{name}"):
+                    results[name] = _action(name, text, mode, llm)()   # kept alive: retained memory is visible
+            except Exception as e:
+                skipped[name] = f"{type(e).__name__}: {e}"
+            after = _snapshot()
+            stage_sites[name] = top_sites(after, before, per_stage, group)
+
+    trace = metrics.recent_traces(1)[-1]
+    import resource
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return {
+        "source": source, "chars": len(text), "actions": actions, "skipped": skipped,
+        "trace": trace, "top_sites": top_sites(after, base, top, group), "stage_sites": stage_sites,
+        "process_peak_rss_mb": round(peak / 2 ** 20 if sys.platform == "darwin" else peak / 1024, 1),
+    }
+
+def print_report(rep: Dict[str, Any]) -> None:
+    print(f"{rep['source']} — {rep['chars']:,} chars after normalization\n")
+    print(metrics.format_trace(rep["trace"]))
+    for name, why in rep["skipped"].items():
+        print(f"  (skipped {name}: {why})")
+    print(f"\nprocess peak RSS: {rep['process_peak_rss_mb']:.0f} MB")
+    print("\nTop allocation sites still held at the end:")
+    for s in rep["top_sites"]:
+        print(f"  {s['size_mb']:>10.2f} MB  {s['blocks']:>8} blocks  {s['site']}")
+        for fr in reversed(s["traceback"][:-1][-4:]):     # nearest caller first
+            print(f"  {'':>30}  ↳ {fr}")
+    print("\nBy stage:")
+    for stage, sites in rep["stage_sites"].items():
+        print(f"  {stage}:")
+        for s in sites:
+            print(f"    {s['size_mb']:>10.2f} MB  {s['site']}")
+
+def main(argv: Optional[List[str]] = None) -> int:
+    ap = argparse.ArgumentParser(description="Per-stage time / memory profile of one document.")
+    ap.add_argument("source", help="PDF, .txt/.md file or http(s) URL")
+    ap.add_argument("--actions", default="summary,mcq,flashcards,deadlines,chunks",
+                    help=f"comma list of: {', '.join(ACTIONS)}")
+    ap.add_argument("--mode", default="extractive", choices=["extractive", "neural"], help="local summarizer")
+    ap.add_argument("--llm", action="store_true", help="LLM variants (STUDYMATE_LLM_BACKEND=mock works offline)")
+    ap.add_argument("--extractor", choices=["pypdf2", "pdfminer"], default=None,
+                    help="PDF text extractor (default: PyPDF2, as the app's uploader)")
+    ap.add_argument("--frames", type=int, default=1, help="traceback depth per allocation site (slower when > 1)")
+    ap.add_argument("--top", type=int, default=15)
+    ap.add_argument("--json", default=None, help="also write the report as JSON")
+    args = ap.parse_args(argv)
+
+    actions = [a.strip() for a in args.actions.split(",") if a.strip()]
+    bad = [a for a in actions if a not in ACTIONS]
+    if bad:
+        ap.error(f"unknown action(s): {', '.join(bad)}")
+    t0 = time.perf_counter()
+    rep = profile_document(args.source, actions, mode=args.mode, llm=args.llm, extractor=args.extractor,
+                           frames=args.frames, top=args.top)
+    print_report(rep)
+    print(f"\n(profiled in {time.perf_counter() - t0:.1f}s)")
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(rep, f, indent=2, default=str)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,366 @@
+# metrics.py — spans, counters and histograms for StudyMate's pipelines
+# ----------------------------------------------------------
+#  - off unless STUDYMATE_METRICS=1 (or enable()): span() then returns a shared no-op and
+#    inc() / observe() return immediately, so instrumented code costs one flag check
+#  - span("chunk", ...): nested per request (ingest → clean → chunk → model / llm → render);
+#    the outermost span is the request, children in worker threads attach via bind(fn)
+#  - every span feeds the studymate_stage_seconds{stage} histogram; finished requests are kept
+#    (last STUDYMATE_TRACE_KEEP) for the debug panel and appended to STUDYMATE_METRICS_JSONL
+#  - counters: cache hits / misses, fallbacks, LLM requests and token usage
+#  - prometheus_text(): Prometheus exposition format; snapshot(): the same as JSON
+#  - memory (opt-in, STUDYMATE_MEMPROFILE=1 or enable_memory()): each span also records the
+#    tracemalloc allocation delta, the Python-heap peak above its start, and RSS growth / peak
+#    (sampled by a background thread, so native model loads show up too); tracemalloc and RSS
+#    are process-wide, so concurrent requests share the attribution (memprofile.py profiles one
+#    document on its own)
+
+import os, json, time, uuid, threading, functools, contextvars, tracemalloc
+from collections import defaultdict, deque
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+_ENABLED = os.getenv("STUDYMATE_METRICS", "0") == "1"
+METRICS_JSONL = os.getenv("STUDYMATE_METRICS_JSONL", "").strip()
+TRACE_KEEP = int(os.getenv("STUDYMATE_TRACE_KEEP", "50"))
+
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+_MB = 2 ** 20
+BYTE_BUCKETS = tuple(float(_MB * 4 ** i) for i in range(7))          # 1 MB .. 4 GB
+_BUCKETS_BY_NAME = {"studymate_stage_alloc_bytes": BYTE_BUCKETS, "studymate_stage_rss_bytes": BYTE_BUCKETS}
+
+HELP = {
+    "studymate_stage_seconds": ("histogram", "Duration of a pipeline stage (span)."),
+    "studymate_cache_total": ("counter", "Cache lookups by cache, action and outcome."),
+    "studymate_fallbacks_total": ("counter", "Requests served by a fallback backend."),
+    "studymate_llm_requests_total": ("counter", "LLM API requests by call site and outcome."),
+    "studymate_llm_tokens_total": ("counter", "LLM tokens by call site and direction."),
+    "studymate_llm_seconds": ("histogram", "LLM API request latency by call site."),
+    "studymate_stage_alloc_bytes": ("histogram", "Python-heap peak above the start of a stage (tracemalloc)."),
+    "studymate_stage_rss_bytes": ("histogram", "Resident-set peak above the start of a stage."),
+    "studymate_dedup_units_total": ("counter", "Chunks / passages / documents kept or dropped as near-duplicates."),
+    "studymate_dedup_chars_total": ("counter", "Characters dropped as near-duplicates before embedding / LLM calls."),
+    "studymate_import_seconds": ("histogram", "Time to import a deferred heavy module (lazy_imports)."),
+}
+
+def enabled() -> bool:
+    return _ENABLED
+
+def enable(on: bool = True) -> None:
+    global _ENABLED
+    _ENABLED = bool(on)
+
+# =========================
+# Counters / histograms
+# =========================
+_LOCK = threading.Lock()
+_COUNTERS: Dict[Tuple[str, Tuple], float] = defaultdict(float)
+_HISTS: Dict[Tuple[str, Tuple], List[float]] = {}     # [bucket counts..., +Inf count, sum]
+
+def _labels(labels: Dict[str, Any]) -> Tuple:
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+def inc(name: str, value: float = 1.0, **labels: Any) -> None:
+    if not _ENABLED:
+        return
+    key = (name, _labels(labels))
+    with _LOCK:
+        _COUNTERS[key] += value
+
+def observe(name: str, value: float, **labels: Any) -> None:
+    if not _ENABLED:
+        return
+    key = (name, _labels(labels))
+    buckets = _BUCKETS_BY_NAME.get(name, BUCKETS)
+    with _LOCK:
+        h = _HISTS.get(key)
+        if h is None:
+            h = _HISTS[key] = [0.0] * (len(buckets) + 2)
+        for i, b in enumerate(buckets):
+            if value <= b:
+                h[i] += 1
+                break
+        else:
+            h[len(buckets)] += 1
+        h[-1] += value
+
+# =========================
+# Memory sampling
+# =========================
+_MEMORY = False
+
+def _rss_bytes() -> int:
+    from model_registry import _rss_bytes as rss
+    return rss()
+
+class _RssSampler:
+    """Background thread tracking the highest RSS seen since the last reset()."""
+    def __init__(self, interval_s: float = 0.02):
+        self.interval_s = interval_s
+        self.peak = _rss_bytes()
+        self._lock = threading.Lock()
+        threading.Thread(target=self._loop, name="rss-sampler", daemon=True).start()
+
+    def _loop(self):
+        while True:
+            time.sleep(self.interval_s)
+            self.sample()
+
+    def sample(self) -> int:
+        rss = _rss_bytes()
+        with self._lock:
+            self.peak = max(self.peak, rss)
+        return rss
+
+    def reset(self) -> Tuple[int, int]:
+        """(current RSS, peak since the previous reset); the peak restarts from current."""
+        rss = _rss_bytes()
+        with self._lock:
+            peak, self.peak = max(self.peak, rss), rss
+        return rss, peak
+
+_SAMPLER: Optional[_RssSampler] = None
+
+def memory_enabled() -> bool:
+    return _ENABLED and _MEMORY
+
+def enable_memory(on: bool = True, frames: int = 1) -> None:
+    """Turn per-span memory accounting on (also turns metrics on); frames = tracemalloc traceback depth."""
+    global _MEMORY, _SAMPLER
+    if on:
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(frames)
+        if _SAMPLER is None:
+            _SAMPLER = _RssSampler()
+        enable(True)
+    _MEMORY = bool(on)
+
+def _mem_enter(s: "Span") -> None:
+    # close the parent's running peak before restarting the peak counters for this span
+    cur, peak = tracemalloc.get_traced_memory()
+    rss, rss_peak = _SAMPLER.reset()
+    p = s.parent
+    if p is not None and p.mem is not None and "heap0" in p.mem:
+        p.mem["heap_peak"] = max(p.mem["heap_peak"], peak)
+        p.mem["rss_peak"] = max(p.mem["rss_peak"], rss_peak)
+    tracemalloc.reset_peak()
+    s.mem = {"heap0": cur, "heap_peak": cur, "rss0": rss, "rss_peak": rss}
+
+def _mem_exit(s: "Span") -> None:
+    m = s.mem
+    cur, peak = tracemalloc.get_traced_memory()
+    rss = _SAMPLER.sample()
+    m["heap_peak"] = max(m["heap_peak"], peak)
+    m["rss_peak"] = max(m["rss_peak"], _SAMPLER.peak)
+    p = s.parent
+    if p is not None and p.mem is not None and "heap0" in p.mem:   # the child's peaks happened inside the parent too
+        p.mem["heap_peak"] = max(p.mem["heap_peak"], m["heap_peak"])
+        p.mem["rss_peak"] = max(p.mem["rss_peak"], m["rss_peak"])
+    s.mem = {
+        "alloc_mb": round((cur - m["heap0"]) / _MB, 3),                 # still held after the stage
+        "heap_peak_mb": round((m["heap_peak"] - m["heap0"]) / _MB, 3),  # transient high-water mark
+        "rss_mb": round(rss / _MB, 1),
+        "rss_delta_mb": round((rss - m["rss0"]) / _MB, 1),
+        "rss_peak_mb": round((m["rss_peak"] - m["rss0"]) / _MB, 1),
+    }
+    observe("studymate_stage_alloc_bytes", m["heap_peak"] - m["heap0"], stage=s.name)
+    observe("studymate_stage_rss_bytes", m["rss_peak"] - m["rss0"], stage=s.name)
+
+# =========================
+# Spans
+# =========================
+_CURRENT: "contextvars.ContextVar[Optional[Span]]" = contextvars.ContextVar("studymate_span", default=None)
+_TRACES: deque = deque(maxlen=TRACE_KEEP)
+_JSONL_LOCK = threading.Lock()
+
+class _NoopSpan:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def set(self, **attrs: Any) -> None:
+        pass
+
+_NOOP = _NoopSpan()
+
+class Span:
+    __slots__ = ("name", "attrs", "parent", "children", "start", "t0", "duration", "error", "mem", "_token", "_lock")
+
+    def __init__(self, name: str, attrs: Dict[str, Any]):
+        self.name = name
+        self.attrs = attrs
+        self.children: List["Span"] = []
+        self.duration = 0.0
+        self.error: Optional[str] = None
+        self.mem: Optional[Dict[str, Any]] = None
+
+    def set(self, **attrs: Any) -> None:
+        self.attrs.update(attrs)
+
+    def __enter__(self):
+        self.parent = _CURRENT.get()
+        self._lock = self.parent._lock if self.parent is not None else threading.Lock()
+        if _MEMORY:
+            _mem_enter(self)
+        self.start, self.t0 = time.time(), time.perf_counter()
+        self._token = _CURRENT.set(self)
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.duration = time.perf_counter() - self.t0
+        if self.mem is not None:
+            _mem_exit(self)
+        if exc_type is not None:
+            self.error = exc_type.__name__
+        try:
+            _CURRENT.reset(self._token)
+        except ValueError:                 # exited from another context (e.g. a generator moved threads)
+            _CURRENT.set(self.parent)
+        observe("studymate_stage_seconds", self.duration, stage=self.name)
+        if self.parent is not None:
+            with self._lock:
+                self.parent.children.append(self)
+        else:
+            _finish(self)
+        return False
+
+    def to_rows(self, root_start: float, depth: int = 0) -> List[Dict[str, Any]]:
+        row = {"name": self.name, "depth": depth, "offset_s": round(self.start - root_start, 4),
+               "duration_s": round(self.duration, 4)}
+        if self.attrs:
+            row["attrs"] = self.attrs
+        if self.mem is not None:
+            row["mem"] = self.mem
+        if self.error:
+            row["error"] = self.error
+        rows = [row]
+        for c in sorted(self.children, key=lambda c: c.start):
+            rows.extend(c.to_rows(root_start, depth + 1))
+        return rows
+
+def span(name: str, **attrs: Any):
+    """Context manager timing one stage; nested spans form a request trace."""
+    if not _ENABLED:
+        return _NOOP
+    return Span(name, attrs)
+
+def traced(name: str):
+    """Decorator: run the function inside span(name)."""
+    def deco(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            if not _ENABLED:
+                return fn(*args, **kwargs)
+            with Span(name, {}):
+                return fn(*args, **kwargs)
+        return wrapper
+    return deco
+
+def bind(fn: Callable) -> Callable:
+    """fn bound to the caller's span, for work submitted to a thread pool."""
+    if not _ENABLED or _CURRENT.get() is None:
+        return fn
+    ctx = contextvars.copy_context()
+    return lambda *a, **kw: ctx.run(fn, *a, **kw)
+
+def _finish(root: Span) -> None:
+    trace = {"trace_id": uuid.uuid4().hex[:12], "name": root.name, "start": round(root.start, 3),
+             "duration_s": round(root.duration, 4), "error": root.error, "spans": root.to_rows(root.start)}
+    with _LOCK:
+        _TRACES.append(trace)
+    if METRICS_JSONL:
+        line = json.dumps(trace, ensure_ascii=False, default=str) + "\n"
+        with _JSONL_LOCK:
+            with open(METRICS_JSONL, "a", encoding="utf-8") as f:
+                f.write(line)
+
+def recent_traces(n: int = TRACE_KEEP) -> List[Dict[str, Any]]:
+    with _LOCK:
+        return list(_TRACES)[-n:]
+
+def slowest_stages(n_traces: int = TRACE_KEEP, top: int = 10) -> List[Dict[str, Any]]:
+    """Stages of the last n_traces requests ranked by total time (self time included in parents)."""
+    agg: Dict[str, List[float]] = defaultdict(list)
+    peaks: Dict[str, float] = {}
+    for t in recent_traces(n_traces):
+        for s in t["spans"]:
+            agg[s["name"]].append(s["duration_s"])
+            if "mem" in s:
+                m = s["mem"]
+                peaks[s["name"]] = max(peaks.get(s["name"], 0.0), m["heap_peak_mb"], m["rss_peak_mb"])
+    rows = [{"stage": k, "count": len(v), "total_s": round(sum(v), 3), "mean_s": round(sum(v) / len(v), 4),
+             "max_s": round(max(v), 4)} for k, v in agg.items()]
+    for r in rows:
+        if r["stage"] in peaks:
+            r["max_peak_mb"] = round(peaks[r["stage"]], 1)
+    return sorted(rows, key=lambda r: r["total_s"], reverse=True)[:top]
+
+def format_trace(trace: Dict[str, Any]) -> str:
+    """Indented stage tree: duration, offset and (when profiled) heap / RSS columns."""
+    lines = []
+    for s in trace["spans"]:
+        name = ("  " * s["depth"] + s["name"])[:30]
+        line = f"{name:<30} {s['duration_s']:>8.3f}s  +{s['offset_s']:<8.3f}"
+        m = s.get("mem")
+        if m:
+            line += (f"  heap +{m['alloc_mb']:>8.1f} MB peak {m['heap_peak_mb']:>8.1f} MB"
+                     f"  rss {m['rss_mb']:>7.0f} MB (+{m['rss_peak_mb']:.0f} peak)")
+        lines.append(line + (f"  !{s['error']}" if s.get("error") else ""))
+    return "\n".join(lines)
+
+# =========================
+# Export
+# =========================
+def _fmt_labels(labels: Tuple, extra: Tuple = ()) -> str:
+    items = list(labels) + list(extra)
+    if not items:
+        return ""
+    esc = lambda v: v.replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+    return "{" + ",".join(f'{k}="{esc(v)}"' for k, v in items) + "}"
+
+def prometheus_text() -> str:
+    with _LOCK:
+        counters = dict(_COUNTERS)
+        hists = {k: list(v) for k, v in _HISTS.items()}
+    lines, seen = [], set()
+
+    def _header(name: str) -> None:
+        if name not in seen:
+            seen.add(name)
+            kind, text = HELP.get(name, ("untyped", name))
+            lines.extend([f"# HELP {name} {text}", f"# TYPE {name} {kind}"])
+
+    for (name, labels), v in sorted(counters.items()):
+        _header(name)
+        lines.append(f"{name}{_fmt_labels(labels)} {v:g}")
+    for (name, labels), h in sorted(hists.items()):
+        _header(name)
+        buckets = _BUCKETS_BY_NAME.get(name, BUCKETS)
+        cum = 0.0
+        for b, n in zip(buckets, h):
+            cum += n
+            lines.append(f"{name}_bucket{_fmt_labels(labels, (('le', f'{b:g}'),))} {cum:g}")
+        cum += h[len(buckets)]
+        lines.append(f"{name}_bucket{_fmt_labels(labels, (('le', '+Inf'),))} {cum:g}")
+        lines.append(f"{name}_sum{_fmt_labels(labels)} {h[-1]:.6f}")
+        lines.append(f"{name}_count{_fmt_labels(labels)} {cum:g}")
+    return "\n".join(lines) + "\n"
+
+def snapshot() -> Dict[str, Any]:
+    with _LOCK:
+        counters = [{"name": n, "labels": dict(l), "value": v} for (n, l), v in sorted(_COUNTERS.items())]
+        hists = []
+        for (n, l), h in sorted(_HISTS.items()):
+            count = sum(h[:-1])
+            hists.append({"name": n, "labels": dict(l), "count": int(count), "sum": round(h[-1], 6),
+                          "mean": round(h[-1] / count, 6) if count else None})
+    return {"enabled": _ENABLED, "counters": counters, "histograms": hists}
+
+def reset() -> None:
+    with _LOCK:
+        _COUNTERS.clear()
+        _HISTS.clear()
+        _TRACES.clear()
+
+if os.getenv("STUDYMATE_MEMPROFILE", "0") == "1":
+    enable_memory(frames=int(os.getenv("STUDYMATE_MEMPROFILE_FRAMES", "1")))
@@ -0,0 +1,313 @@
+# mock_llm.py — deterministic offline stand-in for the OpenAI Responses API
+# ----------------------------------------------------------
+#  - STUDYMATE_LLM_BACKEND=mock: _get_openai_client() returns MockClient (no key, no network);
+#    every *_llm path, the response cache, llm_client limits/retries and token accounting run as usual
+#  - outputs are a pure function of (model, prompt, STUDYMATE_MOCK_SEED) and match what each call
+#    site parses: {"questions"}, {"cards"}, {"deadlines"}, {"topics"}, summaries, Markdown reports
+#  - STUDYMATE_MOCK_LATENCY   time to first token: "fixed:200", "uniform:100:600",
+#                             "lognormal:300:0.6" (median ms, sigma)          default lognormal:250:0.5
+#  - STUDYMATE_MOCK_TPS       output tokens / second after the first one (0 = instant)   default 0
+#  - STUDYMATE_MOCK_ERROR_RATE  share of requests failing with STUDYMATE_MOCK_ERROR_CODES (429,500,503)
+#  - STUDYMATE_MOCK_FILL      share of max_output_tokens used by free-text answers        default 0.7
+#  - HTTP mode for testing the real SDK + connection pool against it:
+#      python mock_llm.py --serve 127.0.0.1:6200    then    OPENAI_BASE_URL=http://127.0.0.1:6200/v1
+
+import os, re, json, math, time, random, hashlib, threading
+from datetime import date
+from types import SimpleNamespace
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+MOCK_SEED = int(os.getenv("STUDYMATE_MOCK_SEED", "0"))
+MOCK_LATENCY = os.getenv("STUDYMATE_MOCK_LATENCY", "lognormal:250:0.5")
+MOCK_TPS = float(os.getenv("STUDYMATE_MOCK_TPS", "0"))
+MOCK_ERROR_RATE = float(os.getenv("STUDYMATE_MOCK_ERROR_RATE", "0"))
+MOCK_ERROR_CODES = [int(c) for c in os.getenv("STUDYMATE_MOCK_ERROR_CODES", "429,500,503").split(",") if c.strip()]
+MOCK_FILL = float(os.getenv("STUDYMATE_MOCK_FILL", "0.7"))
+
+class MockAPIError(Exception):
+    """Shaped like openai.APIStatusError as far as llm_client's retry logic is concerned."""
+    def __init__(self, status_code: int):
+        super().__init__(f"mock error {status_code}")
+        self.status_code = status_code
+        self.response = SimpleNamespace(status_code=status_code, headers={})
+
+def _parse_latency(spec: str):
+    kind, _, rest = spec.partition(":")
+    args = [float(a) for a in rest.split(":") if a]
+    if kind == "fixed":
+        return lambda rng: args[0] / 1000
+    if kind == "uniform":
+        return lambda rng: rng.uniform(args[0], args[1]) / 1000
+    if kind == "lognormal":
+        return lambda rng: rng.lognormvariate(math.log(max(args[0], 1e-3)), args[1] if len(args) > 1 else 0.5) / 1000
+    raise ValueError(f"bad STUDYMATE_MOCK_LATENCY: {spec!r}")
+
+# =========================
+# Deterministic answers
+# =========================
+_SENT = re.compile(r"(?<=[.!?])\s+")
+_WORD = re.compile(r"[A-Za-z][A-Za-z\-']+")
+_MONTHS = ["jan", "feb", "mar", "apr", "may", "jun", "jul", "aug", "sep", "oct", "nov", "dec"]
+_MONTH_DATE = re.compile(r"\b(jan|feb|mar|apr|may|jun|jul|aug|sep|oct|nov|dec)[a-z]*\.?\s+(\d{1,2})(?:st|nd|rd|th)?"
+                         r"(?:,?\s+(\d{4}))?(?:\s+at\s+(\d{1,2})(?::(\d{2}))?\s*([ap]m))?", re.I)
+
+def _tokens(text: str) -> int:
+    import token_budget
+    return token_budget.count_tokens(text)
+
+def _source_text(user: str) -> str:
+    """The document part of a prompt (after 'Text:' / 'from:' / 'Notes:' ...), else the whole prompt."""
+    m = re.search(r"(?:Text:|Notes:|from:|\(cleaned\):|words\):)\s*\n(.*)", user, flags=re.S)
+    body = m.group(1) if m else user
+    return re.split(r"\n\n(?:Return JSON|Generate \d+|Propose \d|Relevant sources)", body)[0]
+
+def _sentences(text: str) -> List[str]:
+    sents = [s.strip() for s in _SENT.split(re.sub(r"\s+", " ", text)) if len(s.split()) >= 4]
+    return sents or ["This document covers the main ideas of the course material."]
+
+def _first_int(pattern: str, s: str, default: int) -> int:
+    m = re.search(pattern, s)
+    return int(m.group(1)) if m else default
+
+def _mcq(rng: random.Random, text: str, n: int) -> Dict[str, Any]:
+    sents = _sentences(text)
+    qs = []
+    for i in range(n):
+        s = sents[rng.randrange(len(sents))]
+        words = [w for w in _WORD.findall(s) if len(w) > 4] or ["concept"]
+        ans = rng.choice(words)
+        pool = list(dict.fromkeys(w for w in _WORD.findall(text[:4000]) if len(w) > 4 and w.lower() != ans.lower()))
+        opts = [ans] + rng.sample(pool, min(3, len(pool)))
+        opts += [f"Option {chr(65 + j)}" for j in range(4 - len(opts))]
+        rng.shuffle(opts)
+        qs.append({"question": s.replace(ans, "____", 1), "options": opts, "answer": ans})
+    return {"questions": qs}
+
+def _cards(rng: random.Random, text: str, n: int) -> Dict[str, Any]:
+    sents = _sentences(text)
+    cards = []
+    for i in range(n):
+        s = sents[rng.randrange(len(sents))]
+        words = [w for w in _WORD.findall(s) if len(w) > 4] or ["this"]
+        cards.append({"question": f"What does the text say about {rng.choice(words)}?", "answer": s})
+    return {"cards": cards}
+
+def _deadlines(text: str) -> Dict[str, Any]:
+    out, seen = [], set()
+    for m in _MONTH_DATE.finditer(text):
+        try:
+            year = int(m.group(3) or date.today().year)
+            d = date(year, _MONTHS.index(m.group(1).lower()[:3]) + 1, int(m.group(2)))
+        except ValueError:
+            continue
+        t = ""
+        if m.group(4):
+            h = int(m.group(4)) % 12 + (12 if m.group(6).lower() == "pm" else 0)
+            t = f"{h:02d}:{int(m.group(5) or 0):02d}"
+        if (d, m.group(0).lower()) in seen:
+            continue
+        seen.add((d, m.group(0).lower()))
+        ctx = text[max(0, m.start() - 60):m.end() + 20].strip()
+        out.append({"match": m.group(0), "iso_date": d.isoformat(), "time": t, "context": ctx})
+    return {"deadlines": out}
+
+def _topics(rng: random.Random, text: str) -> Dict[str, Any]:
+    words = list(dict.fromkeys(w.lower() for w in _WORD.findall(text) if len(w) > 6))
+    return {"topics": words[:rng.randint(3, 5)] or ["study skills"]}
+
+def _prose(rng: random.Random, text: str, n_words: int) -> str:
+    sents, out, n = _sentences(text), [], 0
+    while n < n_words:
+        s = sents[rng.randrange(len(sents))]
+        out.append(s)
+        n += len(s.split())
+    return " ".join(out)
+
+def _report(rng: random.Random, text: str, n_words: int, n_sources: int) -> str:
+    cite = lambda: f" [{rng.randint(1, n_sources)}]" if n_sources else ""
+    per = max(20, n_words // 5)
+    parts = ["# Study Report", "", "## Abstract", _prose(rng, text, per // 2) + cite(), "",
+             "## Key concepts", *[f"- {_prose(rng, text, per // 4)}{cite()}" for _ in range(3)], "",
+             "## Worked example", _prose(rng, text, per), "",
+             "## FAQ", f"**Q:** What is the main idea?  \n**A:** {_prose(rng, text, per // 3)}", "",
+             "## Sources", *[f"{i}. Source {i}" for i in range(1, n_sources + 1)]]
+    return "\n".join(parts)
+
+def answer(model: str, system: str, user: str, max_output_tokens: int) -> str:
+    """The mock's reply: deterministic for (seed, model, prompt), shaped for the call site."""
+    digest = hashlib.sha256(json.dumps([MOCK_SEED, model, system, user]).encode("utf-8")).digest()
+    rng = random.Random(int.from_bytes(digest[:8], "big"))
+    text = _source_text(user)
+    if '"questions"' in system:
+        out = _mcq(rng, text, _first_int(r"Generate (\d+) MCQs", user, 5))
+    elif '"cards"' in system:
+        out = _cards(rng, text, _first_int(r"Make (\d+) flashcards", user, 5))
+    elif "deadlines" in system.lower() or '"deadlines"' in user:
+        out = _deadlines(text)
+    elif '"topics"' in system:
+        out = _topics(rng, text)
+    elif "report in Markdown" in system:
+        return _report(rng, text, _first_int(r"Write a (\d+)", user, 300), len(re.findall(r"^\[\d+\] ", user, re.M)))
+    elif "JSON" in system:
+        out = {}
+    else:
+        budget = int(max_output_tokens * MOCK_FILL / 1.35)     # ~tokens per word, as token_budget assumes
+        return _prose(rng, text, max(10, min(budget, _first_int(r"about (\d+) words", user, budget))))
+    return json.dumps(out, ensure_ascii=False)
+
+# =========================
+# In-process client (client.responses.create)
+# =========================
+class _Responses:
+    def __init__(self, client: "MockClient"):
+        self._client = client
+
+    def create(self, model: str, input: List[Dict[str, str]], max_output_tokens: int = 800,
+               stream: bool = False, **_ignored) -> Any:
+        c = self._client
+        system = "\n".join(m["content"] for m in input if m.get("role") == "system")
+        user = "\n".join(m["content"] for m in input if m.get("role") != "system")
+        delay, fail = c.sample()
+        time.sleep(delay)
+        if fail:
+            raise MockAPIError(fail)
+        txt = answer(model, system, user, max_output_tokens)
+        usage = SimpleNamespace(input_tokens=_tokens(system + user), output_tokens=_tokens(txt))
+        usage.total_tokens = usage.input_tokens + usage.output_tokens
+        c.count(usage)
+        if not stream:
+            return SimpleNamespace(output_text=txt, usage=usage, model=model, status="completed")
+        return self._events(txt, usage)
+
+    @staticmethod
+    def _events(txt: str, usage: Any) -> Iterator[Any]:
+        for delta, pause in _deltas(txt):
+            if pause:
+                time.sleep(pause)
+            yield SimpleNamespace(type="response.output_text.delta", delta=delta)
+        yield SimpleNamespace(type="response.completed", response=SimpleNamespace(usage=usage, output_text=txt))
+
+def _deltas(txt: str) -> Iterator[Tuple[str, float]]:
+    """Word-sized deltas, paced at MOCK_TPS output tokens per second."""
+    for piece in re.findall(r"\S+\s*|\s+", txt):
+        yield piece, (_tokens(piece) / MOCK_TPS if MOCK_TPS > 0 else 0.0)
+
+class MockClient:
+    def __init__(self, latency: str = MOCK_LATENCY, error_rate: float = MOCK_ERROR_RATE, seed: int = MOCK_SEED):
+        self._latency = _parse_latency(latency)
+        self.error_rate = error_rate
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self.responses = _Responses(self)
+        self.stats = {"requests": 0, "errors": 0, "input_tokens": 0, "output_tokens": 0}
+
+    def sample(self) -> Tuple[float, Optional[int]]:
+        """(latency_s, error status or None) from the configured distributions (reproducible sequence)."""
+        with self._lock:
+            self.stats["requests"] += 1
+            delay = self._latency(self._rng)
+            if self._rng.random() < self.error_rate:
+                self.stats["errors"] += 1
+                return delay, self._rng.choice(MOCK_ERROR_CODES)
+            return delay, None
+
+    def count(self, usage: Any) -> None:
+        with self._lock:
+            self.stats["input_tokens"] += usage.input_tokens
+            self.stats["output_tokens"] += usage.output_tokens
+
+_CLIENT: Optional[MockClient] = None
+_CLIENT_LOCK = threading.Lock()
+
+def get_client() -> MockClient:
+    global _CLIENT
+    if _CLIENT is None:
+        with _CLIENT_LOCK:
+            if _CLIENT is None:
+                _CLIENT = MockClient()
+    return _CLIENT
+
+# =========================
+# HTTP server (POST /v1/responses, JSON or SSE)
+# =========================
+def _response_obj(rid: str, model: str, txt: str, usage: Any) -> Dict[str, Any]:
+    return {
+        "id": rid, "object": "response", "created_at": int(time.time()), "model": model, "status": "completed",
+        "output": [{"id": f"msg_{rid[5:]}", "type": "message", "role": "assistant", "status": "completed",
+                    "content": [{"type": "output_text", "text": txt, "annotations": []}]}],
+        "usage": {"input_tokens": usage.input_tokens, "output_tokens": usage.output_tokens,
+                  "total_tokens": usage.total_tokens},
+    }
+
+def serve(addr: str = "127.0.0.1:6200") -> None:
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+    client = get_client()
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, *args):
+            pass
+
+        def _json(self, code: int, obj: Dict[str, Any]) -> None:
+            body = json.dumps(obj).encode("utf-8")
+            self.send_response(code)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_POST(self):
+            if self.path.rstrip("/") not in ("/v1/responses", "/responses"):
+                return self._json(404, {"error": {"message": f"no route {self.path}"}})
+            req = json.loads(self.rfile.read(int(self.headers.get("Content-Length") or 0)) or b"{}")
+            msgs = req.get("input") or []
+            if isinstance(msgs, str):
+                msgs = [{"role": "user", "content": msgs}]
+            model, max_out = req.get("model", "mock"), int(req.get("max_output_tokens") or 800)
+            try:
+                resp = client.responses.create(model=model, input=msgs, max_output_tokens=max_out)
+            except MockAPIError as e:
+                return self._json(e.status_code, {"error": {"message": str(e), "type": "mock_error"}})
+            rid = "resp_" + hashlib.sha1(f"{time.time_ns()}".encode()).hexdigest()[:20]
+            if not req.get("stream"):
+                return self._json(200, _response_obj(rid, model, resp.output_text, resp.usage))
+            self.send_response(200)
+            self.send_header("Content-Type", "text/event-stream")
+            self.send_header("Cache-Control", "no-cache")
+            self.send_header("Connection", "close")
+            self.end_headers()
+            seq = 0
+
+            def _event(etype: str, data: Dict[str, Any]) -> None:
+                nonlocal seq
+                data = {"type": etype, "sequence_number": seq, **data}
+                seq += 1
+                self.wfile.write(f"event: {etype}\ndata: {json.dumps(data)}\n\n".encode("utf-8"))
+                self.wfile.flush()
+
+            created = _response_obj(rid, model, "", resp.usage)
+            created.update(status="in_progress", output=[])
+            _event("response.created", {"response": created})
+            for delta, pause in _deltas(resp.output_text):
+                if pause:
+                    time.sleep(pause)
+                _event("response.output_text.delta", {"item_id": f"msg_{rid[5:]}", "output_index": 0,
+                                                      "content_index": 0, "delta": delta})
+            _event("response.completed", {"response": _response_obj(rid, model, resp.output_text, resp.usage)})
+            self.close_connection = True
+
+    server = ThreadingHTTPServer(_addr(addr), Handler)
+    server.daemon_threads = True
+    print(f"mock Responses API on http://{addr}/v1  (OPENAI_BASE_URL=http://{addr}/v1)")
+    server.serve_forever()
+
+def _addr(addr: str) -> Tuple[str, int]:
+    host, _, port = addr.rpartition(":")
+    return host or "127.0.0.1", int(port)
+
+if __name__ == "__main__":
+    import argparse
+    ap = argparse.ArgumentParser(description="Deterministic mock of the OpenAI Responses API.")
+    ap.add_argument("--serve", default="127.0.0.1:6200", metavar="HOST:PORT")
+    serve(ap.parse_args().serve)
@@ -0,0 +1,295 @@
+# model_registry.py — load each local model once per process, share it across sessions
+# ----------------------------------------------------------
+#  - REGISTRY.get(key): lazy load under a per-model lock ("summarization:<hf id>",
+#    "embedding:<sentence-transformers id>", "seq2seq:<hf id>")
+#  - inference runs under that model's lock (HF pipelines / tokenizers are not thread-safe)
+#  - stats(): per-model parameter memory + RSS growth at load, uses, idle time
+#  - models idle for longer than STUDYMATE_MODEL_IDLE_TTL seconds are unloaded (0 = never)
+#  - get_service(): in-process by default; with STUDYMATE_MODEL_SERVER=host:port every app
+#    worker talks to one shared model server instead of loading its own copy:
+#      python model_registry.py --serve 127.0.0.1:6100 --preload summarization:sshleifer/distilbart-cnn-12-6
+#  - the server unpickles whatever an authenticated client sends: STUDYMATE_MODEL_AUTHKEY is the only
+#    guard (no default; serve() generates and prints one when unset), and binding anything other
+#    than loopback prints a warning
+
+import os, gc, time, threading
+from typing import Any, Callable, Dict, List, Optional
+
+MODEL_IDLE_TTL_S = float(os.getenv("STUDYMATE_MODEL_IDLE_TTL", "1800"))
+MODEL_SERVER = os.getenv("STUDYMATE_MODEL_SERVER", "").strip()          # "host:port" or empty
+MODEL_SERVER_AUTHKEY = os.getenv("STUDYMATE_MODEL_AUTHKEY", "").encode("utf-8")         # shared secret, no default
+
+def _rss_bytes() -> int:
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except Exception:
+        import resource
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+def _param_bytes(obj: Any) -> int:
+    """Bytes held by torch parameters/buffers reachable from a model, pipeline or (tokenizer, model)."""
+    mods = []
+    for o in (obj if isinstance(obj, tuple) else (obj,)):
+        m = getattr(o, "model", o)     # transformers pipeline -> .model
+        if hasattr(m, "parameters"):
+            mods.append(m)
+    total = 0
+    for m in mods:
+        try:
+            for t in list(m.parameters()) + list(m.buffers()):
+                total += t.numel() * t.element_size()
+        except Exception:
+            pass
+    return total
+
+# =========================
+# Loaders
+# =========================
+def _load_summarization(model_name: str):
+    from transformers import pipeline
+    return pipeline("summarization", model=model_name, tokenizer=model_name, framework="pt")
+
+def _load_embedding(model_name: str):
+    from sentence_transformers import SentenceTransformer
+    return SentenceTransformer(model_name)
+
+def _load_seq2seq(model_name: str):
+    from transformers import AutoTokenizer, AutoModelForSeq2SeqLM
+    return AutoTokenizer.from_pretrained(model_name), AutoModelForSeq2SeqLM.from_pretrained(model_name)
+
+LOADERS: Dict[str, Callable[[str], Any]] = {
+    "summarization": _load_summarization,
+    "embedding": _load_embedding,
+    "seq2seq": _load_seq2seq,
+}
+
+# =========================
+# Registry
+# =========================
+class _Entry:
+    __slots__ = ("lock", "model", "loaded_at", "last_used", "uses", "param_bytes", "rss_delta", "load_s")
+
+    def __init__(self):
+        self.lock = threading.RLock()
+        self.model = None
+        self.loaded_at = self.last_used = 0.0
+        self.uses = 0
+        self.param_bytes = self.rss_delta = 0
+        self.load_s = 0.0
+
+class ModelRegistry:
+    def __init__(self, idle_ttl_s: float = MODEL_IDLE_TTL_S):
+        self.idle_ttl_s = idle_ttl_s
+        self._entries: Dict[str, _Entry] = {}
+        self._lock = threading.Lock()
+        self._reaper: Optional[threading.Thread] = None
+
+    def _entry(self, key: str) -> _Entry:
+        with self._lock:
+            e = self._entries.get(key)
+            if e is None:
+                e = self._entries[key] = _Entry()
+            return e
+
+    def _load(self, key: str, e: _Entry) -> None:
+        kind, _, name = key.partition(":")
+        if kind not in LOADERS or not name:
+            raise KeyError(f"unknown model key: {key!r} (expected <{'|'.join(LOADERS)}>:<model id>)")
+        import metrics
+        rss0, t0 = _rss_bytes(), time.perf_counter()
+        with metrics.span("model_load", model=key):
+            e.model = LOADERS[kind](name)
+        e.load_s = time.perf_counter() - t0
+        e.rss_delta = max(0, _rss_bytes() - rss0)
+        e.param_bytes = _param_bytes(e.model)
+        e.loaded_at = time.time()
+        self._start_reaper()
+
+    def get(self, key: str) -> Any:
+        """The loaded model (loads once; concurrent first callers wait for the same load)."""
+        e = self._entry(key)
+        with e.lock:
+            if e.model is None:
+                self._load(key, e)
+            e.last_used = time.time()
+            return e.model
+
+    def run(self, key: str, fn: Callable[[Any], Any]) -> Any:
+        """fn(model) under the model's lock: one inference at a time per model."""
+        e = self._entry(key)
+        with e.lock:
+            if e.model is None:
+                self._load(key, e)
+            try:
+                return fn(e.model)
+            finally:
+                e.uses += 1
+                e.last_used = time.time()
+
+    def unload(self, key: str) -> bool:
+        e = self._entries.get(key)
+        if e is None:
+            return False
+        with e.lock:
+            if e.model is None:
+                return False
+            e.model = None
+        gc.collect()
+        try:
+            import torch
+            if torch.cuda.is_available():
+                torch.cuda.empty_cache()
+        except Exception:
+            pass
+        return True
+
+    def unload_idle(self, ttl_s: Optional[float] = None) -> List[str]:
+        ttl_s = self.idle_ttl_s if ttl_s is None else ttl_s
+        now, dropped = time.time(), []
+        for key, e in list(self._entries.items()):
+            # skip models that are busy right now instead of waiting for them
+            if not e.lock.acquire(blocking=False):
+                continue
+            try:
+                idle = e.model is not None and now - e.last_used > ttl_s
+            finally:
+                e.lock.release()
+            if idle and self.unload(key):
+                dropped.append(key)
+        return dropped
+
+    def _start_reaper(self) -> None:
+        if self.idle_ttl_s <= 0 or (self._reaper is not None and self._reaper.is_alive()):
+            return
+        def _loop():
+            while True:
+                time.sleep(max(5.0, min(60.0, self.idle_ttl_s / 4)))
+                self.unload_idle()
+        self._reaper = threading.Thread(target=_loop, name="model-reaper", daemon=True)
+        self._reaper.start()
+
+    def stats(self) -> List[Dict[str, Any]]:
+        now, out = time.time(), []
+        for key, e in list(self._entries.items()):
+            out.append({
+                "model": key,
+                "loaded": e.model is not None,
+                "param_mb": round(e.param_bytes / 2**20, 1),
+                "rss_at_load_mb": round(e.rss_delta / 2**20, 1),
+                "load_s": round(e.load_s, 2),
+                "uses": e.uses,
+                "idle_s": round(now - e.last_used, 1) if e.last_used else None,
+            })
+        return out
+
+REGISTRY = ModelRegistry()
+
+# =========================
+# Inference service (same interface in-process and over the model server)
+# =========================
+class ModelService:
+    def __init__(self, registry: Optional[ModelRegistry] = None):
+        self.registry = registry or REGISTRY
+
+    def summarize(self, model: str, text: str, **gen_kwargs) -> str:
+        out = self.registry.run(f"summarization:{model}", lambda pipe: pipe(text, **gen_kwargs))
+        return out[0]["summary_text"]
+
+    def embed(self, model: str, texts: List[str], normalize: bool = True, show_progress_bar: bool = False):
+        return self.registry.run(f"embedding:{model}", lambda m: m.encode(
+            texts, convert_to_numpy=True, normalize_embeddings=normalize, show_progress_bar=show_progress_bar))
+
+    def embedding_dim(self, model: str) -> int:
+        return int(self.registry.get(f"embedding:{model}").get_sentence_embedding_dimension())
+
+    def generate(self, model: str, prompt: str, max_new_tokens: int = 200) -> str:
+        def _gen(tm):
+            tk, m = tm
+            ids = tk(prompt, return_tensors="pt", truncation=True).input_ids
+            out = m.generate(ids, max_new_tokens=max_new_tokens)
+            return tk.decode(out[0], skip_special_tokens=True)
+        return self.registry.run(f"seq2seq:{model}", _gen)
+
+    def preload(self, key: str) -> None:
+        self.registry.get(key)
+
+    def unload(self, key: str) -> bool:
+        return self.registry.unload(key)
+
+    def stats(self) -> List[Dict[str, Any]]:
+        return self.registry.stats()
+
+def _manager_class():
+    from multiprocessing.managers import BaseManager
+
+    class ModelManager(BaseManager):
+        pass
+    return ModelManager
+
+def _parse_addr(addr: str):
+    host, _, port = addr.rpartition(":")
+    return host or "127.0.0.1", int(port)
+
+def _is_loopback(host: str) -> bool:
+    import ipaddress
+    if host == "localhost":
+        return True
+    try:
+        return ipaddress.ip_address(host).is_loopback
+    except ValueError:
+        return False
+
+_SERVICE = None
+_SERVICE_LOCK = threading.Lock()
+
+def get_service():
+    """Process-local ModelService, or a proxy to the shared server when STUDYMATE_MODEL_SERVER is set."""
+    global _SERVICE
+    if _SERVICE is None:
+        with _SERVICE_LOCK:
+            if _SERVICE is None:
+                if MODEL_SERVER:
+                    if not MODEL_SERVER_AUTHKEY:
+                        raise RuntimeError("STUDYMATE_MODEL_SERVER is set but STUDYMATE_MODEL_AUTHKEY is not "
+                                           "(use the key the model server was started with)")
+                    mgr_cls = _manager_class()
+                    mgr_cls.register("service")
+                    mgr = mgr_cls(address=_parse_addr(MODEL_SERVER), authkey=MODEL_SERVER_AUTHKEY)
+                    mgr.connect()
+                    _SERVICE = mgr.service()
+                else:
+                    _SERVICE = ModelService()
+    return _SERVICE
+
+def serve(addr: str = "127.0.0.1:6100", preload: Optional[List[str]] = None) -> None:
+    """Run the shared model server (blocks). Each client connection is served on its own thread."""
+    import sys, secrets
+    host, port = _parse_addr(addr)
+    authkey = MODEL_SERVER_AUTHKEY
+    if not authkey:
+        authkey = secrets.token_hex(16).encode("utf-8")
+        print(f"STUDYMATE_MODEL_AUTHKEY is not set; generated one for this run:\n"
+              f"  export STUDYMATE_MODEL_AUTHKEY={authkey.decode()}   (set it for every client)")
+    if not _is_loopback(host):
+        print(f"WARNING: model server bound to {host}, not loopback. Anyone who has the authkey can run "
+              f"code in this process; keep it on a trusted network.", file=sys.stderr)
+    service = ModelService()
+    for key in preload or []:
+        t0 = time.perf_counter()
+        service.preload(key)
+        print(f"loaded {key} in {time.perf_counter() - t0:.1f}s")
+    mgr_cls = _manager_class()
+    mgr_cls.register("service", callable=lambda: service)
+    server = mgr_cls(address=(host, port), authkey=authkey).get_server()
+    print(f"model server on {addr}  (clients: STUDYMATE_MODEL_SERVER={addr} and the same STUDYMATE_MODEL_AUTHKEY)")
+    server.serve_forever()
+
+if __name__ == "__main__":
+    import argparse
+    ap = argparse.ArgumentParser(description="Shared StudyMate model server.")
+    ap.add_argument("--serve", default="127.0.0.1:6100", metavar="HOST:PORT")
+    ap.add_argument("--preload", action="append", default=[], metavar="KIND:MODEL",
+                    help="load at start-up, e.g. summarization:sshleifer/distilbart-cnn-12-6")
+    args = ap.parse_args()
+    serve(args.serve, args.preload)
@@ -5,50 +5,122 @@
 # nlp_tasks.py — core NLP + LLM + web helpers for StudyMate
 # ----------------------------------------------------------
 # Features:
-#  - summarize(): extractive / neural / llm
-#  - make_mcq(), make_mcq_llm()
-#  - make_flashcards(), make_flashcards_llm()
+#  - summarize(): extractive / neural / llm (summarize_stream(): llm deltas)
+#  - make_mcq(), make_mcq_llm(), stream_mcq_llm()
+#  - make_flashcards(), make_flashcards_llm(), stream_flashcards_llm()
 #  - extract_deadlines(), extract_deadlines_llm()
 #  - extract_text_from_pdf()
-#  - make_report_llm(): build report with web context
-#  - save_report_pdf(): export markdown to PDF
+#  - make_report_llm(), stream_report_llm(): build report with web context
+#  - render_report_pdf() / save_report_pdf(): export markdown to PDF
 
-import os, re, time, json, tempfile, textwrap, hashlib, concurrent.futures
-from typing import List, Dict, Any, Optional
+import os, re, time, json, tempfile, textwrap, hashlib, threading, functools, concurrent.futures
+from typing import List, Dict, Any, Optional, Iterator, Tuple
 from datetime import datetime
 
+import metrics
+
 # =========================
-# OpenAI client (with fallback to hard-coded key)
+# OpenAI client (with fallback to hard-coded key; pooled via llm_client)
 # =========================
 OPENAI_MODEL_DEFAULT = os.getenv("OPENAI_MODEL", "gpt-4o-mini")
 OPENAI_API_KEY_HARDCODED = ""   # <- put your key here for local use
+# "openai" (default) or "mock" (mock_llm: deterministic offline answers for tests / load tests)
+LLM_BACKEND = os.getenv("STUDYMATE_LLM_BACKEND", "openai").strip().lower()
 
 def _get_openai_client():
-    from openai import OpenAI
+    if LLM_BACKEND == "mock":
+        import mock_llm
+        return mock_llm.get_client()
+    import llm_client
     api_key = os.getenv("OPENAI_API_KEY") or OPENAI_API_KEY_HARDCODED
     if not api_key:
         raise RuntimeError("No API key found. Set OPENAI_API_KEY or fill OPENAI_API_KEY_HARDCODED.")
-    return OpenAI(api_key=api_key)
+    # pooled: one client + keep-alive pool per process (OPENAI_BASE_URL: e.g. `mock_llm.py --serve`)
+    return llm_client.get_client(api_key, os.getenv("OPENAI_BASE_URL") or None)
 
-def _call_llm_text(system_prompt: str, user_prompt: str, model: Optional[str] = None, max_output_tokens: int = 800) -> str:
-    client = _get_openai_client()
+def llm_version() -> str:
+    """Model identity for cache keys; mock answers never mix with real ones."""
+    return OPENAI_MODEL_DEFAULT if LLM_BACKEND == "openai" else f"{LLM_BACKEND}:{OPENAI_MODEL_DEFAULT}"
+
+# Response cache: identical (model, system, user, max tokens) requests are answered
+# from SQLite; concurrent identical requests share one in-flight API call.
+LLM_CACHE_ENABLED = os.getenv("STUDYMATE_LLM_CACHE", "1") != "0"
+LLM_CACHE_TTL_S = float(os.getenv("STUDYMATE_LLM_CACHE_TTL", str(7 * 24 * 3600)))
+LLM_CACHE_MAX_MB = float(os.getenv("STUDYMATE_LLM_CACHE_MB", "200"))
+_LLM_CACHE = None
+_LLM_INFLIGHT = None
+_LLM_CACHE_LOCK = threading.Lock()
+
+def _get_llm_cache():
+    global _LLM_CACHE, _LLM_INFLIGHT
+    with _LLM_CACHE_LOCK:
+        if _LLM_CACHE is None:
+            from cache_store import DiskCache, SingleFlight
+            _LLM_INFLIGHT = SingleFlight()
+            _LLM_CACHE = DiskCache("llm_responses", max_entries=None, max_bytes=int(LLM_CACHE_MAX_MB * 1024 * 1024),
+                                   ttl_s=LLM_CACHE_TTL_S)
+    return _LLM_CACHE
+
+def _llm_cache_key(system_prompt: str, user_prompt: str, model: str, max_output_tokens: int) -> str:
+    from cache_store import make_key
+    if LLM_BACKEND != "openai":
+        model = f"{LLM_BACKEND}:{model}"
+    return make_key("responses", model, system_prompt, user_prompt, int(max_output_tokens))
+
+def _call_llm_text(system_prompt: str, user_prompt: str, model: Optional[str] = None, max_output_tokens: int = 800,
+                   site: str = "misc", timeout_s: Optional[float] = None) -> str:
     model = model or OPENAI_MODEL_DEFAULT
-    resp = client.responses.create(
-        model=model,
-        input=[
-            {"role": "system", "content": system_prompt},
-            {"role": "user", "content": user_prompt},
-        ],
-        max_output_tokens=max_output_tokens,
-    )
+    if not LLM_CACHE_ENABLED:
+        return _call_llm_uncached(system_prompt, user_prompt, model, max_output_tokens, site, timeout_s)
+    cache = _get_llm_cache()
+    key = _llm_cache_key(system_prompt, user_prompt, model, max_output_tokens)
+    hit = cache.get(key)
+    metrics.inc("studymate_cache_total", cache="llm", action=site, outcome="hit" if hit is not None else "miss")
+    if hit is not None:
+        return hit
+
+    def _fill():
+        again = cache.get(key)  # a previous leader may have just stored it
+        if again is not None:
+            return again
+        txt = _call_llm_uncached(system_prompt, user_prompt, model, max_output_tokens, site, timeout_s)
+        if txt:
+            cache.set(key, txt)
+        return txt
+
+    txt = _LLM_INFLIGHT.do(key, _fill)
+    return _fill() if txt is None else txt     # None: a streaming leader was closed before it finished
+
+def _call_llm_uncached(system_prompt: str, user_prompt: str, model: str, max_output_tokens: int,
+                       site: str, timeout_s: Optional[float]) -> str:
+    import llm_client, token_budget
+    client = _get_openai_client()
+    with metrics.span("llm", site=site, model=model):
+        resp = llm_client.call(
+            site,
+            client.responses.create,
+            model=model,
+            input=[
+                {"role": "system", "content": system_prompt},
+                {"role": "user", "content": user_prompt},
+            ],
+            max_output_tokens=max_output_tokens,
+            timeout_s=timeout_s,
+        )
+    token_budget.record(site, token_budget.count_tokens(system_prompt + user_prompt, model),
+                        max_output_tokens, getattr(resp, "usage", None))
     return (resp.output_text or "").strip()
 
-def _call_llm_json(system_prompt: str, user_prompt: str, model: Optional[str] = None, max_output_tokens: int = 1200) -> Any:
+def _call_llm_json(system_prompt: str, user_prompt: str, model: Optional[str] = None, max_output_tokens: int = 1200,
+                   site: str = "misc") -> Any:
+    system_prompt = _JSON_SYSTEM_PREFIX + system_prompt
+    model = model or OPENAI_MODEL_DEFAULT
     txt = _call_llm_text(
-        "You are a careful JSON-only generator. Output valid JSON. " + system_prompt,
+        system_prompt,
         user_prompt,
         model=model,
         max_output_tokens=max_output_tokens,
+        site=site,
     )
     # attempt to locate JSON in text
     try:
@@ -63,8 +135,155 @@ def _call_llm_json(system_prompt: str, user_prompt: str, model: Optional[str] =
                 return json.loads(m.group(0))
             except Exception:
                 pass
+        if LLM_CACHE_ENABLED:
+            # don't keep serving a broken answer from the cache
+            _get_llm_cache().delete(_llm_cache_key(system_prompt, user_prompt, model, max_output_tokens))
         raise ValueError(f"LLM did not return valid JSON: {txt[:400]}...")
 
+# =========================
+# Streaming (deltas as they arrive)
+# =========================
+_JSON_SYSTEM_PREFIX = "You are a careful JSON-only generator. Output valid JSON. "
+
+def _stream_llm_text(system_prompt: str, user_prompt: str, model: Optional[str] = None, max_output_tokens: int = 800,
+                     site: str = "misc", timeout_s: Optional[float] = None) -> Iterator[str]:
+    """Like _call_llm_text but yields text deltas; the full answer still lands in the response cache."""
+    import llm_client, token_budget
+    model = model or OPENAI_MODEL_DEFAULT
+    key = _llm_cache_key(system_prompt, user_prompt, model, max_output_tokens) if LLM_CACHE_ENABLED else None
+    fut = None
+    if key:
+        hit = _get_llm_cache().get(key)
+        metrics.inc("studymate_cache_total", cache="llm", action=site, outcome="hit" if hit is not None else "miss")
+        if hit is not None:
+            yield hit
+            return
+        leader, fut = _LLM_INFLIGHT.join(key)
+        if not leader:
+            txt = fut.result()          # the same prompt is already running: share its answer
+            if txt is not None:
+                yield txt
+                return
+            fut = None                  # its consumer stopped early: stream our own
+    client = _get_openai_client()
+    parts, txt = [], None
+    try:
+        with metrics.span("llm", site=site, model=model):
+            for ev in llm_client.stream(
+                site,
+                client.responses.create,
+                model=model,
+                input=[
+                    {"role": "system", "content": system_prompt},
+                    {"role": "user", "content": user_prompt},
+                ],
+                max_output_tokens=max_output_tokens,
+                timeout_s=timeout_s,
+            ):
+                etype = getattr(ev, "type", "")
+                if etype == "response.output_text.delta":
+                    delta = getattr(ev, "delta", "") or ""
+                    if delta:
+                        parts.append(delta)
+                        yield delta
+                elif etype == "response.completed":
+                    token_budget.record(site, token_budget.count_tokens(system_prompt + user_prompt, model),
+                                        max_output_tokens, getattr(getattr(ev, "response", None), "usage", None))
+        txt = "".join(parts).strip()
+        if key and txt:
+            _get_llm_cache().set(key, txt)
+    except Exception as e:
+        if fut is not None:
+            _LLM_INFLIGHT.end(key, fut, error=e)
+            fut = None
+        raise
+    finally:
+        if fut is not None:
+            _LLM_INFLIGHT.end(key, fut, txt)    # None when closed early: waiters make their own call
+
+class _JsonArrayStream:
+    """
+    Incremental parser for {"<key>": [ {...}, {...} ]}: feed() text deltas and get back
+    every array element whose closing brace has arrived.
+    """
+    def __init__(self, key: str):
+        self.key = key
+        self.buf = ""
+        self.pos = 0           # scan position in buf
+        self.in_array = False
+        self.done = False
+        self.depth = 0         # brace/bracket depth inside the array
+        self.in_str = False
+        self.esc = False
+        self.start = None      # start offset of the current element
+
+    def feed(self, delta: str) -> List[Any]:
+        self.buf += delta
+        out = []
+        if self.done:
+            return out
+        if not self.in_array:
+            m = re.search(r'"%s"\s*:\s*\[' % re.escape(self.key), self.buf)
+            if not m:
+                return out
+            self.in_array = True
+            self.pos = m.end()
+        i, buf = self.pos, self.buf
+        while i < len(buf):
+            ch = buf[i]
+            if self.in_str:
+                if self.esc:
+                    self.esc = False
+                elif ch == "\\":
+                    self.esc = True
+                elif ch == '"':
+                    self.in_str = False
+            elif ch == '"':
+                self.in_str = True
+            elif ch in "{[":
+                if self.depth == 0 and ch == "{":
+                    self.start = i
+                self.depth += 1
+            elif ch in "}]":
+                if self.depth == 0:      # end of the outer array
+                    self.in_array, self.done = False, True
+                    i = len(buf)
+                    break
+                self.depth -= 1
+                if self.depth == 0 and self.start is not None:
+                    try:
+                        out.append(json.loads(buf[self.start:i + 1]))
+                    except Exception:
+                        pass
+                    self.start = None
+            i += 1
+        self.pos = i
+        return out
+
+def _stream_json_items(system_prompt: str, user_prompt: str, key: str, model: Optional[str] = None,
+                       max_output_tokens: int = 1200, site: str = "misc") -> Iterator[Any]:
+    parser = _JsonArrayStream(key)
+    n = 0
+    for delta in _stream_llm_text(_JSON_SYSTEM_PREFIX + system_prompt, user_prompt, model=model,
+                                  max_output_tokens=max_output_tokens, site=site):
+        for item in parser.feed(delta):
+            n += 1
+            yield item
+    if n == 0:
+        # model ignored the wrapper object (e.g. bare list) — parse the whole answer instead
+        try:
+            whole = json.loads(re.sub(r"^```(?:json)?\s*|\s*```$", "", parser.buf.strip(), flags=re.IGNORECASE))
+        except Exception:
+            whole = None
+        items = whole.get(key, []) if isinstance(whole, dict) else whole
+        for item in items if isinstance(items, list) else []:
+            n += 1
+            yield item
+    if n == 0 and LLM_CACHE_ENABLED:
+        # don't keep serving an answer nothing could be parsed from
+        _get_llm_cache().delete(_llm_cache_key(_JSON_SYSTEM_PREFIX + system_prompt, user_prompt,
+                                               model or OPENAI_MODEL_DEFAULT, max_output_tokens))
+
 # =========================
 # Utilities
 # =========================
@@ -76,9 +295,112 @@ def _sentences(txt: str) -> List[str]:
 def _truncate(text: str, max_chars: int) -> str:
     return text[:max_chars] if len(text) > max_chars else text
 
+# =========================
+# Map-reduce over long inputs (LLM paths)
+# =========================
+LLM_CHUNK_TOKENS = int(os.getenv("STUDYMATE_LLM_CHUNK_TOKENS", "3000"))
+LLM_MAP_CONCURRENCY = int(os.getenv("STUDYMATE_LLM_MAP_CONCURRENCY", "4"))
+
+def _count_tokens(text: str) -> int:
+    import token_budget
+    return token_budget.count_tokens(text, OPENAI_MODEL_DEFAULT)
+
+def _out_tokens(kind: str = "text", target_words: Optional[int] = None, num_items: Optional[int] = None) -> int:
+    import token_budget
+    return token_budget.output_tokens(kind, target_words=target_words, num_items=num_items)
+
+def _split_by_token_budget(text: str, max_tokens: int = LLM_CHUNK_TOKENS) -> List[str]:
+    """Pack whole sentences into chunks of at most max_tokens; very long sentences are hard-split."""
+    chunks, cur, n = [], [], 0
+    for sent in _sentences(text):
+        t = _count_tokens(sent)
+        if t > max_tokens:
+            step = max(1, len(sent) * max_tokens // t)
+            pieces = [sent[i:i + step] for i in range(0, len(sent), step)]
+        else:
+            pieces = [sent]
+        for piece in pieces:
+            t = _count_tokens(piece)
+            if n + t > max_tokens and cur:
+                chunks.append(" ".join(cur)); cur, n = [], 0
+            cur.append(piece); n += t
+    if cur: chunks.append(" ".join(cur))
+    return chunks
+
+def _llm_input(text: str, site: str) -> str:
+    """Text for a prompt with near-duplicate passages (overlapping decks / notes) dropped, see dedup.py."""
+    import dedup
+    return dedup.dedup_text(text, site=site)
+
+def _iter_map_chunks(chunks: List[str], fn, max_workers: Optional[int] = None,
+                     site: str = "misc") -> Iterator[Tuple[int, Any]]:
+    """
+    Run fn(chunk) concurrently (at most max_workers at a time) and yield (index, result)
+    as chunks finish. Failed chunks are skipped (and counted); if every chunk fails the first
+    error is raised. Closing the iterator early cancels the chunks that haven't started.
+    """
+    workers = max(1, min(max_workers or LLM_MAP_CONCURRENCY, len(chunks)))
+    errors = []
+    ex = concurrent.futures.ThreadPoolExecutor(max_workers=workers)
+    try:
+        futs = {ex.submit(metrics.bind(fn), ch): i for i, ch in enumerate(chunks)}
+        for fut in concurrent.futures.as_completed(futs):
+            try:
+                res = fut.result()
+            except Exception as e:
+                errors.append(e)
+                metrics.inc("studymate_fallbacks_total", site=site, backend="llm_chunk")
+                continue
+            yield futs[fut], res
+    finally:
+        # an early stop must not wait for (and pay for) the chunks nobody will read
+        ex.shutdown(wait=False, cancel_futures=True)
+    if errors and len(errors) == len(chunks):
+        raise errors[0]
+
+def _map_chunks(chunks: List[str], fn, max_workers: Optional[int] = None, site: str = "misc") -> List[Any]:
+    """Ordered results of fn over chunks (None for chunks that failed)."""
+    out: List[Any] = [None] * len(chunks)
+    for i, res in _iter_map_chunks(chunks, fn, max_workers, site=site):
+        out[i] = res
+    return out
+
+def _chunk_quotas(n_items: int, n_chunks: int) -> List[int]:
+    """Spread n_items (+ a little spare for dedupe losses) across chunks, evenly spaced."""
+    total = n_items + max(1, n_items // 4)
+    if n_chunks <= total:
+        base, extra = divmod(total, n_chunks)
+        return [base + (1 if i < extra else 0) for i in range(n_chunks)]
+    picks = {round(i * (n_chunks - 1) / (total - 1)) for i in range(total)} if total > 1 else {0}
+    return [1 if i in picks else 0 for i in range(n_chunks)]
+
+def _norm_key(s: str) -> str:
+    return re.sub(r"\s+", " ", re.sub(r"[^a-z0-9 ]", " ", (s or "").lower())).strip()
+
+def _map_items_iter(text: str, n_items: int, item_fn, key_fn, site: str = "misc") -> Iterator[Any]:
+    """
+    Map phase for list-producing tasks (MCQs, cards): item_fn(chunk, k) -> list per chunk,
+    yielded as chunks finish, deduplicated by key_fn, stopping at n_items.
+    """
+    chunks = _split_by_token_budget(text)
+    quotas = _chunk_quotas(n_items, len(chunks))
+    jobs = [(ch, k) for ch, k in zip(chunks, quotas) if k > 0]
+    seen, n = set(), 0
+    for _, items in _iter_map_chunks(jobs, lambda job: item_fn(job[0], job[1]), site=site):
+        for it in items or []:
+            k = key_fn(it)
+            if not k or k in seen:
+                continue
+            seen.add(k)
+            yield it
+            n += 1
+            if n >= n_items:
+                return
+
 # =========================
 # Extractive Summary (no external model)
 # =========================
+@metrics.traced("extractive")
 def _extractive_summary(text: str, max_sentences: int = 6) -> str:
     sents = _sentences(text)
     if not sents:
@@ -114,7 +436,6 @@ def _extractive_summary(text: str, max_sentences: int = 6) -> str:
 # Neural Summarizer (DistilBART)
 # =========================
 _NEURAL_MODEL = "sshleifer/distilbart-cnn-12-6"
-_NEURAL = None
 
 def _chunk_by_chars(text: str, max_chars: int = 1800) -> List[str]:
     sents = _sentences(text)
@@ -127,23 +448,38 @@ def _chunk_by_chars(text: str, max_chars: int = 1800) -> List[str]:
     if cur: chunks.append(" ".join(cur))
     return chunks
 
-def _neural_summarizer_init():
-    import importlib
-    tr = importlib.import_module("transformers")
-    return tr.pipeline("summarization", model=_NEURAL_MODEL, tokenizer=_NEURAL_MODEL, framework="pt")
+def _neural_single_pass(text: str, max_len_tokens: int, min_len_tokens: int) -> str:
+    # the pipeline lives in the process-wide model registry (or the shared model server)
+    from model_registry import get_service
+    with metrics.span("model", model=_NEURAL_MODEL):
+        return get_service().summarize(_NEURAL_MODEL, text, max_length=max_len_tokens,
+                                   min_length=min_len_tokens, do_sample=False)
+
+# map-phase partials are reused across reruns: changing target_words or appending
+# a page only re-runs the reduce step plus the new / changed chunks
+_PARTIAL_PARAMS = {"max_len_tokens": 96, "min_len_tokens": 48, "do_sample": False}
+_PARTIALS = None
 
-def _get_neural():
-    global _NEURAL
-    if _NEURAL is None:
-        _NEURAL = _neural_summarizer_init()
-    return _NEURAL
+def _get_partial_cache():
+    global _PARTIALS
+    if _PARTIALS is None:
+        from cache_store import DiskCache
+        _PARTIALS = DiskCache("neural_partials", max_entries=5000)
+    return _PARTIALS
 
-def _neural_single_pass(text: str, max_len_tokens: int, min_len_tokens: int) -> str:
-    pipe = _get_neural()
-    out = pipe(text, max_length=max_len_tokens, min_length=min_len_tokens, do_sample=False)[0]["summary_text"]
+def _neural_partial(chunk: str) -> str:
+    from cache_store import make_key, text_hash
+    cache = _get_partial_cache()
+    key = make_key(_NEURAL_MODEL, text_hash(chunk), _PARTIAL_PARAMS)
+    out = cache.get(key)
+    if out is None:
+        out = _neural_single_pass("summarize: " + chunk,
+                                  max_len_tokens=_PARTIAL_PARAMS["max_len_tokens"],
+                                  min_len_tokens=_PARTIAL_PARAMS["min_len_tokens"])
+        cache.set(key, out)
     return out
 
-def _neural_summary(text: str, target_words: int = 150, max_chunk_chars: int = 1800) -> str:
+def _neural_summary(text: str, target_words: int = 150, max_chunk_chars: int = 1800, progress=None) -> str:
     text = text.strip()
     if not text:
         return ""
@@ -151,10 +487,11 @@ def _neural_summary(text: str, target_words: int = 150, max_chunk_chars: int = 1
         return _neural_single_pass("summarize: " + text,
                                    max_len_tokens=max(64, int(target_words * 1.4)),
                                    min_len_tokens=max(32, int(target_words * 0.6)))
-    chunks = _chunk_by_chars(text, max_chunk_chars=max_chunk_chars)
+    chunks = _chunk_by_chars(text, max_chars=max_chunk_chars)
     partials = []
-    for ch in chunks:
-        partials.append(_neural_single_pass("summarize: " + ch, max_len_tokens=96, min_len_tokens=48))
+    for i, ch in enumerate(chunks):
+        partials.append(_neural_partial(ch))
+        if progress: progress("summarizing chunks", (i + 1) / (len(chunks) + 1))
     combined = " ".join(partials)
     return _neural_single_pass("summarize: " + combined,
                                max_len_tokens=max(80, int(target_words * 1.4)),
@@ -177,44 +514,110 @@ def extract_text_from_pdf(file_path: str) -> str:
 # =========================
 # Public Summarize API (supports 'extractive' | 'neural' | 'llm')
 # =========================
+_SUMMARY_SYS = "You write clear, study-friendly summaries in 1-2 paragraphs."
+_PART_SUMMARY_SYS = "You summarize one part of a longer study document. Keep key facts, definitions, dates and names."
+
+def _summary_prompts(text: str, target_words: int, timeout_s: Optional[float] = None) -> Tuple[str, str]:
+    """
+    Final (system, user) prompt for an LLM summary. Long inputs are map-reduced first:
+    every chunk is summarized concurrently and the reduce prompt merges the partials.
+    """
+    text = _llm_input(text, "summary")
+    chunks = _split_by_token_budget(text)
+    if len(chunks) <= 1:
+        return _SUMMARY_SYS, f"Summarize this for a student (about {target_words} words):\n\n{text}"
+    per_chunk = max(60, (target_words * 2) // len(chunks))
+    partials = _map_chunks(chunks, lambda ch: _call_llm_text(
+        _PART_SUMMARY_SYS, f"Summarize this part (about {per_chunk} words):\n\n{ch}",
+        model=OPENAI_MODEL_DEFAULT, max_output_tokens=_out_tokens(target_words=per_chunk),
+        site="summary", timeout_s=timeout_s), site="summary")
+    joined = "\n\n".join(f"Part {i}: {p}" for i, p in enumerate(partials, start=1) if p)
+    usr = (f"These are summaries of consecutive parts of one document. Merge them into one summary "
+           f"for a student (about {target_words} words):\n\n{joined}")
+    return _SUMMARY_SYS, usr
+
+@metrics.traced("summarize")
 def summarize(
     text: str,
     mode: str = "extractive",
     target_words: int = 150,
     max_chars_input: int = 12000,
     timeout_s: float = 25.0,
+    progress=None,
 ) -> Dict:
+    """progress(stage, fraction), if given, is called as neural chunks finish (and may raise to abort)."""
     t0 = time.time()
-    text = _truncate(text, max_chars_input)
-
-    if mode == "extractive":
-        s = _extractive_summary(text, max_sentences=6)
-        return {"summary": s, "backend": "extractive", "stats": {"time_s": round(time.time()-t0, 3)}}
 
     if mode == "llm":
-        sys = "You write clear, study-friendly summaries in 1-2 paragraphs."
-        usr = f"Summarize this for a student (about {target_words} words):\n\n{text}"
+        # the LLM path covers the whole input via map-reduce; max_chars_input caps the local backends
         try:
-            s = _call_llm_text(sys, usr, model=OPENAI_MODEL_DEFAULT, max_output_tokens=600)
+            sys, usr = _summary_prompts(text, target_words, timeout_s)
+            s = _call_llm_text(sys, usr, model=OPENAI_MODEL_DEFAULT, max_output_tokens=_out_tokens(target_words=target_words),
+                               site="summary", timeout_s=timeout_s)
             return {"summary": s, "backend": "llm", "stats": {"time_s": round(time.time()-t0, 3)}}
         except Exception:
             # fallback to extractive on LLM errors
-            s = _extractive_summary(text, max_sentences=6)
+            metrics.inc("studymate_fallbacks_total", site="summary", backend="llm")
+            s = _extractive_summary(_truncate(text, max_chars_input), max_sentences=6)
             return {"summary": s, "backend": "fallback_extractive", "stats": {"time_s": round(time.time()-t0, 3)}}
 
+    text = _truncate(text, max_chars_input)
+
+    if mode == "extractive":
+        s = _extractive_summary(text, max_sentences=6)
+        return {"summary": s, "backend": "extractive", "stats": {"time_s": round(time.time()-t0, 3)}}
+
     # neural with timeout + fallback
     try:
         with concurrent.futures.ThreadPoolExecutor(max_workers=1) as ex:
-            fut = ex.submit(_neural_summary, text, target_words, 1800)
+            fut = ex.submit(metrics.bind(_neural_summary), text, target_words, 1800, progress)
             s = fut.result(timeout=timeout_s)
         return {"summary": s, "backend": "neural", "stats": {"time_s": round(time.time()-t0, 3)}}
     except Exception:
+        metrics.inc("studymate_fallbacks_total", site="summary", backend="neural")
         s = _extractive_summary(text, max_sentences=6)
         return {"summary": s, "backend": "fallback_extractive", "stats": {"time_s": round(time.time()-t0, 3)}}
 
+def summarize_stream(
+    text: str,
+    mode: str = "llm",
+    target_words: int = 150,
+    max_chars_input: int = 12000,
+    timeout_s: float = 25.0,
+    info: Optional[Dict[str, Any]] = None,
+) -> Iterator[str]:
+    """
+    Yields the summary progressively. Only the 'llm' backend streams; other modes
+    (and LLM failures before any text arrived) yield the finished summary once.
+    info["backend"], if a dict is given, is set to the backend that produced the text.
+    """
+    info = {} if info is None else info
+    if mode != "llm":
+        out = summarize(text, mode=mode, target_words=target_words,
+                        max_chars_input=max_chars_input, timeout_s=timeout_s)
+        info["backend"] = out["backend"]
+        yield out["summary"]
+        return
+    info["backend"] = "llm"
+    started = False
+    try:
+        sys, usr = _summary_prompts(text, target_words, timeout_s)  # map phase (if any) runs before streaming
+        for delta in _stream_llm_text(sys, usr, model=OPENAI_MODEL_DEFAULT,
+                                      max_output_tokens=_out_tokens(target_words=target_words),
+                                      site="summary", timeout_s=timeout_s):
+            started = True
+            yield delta
+    except Exception:
+        if started:
+            raise
+        metrics.inc("studymate_fallbacks_total", site="summary", backend="llm")
+        info["backend"] = "fallback_extractive"
+        yield _extractive_summary(_truncate(text, max_chars_input), max_sentences=6)
+
 # =========================
 # MCQ Generators
 # =========================
+@metrics.traced("mcq")
 def make_mcq(text: str, num_questions: int = 6, seed: int = 42) -> List[Dict[str, Any]]:
     # simple keyword/cloze-like generator (baseline)
     import random
@@ -237,26 +640,59 @@ def make_mcq(text: str, num_questions: int = 6, seed: int = 42) -> List[Dict[str
         qs.append({"question": stem, "options": opts, "answer": ans})
     return qs
 
-def make_mcq_llm(text: str, num_questions: int = 6, seed: int = 42) -> List[Dict[str, Any]]:
-    sys = "You write concise MCQs. Always return JSON: {\"questions\":[{\"question\":\"...\",\"options\":[\"A\",\"B\",\"C\",\"D\"],\"answer\":\"...\"}]}"
-    usr = f"Text:\n{text}\n\nGenerate {num_questions} MCQs with 4 options each and the correct 'answer'."
-    out = _call_llm_json(sys, usr, model=OPENAI_MODEL_DEFAULT, max_output_tokens=1600)
+_MCQ_SYS = "You write concise MCQs. Always return JSON: {\"questions\":[{\"question\":\"...\",\"options\":[\"A\",\"B\",\"C\",\"D\"],\"answer\":\"...\"}]}"
+
+def _mcq_user_prompt(text: str, num_questions: int) -> str:
+    return f"Text:\n{text}\n\nGenerate {num_questions} MCQs with 4 options each and the correct 'answer'."
+
+def _clean_mcq(q: Any) -> Optional[Dict[str, Any]]:
+    try:
+        opts = [str(o) for o in q["options"]][:4]
+        if len(opts) < 2:
+            return None
+        return {"question": str(q["question"]), "options": opts, "answer": str(q["answer"])}
+    except Exception:
+        return None
+
+def _mcq_llm_single(text: str, num_questions: int) -> List[Dict[str, Any]]:
+    out = _call_llm_json(_MCQ_SYS, _mcq_user_prompt(text, num_questions), model=OPENAI_MODEL_DEFAULT,
+                         max_output_tokens=_out_tokens("mcq", num_items=num_questions), site="mcq")
     qs = out.get("questions", [])
     # sanitize
-    clean = []
-    for q in qs:
-        try:
-            opts = [str(o) for o in q["options"]][:4]
-            if len(opts) < 2: 
-                continue
-            clean.append({"question": str(q["question"]), "options": opts, "answer": str(q["answer"])})
-        except Exception:
-            continue
+    clean = [c for c in (_clean_mcq(q) for q in qs) if c]
     return clean[:num_questions]
 
+@metrics.traced("mcq_llm")
+def make_mcq_llm(text: str, num_questions: int = 6, seed: int = 42) -> List[Dict[str, Any]]:
+    text = _llm_input(text, "mcq")
+    if _count_tokens(text) <= LLM_CHUNK_TOKENS:
+        return _mcq_llm_single(text, num_questions)
+    # long input: questions drawn from every part, deduplicated
+    return list(_map_items_iter(text, num_questions, _mcq_llm_single, lambda q: _norm_key(q["question"]),
+                                site="mcq"))
+
+def stream_mcq_llm(text: str, num_questions: int = 6, seed: int = 42) -> Iterator[Dict[str, Any]]:
+    """Yields each sanitized question as soon as its JSON object (or its chunk, for long inputs) is complete."""
+    text = _llm_input(text, "mcq")
+    if _count_tokens(text) > LLM_CHUNK_TOKENS:
+        yield from _map_items_iter(text, num_questions, _mcq_llm_single, lambda q: _norm_key(q["question"]),
+                                   site="mcq")
+        return
+    n = 0
+    for q in _stream_json_items(_MCQ_SYS, _mcq_user_prompt(text, num_questions), "questions",
+                                model=OPENAI_MODEL_DEFAULT, max_output_tokens=_out_tokens("mcq", num_items=num_questions),
+                                site="mcq"):
+        c = _clean_mcq(q)
+        if c:
+            yield c
+            n += 1
+            if n >= num_questions:
+                return
+
 # =========================
 # Flashcards
 # =========================
+@metrics.traced("flashcards")
 def make_flashcards(text: str, num_cards: int = 6) -> List[List[str]]:
     sents = _sentences(text)
     if not sents: return []
@@ -270,80 +706,182 @@ def make_flashcards(text: str, num_cards: int = 6) -> List[List[str]]:
         if len(cards) >= num_cards: break
     return cards
 
-def make_flashcards_llm(text: str, num_cards: int = 6) -> List[Dict[str, str]]:
-    sys = "You produce short Q/A flashcards. Return JSON: {\"cards\":[{\"question\":\"...\",\"answer\":\"...\"}]}"
-    usr = f"Make {num_cards} flashcards (short question + short answer) from:\n{text}"
-    out = _call_llm_json(sys, usr, model=OPENAI_MODEL_DEFAULT, max_output_tokens=1200)
+_CARDS_SYS = "You produce short Q/A flashcards. Return JSON: {\"cards\":[{\"question\":\"...\",\"answer\":\"...\"}]}"
+
+def _cards_user_prompt(text: str, num_cards: int) -> str:
+    return f"Make {num_cards} flashcards (short question + short answer) from:\n{text}"
+
+def _clean_card(c: Any) -> Optional[Dict[str, str]]:
+    if not isinstance(c, dict):
+        return None
+    q = str(c.get("question","")).strip()
+    a = str(c.get("answer","")).strip()
+    return {"question": q, "answer": a} if q and a else None
+
+def _flashcards_llm_single(text: str, num_cards: int) -> List[Dict[str, str]]:
+    out = _call_llm_json(_CARDS_SYS, _cards_user_prompt(text, num_cards), model=OPENAI_MODEL_DEFAULT,
+                         max_output_tokens=_out_tokens("flashcards", num_items=num_cards), site="flashcards")
     cards = out.get("cards", [])
-    clean = []
-    for c in cards:
-        q = str(c.get("question","")).strip()
-        a = str(c.get("answer","")).strip()
-        if q and a:
-            clean.append({"question": q, "answer": a})
+    clean = [c for c in (_clean_card(x) for x in cards) if c]
     return clean[:num_cards]
 
+@metrics.traced("flashcards_llm")
+def make_flashcards_llm(text: str, num_cards: int = 6) -> List[Dict[str, str]]:
+    text = _llm_input(text, "flashcards")
+    if _count_tokens(text) <= LLM_CHUNK_TOKENS:
+        return _flashcards_llm_single(text, num_cards)
+    return list(_map_items_iter(text, num_cards, _flashcards_llm_single, lambda c: _norm_key(c["question"]),
+                                site="flashcards"))
+
+def stream_flashcards_llm(text: str, num_cards: int = 6) -> Iterator[Dict[str, str]]:
+    """Yields each card as soon as its JSON object (or its chunk, for long inputs) is complete."""
+    text = _llm_input(text, "flashcards")
+    if _count_tokens(text) > LLM_CHUNK_TOKENS:
+        yield from _map_items_iter(text, num_cards, _flashcards_llm_single, lambda c: _norm_key(c["question"]),
+                                   site="flashcards")
+        return
+    n = 0
+    for c in _stream_json_items(_CARDS_SYS, _cards_user_prompt(text, num_cards), "cards",
+                                model=OPENAI_MODEL_DEFAULT, max_output_tokens=_out_tokens("flashcards", num_items=num_cards),
+                                site="flashcards"):
+        card = _clean_card(c)
+        if card:
+            yield card
+            n += 1
+            if n >= num_cards:
+                return
+
 # =========================
 # Deadlines
 # =========================
+# Candidate pre-pass: only small windows around date-looking text reach dateparser.
+_MONTH = r"(?:jan(?:uary)?|feb(?:ruary)?|mar(?:ch)?|apr(?:il)?|may|june?|july?|aug(?:ust)?|sep(?:t(?:ember)?)?|oct(?:ober)?|nov(?:ember)?|dec(?:ember)?)"
+_WEEKDAY = r"(?:mon|tues?|wed(?:nes)?|thu(?:rs?)?|fri|sat(?:ur)?|sun)(?:day)?"
+_DATE_CANDIDATE = re.compile(
+    r"\b" + _MONTH + r"\.?\s+\d{1,2}(?:st|nd|rd|th)?(?:,?\s+\d{4})?\b"           # May 5, May 5th 2026
+    r"|\b\d{1,2}(?:st|nd|rd|th)?\s+(?:of\s+)?" + _MONTH + r"\b\.?(?:,?\s+\d{4})?"  # 5 May, 5th of May
+    r"|\b\d{4}-\d{1,2}-\d{1,2}\b|\b\d{1,2}[/.]\d{1,2}(?:[/.]\d{2,4})?\b"       # 2026-05-05, 5/5/26
+    r"|\b(?:in|by|until|till|before|during|of)\s+" + _MONTH + r"\b"                # in May, end of May
+    r"|\b(?:january|february|april|june|july|august|september|october|november|december)\b"  # bare month
+    r"|\b" + _WEEKDAY + r"\b"
+    r"|\b(?:today|tonight|tomorrow|next\s+week|in\s+\d+\s+(?:days?|weeks?))\b"
+    r"|\b(?:due|deadline|submit(?:ted)?\s+by)\b",
+    flags=re.I,
+)
+DEADLINE_WINDOW_CHARS = 48           # chars kept on each side of a candidate
+DEADLINE_LANGUAGES = tuple(x for x in os.getenv("STUDYMATE_DATE_LANGS", "en").split(",") if x)
+DEADLINE_PARALLEL_MIN_WINDOWS = 64   # below this a process pool costs more than it saves
+
+def _candidate_windows(s: str) -> List[Tuple[int, int]]:
+    """Merged [start, end) windows around every date-like candidate."""
+    spans = []
+    for m in _DATE_CANDIDATE.finditer(s):
+        a = max(0, m.start() - DEADLINE_WINDOW_CHARS)
+        b = min(len(s), m.end() + DEADLINE_WINDOW_CHARS)
+        if spans and a <= spans[-1][1]:
+            spans[-1] = (spans[-1][0], max(spans[-1][1], b))
+        else:
+            spans.append((a, b))
+    # widen to word boundaries so a window never starts / ends mid-token
+    out = []
+    for a, b in spans:
+        while a > 0 and not s[a - 1].isspace():
+            a -= 1
+        while b < len(s) and not s[b].isspace():
+            b += 1
+        out.append((a, b))
+    return out
+
+@functools.lru_cache(maxsize=4096)
+def _parse_window(window: str, base_day: str, languages: Tuple[str, ...]) -> Tuple[Tuple[str, str, int], ...]:
+    """dateparser on one window -> ((match, iso_date, offset in window), ...); cached per (window, day)."""
+    from dateparser.search import search_dates
+    settings = {
+        "PREFER_DATES_FROM": "future",
+        "RELATIVE_BASE": datetime.fromisoformat(base_day),
+        "RETURN_AS_TIMEZONE_AWARE": False,
+    }
+    try:
+        matches = search_dates(window, languages=list(languages), settings=settings) or []
+    except Exception:
+        return ()
+    found, cursor = [], 0
+    for mstr, dt in matches:
+        if not dt:
+            continue
+        # matches come back in text order; search forward from the previous hit
+        off = window.find(mstr, cursor)
+        if off < 0:
+            off = window.lower().find(mstr.lower())
+        if off >= 0:
+            cursor = off + len(mstr)
+        found.append((mstr, dt.date().isoformat(), off))
+    return tuple(found)
+
+def _parse_windows(windows: List[Tuple[int, str]], base_day: str, languages: Tuple[str, ...]) -> List[Tuple[str, str, int]]:
+    """Parse a batch of (absolute_start, window_text); returns (match, iso_date, absolute offset or -1)."""
+    out = []
+    for start, w in windows:
+        for mstr, iso, off in _parse_window(w, base_day, languages):
+            out.append((mstr, iso, start + off if off >= 0 else -1))
+    return out
+
+@metrics.traced("deadlines")
 def extract_deadlines(text: str) -> List[Dict[str, str]]:
     """
     Robust non-LLM deadline extractor.
-    Uses dateparser.search.search_dates to find explicit dates in free text,
-    captures a short context snippet, and extracts hh:mm if present.
+    A regex pre-pass (month names, weekdays, numeric dates, "due"/"deadline") picks small
+    windows; only those go to dateparser (language-restricted, cached per window), in
+    parallel for long texts. Captures a short context snippet and hh:mm if present.
     """
     try:
-        from datetime import datetime
-        import dateparser
-        from dateparser.search import search_dates
+        import dateparser  # noqa: F401
+        from dateparser.search import search_dates  # noqa: F401
     except Exception:
+        metrics.inc("studymate_fallbacks_total", site="deadlines", backend="dateparser")
         return [{"match": "", "iso_date": "", "time": "", "context": "INSTALL_DATEPARSER"}]
 
     s = (text or "").strip()
     if not s:
         return []
 
-    # settings tuned for assignments / forward-looking dates
-    settings = {
-        "PREFER_DATES_FROM": "future",
-        "RELATIVE_BASE": datetime.now(),
-        "RETURN_AS_TIMEZONE_AWARE": False,
-    }
+    base_day = datetime.now().date().isoformat()
+    windows = [(a, s[a:b]) for a, b in _candidate_windows(s)]
+    if not windows:
+        return []
 
-    results: List[Dict[str, str]] = []
+    if len(windows) < DEADLINE_PARALLEL_MIN_WINDOWS:
+        hits = _parse_windows(windows, base_day, DEADLINE_LANGUAGES)
+    else:
+        # dateparser is pure Python (GIL-bound): spread window batches over processes
+        workers = min(4, os.cpu_count() or 1)
+        size = -(-len(windows) // (workers * 4))
+        batches = [windows[i:i + size] for i in range(0, len(windows), size)]
+        hits = []
+        try:
+            with concurrent.futures.ProcessPoolExecutor(max_workers=workers) as ex:
+                for part in ex.map(_parse_windows, batches, [base_day] * len(batches),
+                                   [DEADLINE_LANGUAGES] * len(batches)):
+                    hits.extend(part)
+        except Exception:
+            hits = _parse_windows(windows, base_day, DEADLINE_LANGUAGES)
 
-    try:
-        matches = search_dates(s, languages=None, settings=settings)  # -> [(matched_str, datetime), ...]
-    except Exception:
-        matches = None
+    results: List[Dict[str, str]] = []
+    for mstr, iso, pos in hits:
+        ctx = ""
+        if pos >= 0:
+            ctx = s[max(0, pos - 80):min(len(s), pos + len(mstr) + 80)]
 
-    if matches:
-        for mstr, dt in matches:
-            if not dt:
-                continue
+        # Optional hh:mm inside the matched string
+        tmatch = re.search(r"\b([01]?\d|2[0-3]):([0-5]\d)\b", mstr)
+        hhmm = f"{int(tmatch.group(1)):02d}:{int(tmatch.group(2)):02d}" if tmatch else ""
 
-            # Find position of the matched text to extract context
-            span = None
-            for mm in re.finditer(re.escape(mstr), s, flags=re.IGNORECASE):
-                span = (mm.start(), mm.end())
-                break
-
-            ctx = ""
-            if span:
-                ctx_start = max(0, span[0] - 80)
-                ctx_end   = min(len(s), span[1] + 80)
-                ctx = s[ctx_start:ctx_end]
-
-            # Optional hh:mm inside the matched string
-            tmatch = re.search(r"\b([01]?\d|2[0-3]):([0-5]\d)\b", mstr)
-            hhmm = f"{int(tmatch.group(1)):02d}:{int(tmatch.group(2)):02d}" if tmatch else ""
-
-            results.append({
-                "match": mstr.strip(),
-                "iso_date": dt.date().isoformat(),
-                "time": hhmm,
-                "context": ctx,
-            })
+        results.append({
+            "match": mstr.strip(),
+            "iso_date": iso,
+            "time": hhmm,
+            "context": ctx,
+        })
 
     # de-dupe on (iso_date, match)
     uniq, seen = [], set()
@@ -360,16 +898,49 @@ def extract_deadlines(text: str) -> List[Dict[str, str]]:
 
     return uniq
 
-def extract_deadlines_llm(text: str) -> List[Dict[str, str]]:
+# rough count of date-like mentions, used to size the LLM output budget
+_DATEISH = re.compile(
+    r"\b(?:jan|feb|mar|apr|may|jun|jul|aug|sep|sept|oct|nov|dec)[a-z]*\.?\s+\d{1,2}\b|\b\d{1,4}[/.-]\d{1,2}[/.-]\d{1,4}\b",
+    flags=re.I)
+
+def _deadlines_llm_single(text: str) -> List[Dict[str, str]]:
     sys = "Extract deadlines as JSON list with objects: {match, iso_date, time, context}."
     usr = f"Text:\n{text}\n\nReturn JSON {{\"deadlines\":[...]}} with 0+ items."
-    out = _call_llm_json(sys, usr, model=OPENAI_MODEL_DEFAULT, max_output_tokens=1600)
+    mentions = len(_DATEISH.findall(text))
+    out = _call_llm_json(sys, usr, model=OPENAI_MODEL_DEFAULT,
+                         max_output_tokens=_out_tokens("deadlines", num_items=max(3, mentions)), site="deadlines")
     return out.get("deadlines", [])
 
+@metrics.traced("deadlines_llm")
+def extract_deadlines_llm(text: str) -> List[Dict[str, str]]:
+    text = _llm_input(text, "deadlines")
+    chunks = _split_by_token_budget(text)
+    if len(chunks) <= 1:
+        return _deadlines_llm_single(text)
+    # every chunk scanned concurrently; merge in document order, de-duped on (iso_date, match)
+    merged, seen = [], set()
+    for found in _map_chunks(chunks, _deadlines_llm_single, site="deadlines"):
+        for d in found or []:
+            if not isinstance(d, dict):
+                continue
+            key = (str(d.get("iso_date") or ""), str(d.get("match") or "").lower())
+            if key in seen:
+                continue
+            seen.add(key)
+            merged.append(d)
+    return merged
+
 # =========================
 # Web Research (DuckDuckGo via ddgs + trafilatura)
 # =========================
 def _web_search(query: str, max_results: int = 5) -> List[Dict[str, str]]:
+    # STUDYMATE_SEARCH_URL points at a JSON search endpoint (e.g. `python research.py --standin`)
+    search_url = os.getenv("STUDYMATE_SEARCH_URL")
+    if search_url:
+        import requests
+        r = requests.get(search_url, params={"q": query, "n": max_results}, timeout=10)
+        r.raise_for_status()
+        return [{"title": h.get("title", ""), "url": h["url"]} for h in r.json() if h.get("url")][:max_results]
     # prefer ddgs; fallback to duckduckgo_search if present
     results = []
     try:
@@ -384,10 +955,45 @@ def _web_search(query: str, max_results: int = 5) -> List[Dict[str, str]]:
             results.append({"title": r.get("title",""), "url": url})
     return results[:max_results]
 
+ARTICLE_CACHE_TTL_S = float(os.getenv("STUDYMATE_ARTICLE_CACHE_TTL", str(3 * 24 * 3600)))
+_ARTICLES = None
+
+def _get_article_cache():
+    global _ARTICLES
+    if _ARTICLES is None:
+        from cache_store import DiskCache
+        _ARTICLES = DiskCache("articles", max_entries=None, max_bytes=100 * 1024 * 1024, ttl_s=ARTICLE_CACHE_TTL_S)
+    return _ARTICLES
+
 def _fetch_article_text(url: str, max_chars: int = 6000) -> str:
+    """Fetch + extract main text; cached so repeated reports on a topic skip the network."""
+    from cache_store import make_key
+    cache = _get_article_cache()
+    key = make_key("article", url, max_chars)
+    hit = cache.get(key)
+    if hit is not None:
+        return hit
+    txt = _fetch_article_text_uncached(url, max_chars)
+    if txt:
+        cache.set(key, txt)
+    return txt
+
+def _is_standin_url(url: str) -> bool:
+    # trafilatura refuses loopback hosts (SSRF guard); allow them only when search itself
+    # is pointed at a loopback stand-in server
+    from urllib.parse import urlsplit
+    search_url = os.getenv("STUDYMATE_SEARCH_URL") or ""
+    local = ("127.0.0.1", "localhost", "::1")
+    return urlsplit(search_url).hostname in local and urlsplit(url).hostname in local
+
+def _fetch_article_text_uncached(url: str, max_chars: int = 6000) -> str:
     try:
         import trafilatura
-        downloaded = trafilatura.fetch_url(url)
+        if _is_standin_url(url):
+            import requests
+            downloaded = requests.get(url, timeout=10).text
+        else:
+            downloaded = trafilatura.fetch_url(url)
         if not downloaded: 
             return ""
         txt = trafilatura.extract(downloaded, include_comments=False, include_tables=False) or ""
@@ -399,74 +1005,128 @@ def _fetch_article_text(url: str, max_chars: int = 6000) -> str:
 # =========================
 # Report (LLM + Web)
 # =========================
-def make_report_llm(notes_text: str, topic: Optional[str] = None, max_sources: int = 5, target_words: int = 1200) -> Dict[str, Any]:
-    """
-    Builds an extended study report:
-      - infer key topics from notes (if no topic provided)
-      - search web, fetch a few reputable sources
-      - draft a structured report with citations (inline [1], [2], ...)
-    Returns: {"report_md": str, "sources": [{"title","url"}...]}
-    """
-    base = re.sub(r"\s+", " ", (notes_text or "")).strip()
-    if not base:
-        return {"report_md": "", "sources": []}
+REPORT_NOTES_TOKENS = 2000      # student notes share of the drafting prompt
+REPORT_SOURCES_TOKENS = 3000    # split across web sources by relevance to the notes
 
+def _condense_notes(base: str) -> str:
+    """Notes that fit the report budget are used as-is; longer ones are map-reduced into part summaries."""
+    if _count_tokens(base) <= REPORT_NOTES_TOKENS:
+        return base
+    chunks = _split_by_token_budget(base)
+    import token_budget
+    per_chunk = max(60, int(REPORT_NOTES_TOKENS / token_budget.TOKENS_PER_WORD * 0.8) // len(chunks))
+    partials = _map_chunks(chunks, lambda ch: _call_llm_text(
+        _PART_SUMMARY_SYS, f"Summarize this part of the student's notes (about {per_chunk} words):\n\n{ch}",
+        model=OPENAI_MODEL_DEFAULT, max_output_tokens=_out_tokens(target_words=per_chunk), site="report_notes"),
+        site="report_notes")
+    return "\n".join(p for p in partials if p)
+
+def _report_research(base: str, topic: Optional[str], max_sources: int) -> List[Dict[str, str]]:
+    """Steps 1-2 of the report: pick search topics, then search + fetch articles."""
     # 1) If topic hint not provided, ask LLM to infer search topics
     if not topic:
         sys = "You pick concise search topics for studying given notes. Return JSON: {\"topics\":[\"...\"]}"
-        usr = f"Notes:\n{base[:4000]}\n\nPropose 3-5 short search topics."
+        usr = f"Notes:\n{base}\n\nPropose 3-5 short search topics."
         try:
-            out = _call_llm_json(sys, usr, model=OPENAI_MODEL_DEFAULT, max_output_tokens=600)
+            out = _call_llm_json(sys, usr, model=OPENAI_MODEL_DEFAULT,
+                                 max_output_tokens=_out_tokens("topics", num_items=5), site="report_topics")
             topics = out.get("topics", [])
         except Exception:
             topics = []
         if not topics:
             # fallback: quick keywords
+            metrics.inc("studymate_fallbacks_total", site="report_topics", backend="llm")
             tokens = [t for t in re.findall(r"[A-Za-z][A-Za-z\-']+", base.lower()) if len(t) > 3]
             topics = list(dict.fromkeys(tokens))[:4]
     else:
         topics = [topic]
 
-    # 2) Web search & fetch
-    picked = []
-    for t in topics:
-        for r in _web_search(t, max_results=2):
-            if len(picked) >= max_sources: break
-            art = _fetch_article_text(r["url"])
-            if len(art) > 400:
-                picked.append({"title": r["title"], "url": r["url"], "text": art})
-        if len(picked) >= max_sources: break
+    # 2) Web search & fetch: all topics searched in parallel, articles fetched as results
+    #    arrive, duplicates skipped, early stop at max_sources, bounded by a global deadline
+    import research
+    return research.collect_sources(topics, _web_search, _fetch_article_text, max_sources=max_sources)
 
-    # 3) Draft report with LLM (give it notes + snippets)
-    sources_for_llm = "\n\n".join([f"[{i+1}] {s['title']} — {s['url']}\n{s['text'][:1200]}" for i, s in enumerate(picked)])
+def _report_prompts(base: str, picked: List[Dict[str, str]], target_words: int) -> Tuple[str, str]:
+    import token_budget
+    base = token_budget.truncate_to_tokens(base, REPORT_NOTES_TOKENS, OPENAI_MODEL_DEFAULT)
+    # more relevant sources get a larger share of the source budget; short ones leave room for the rest
+    texts = token_budget.fit_sources(REPORT_SOURCES_TOKENS, base, [s["text"] for s in picked], model=OPENAI_MODEL_DEFAULT)
+    sources_for_llm = "\n\n".join([f"[{i+1}] {s['title']} — {s['url']}\n{t}" for i, (s, t) in enumerate(zip(picked, texts))])
     sys = (
         "You are an expert study assistant. Write a cohesive, student-friendly report in Markdown with:\n"
         "- Title & short abstract\n- Key concepts explained clearly\n- Worked examples or analogies\n"
         "- Short FAQ\n- Further reading list\nUse inline citations like [1], [2] referring to the sources list."
     )
     usr = (
-        f"Student notes (cleaned):\n{base[:8000]}\n\n"
+        f"Student notes (cleaned):\n{base}\n\n"
         f"Relevant sources (snippets, numbered):\n{sources_for_llm}\n\n"
         f"Write a {target_words}±20% word report that covers the notes and fills gaps using the sources. "
         f"Keep it accurate, readable, and well-structured. End with a numbered Sources section."
     )
-    report_md = _call_llm_text(sys, usr, model=OPENAI_MODEL_DEFAULT, max_output_tokens=3000)
+    return sys, usr
+
+@metrics.traced("report_llm")
+def make_report_llm(notes_text: str, topic: Optional[str] = None, max_sources: int = 5, target_words: int = 1200) -> Dict[str, Any]:
+    """
+    Builds an extended study report:
+      - infer key topics from notes (if no topic provided)
+      - search web, fetch a few reputable sources
+      - draft a structured report with citations (inline [1], [2], ...)
+    Returns: {"report_md": str, "sources": [{"title","url"}...]}
+    """
+    base = re.sub(r"\s+", " ", (notes_text or "")).strip()
+    if not base:
+        return {"report_md": "", "sources": []}
+    base = _llm_input(base, "report")
+
+    try:
+        base = _condense_notes(base)
+    except Exception:
+        base = _truncate(base, REPORT_NOTES_TOKENS * 4)
+    picked = _report_research(base, topic, max_sources)
+
+    # 3) Draft report with LLM (give it notes + snippets)
+    sys, usr = _report_prompts(base, picked, target_words)
+    report_md = _call_llm_text(sys, usr, model=OPENAI_MODEL_DEFAULT,
+                               max_output_tokens=_out_tokens(target_words=target_words), site="report")
 
     # 4) Prepare sources list for UI
     sources_meta = [{"title": s["title"], "url": s["url"]} for s in picked]
     return {"report_md": report_md, "sources": sources_meta}
 
+def stream_report_llm(notes_text: str, topic: Optional[str] = None, max_sources: int = 5,
+                      target_words: int = 1200) -> Tuple[List[Dict[str, str]], Iterator[str]]:
+    """
+    Same pipeline as make_report_llm, but the drafting step streams.
+    Research runs eagerly; returns (sources, iterator of Markdown deltas).
+    """
+    base = re.sub(r"\s+", " ", (notes_text or "")).strip()
+    if not base:
+        return [], iter(())
+    base = _llm_input(base, "report")
+    try:
+        base = _condense_notes(base)
+    except Exception:
+        base = _truncate(base, REPORT_NOTES_TOKENS * 4)
+    picked = _report_research(base, topic, max_sources)
+    sys, usr = _report_prompts(base, picked, target_words)
+    sources_meta = [{"title": s["title"], "url": s["url"]} for s in picked]
+    return sources_meta, _stream_llm_text(sys, usr, model=OPENAI_MODEL_DEFAULT,
+                                          max_output_tokens=_out_tokens(target_words=target_words), site="report")
+
 # =========================
-# Save Markdown → PDF (simple)
+# Markdown → PDF (simple, in memory)
 # =========================
-def save_report_pdf(markdown_text: str, pdf_path: str):
+@metrics.traced("render")
+def render_report_pdf(markdown_text: str) -> bytes:
     """
     Minimal Markdown-to-PDF using reportlab. (No images/links rendering.)
-    Produces a clean, printable study handout.
+    Produces a clean, printable study handout, built directly into memory.
     """
     from reportlab.pdfgen import canvas
     from reportlab.lib.pagesizes import A4
     from reportlab.lib.units import cm
+    import io
 
     # strip basic MD symbols for PDF text layout
     txt = markdown_text or ""
@@ -476,7 +1136,8 @@ def save_report_pdf(markdown_text: str, pdf_path: str):
     txt = re.sub(r"[*_~>#-]+", " ", txt)
     txt = re.sub(r"\s+", " ", txt).strip()
 
-    c = canvas.Canvas(pdf_path, pagesize=A4)
+    buf = io.BytesIO()
+    c = canvas.Canvas(buf, pagesize=A4)
     W, H = A4
     x, y = 2*cm, H - 2*cm
     c.setTitle("Study Report")
@@ -500,3 +1161,9 @@ def save_report_pdf(markdown_text: str, pdf_path: str):
         y -= 4
 
     c.save()
+    return buf.getvalue()
+
+def save_report_pdf(markdown_text: str, pdf_path: str):
+    """Writes render_report_pdf() output to pdf_path (kept for callers that want a file)."""
+    with open(pdf_path, "wb") as f:
+        f.write(render_report_pdf(markdown_text))
@@ -0,0 +1,84 @@
+# precompute.py — speculative precomputation as soon as text is available
+# ----------------------------------------------------------
+#  - speculate(text): background job filling the result cache with the cheap, non-LLM results
+#    each page would compute on its first click (extractive summary, regex/dateparser deadlines,
+#    baseline MCQs / flashcards) plus chunking and, when available, chunk embeddings
+#  - uses the pages' default settings and the same text normalization, so the keys match
+#  - runs on its own single-worker pool: never takes a slot from a job the user asked for
+#  - opt-in (uploader toggle, default from STUDYMATE_SPECULATIVE=1); a new input cancels the old job
+
+import os, re, io, importlib.util
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from jobs import JobContext, JobRunner
+
+SPECULATIVE_DEFAULT = os.getenv("STUDYMATE_SPECULATIVE", "0") == "1"
+EMBED_MODEL = os.getenv("STUDYMATE_EMBED_MODEL", "sentence-transformers/all-MiniLM-L6-v2")
+
+# must match the widget defaults on each page
+PAGE_DEFAULTS = {
+    "summary": {"mode": "extractive", "target_words": 150, "max_chars_input": 12000, "timeout_s": 25.0},
+    "quiz": {"num_questions": 6, "seed": 42},
+    "flashcards": {"num_cards": 6},
+}
+
+SPECULATIVE = JobRunner(max_workers=1)
+
+def chunk_text(text: str) -> List[str]:
+    from preprocess import make_chunks
+    from result_cache import RESULTS
+    return RESULTS.get_or_compute("chunks", text, {"chunk_size": 800, "overlap": 150},
+                                  lambda: make_chunks(text, chunk_size=800, overlap=150))
+
+def chunk_embeddings(text: str, model: str = EMBED_MODEL) -> Tuple[List[str], Any]:
+    """(chunks, normalized embedding matrix) without near-duplicate chunks; the matrix is cached as .npy bytes."""
+    import numpy as np
+    from dedup import DEDUP_ENABLED, THRESHOLD, dedup_chunks
+    from model_registry import get_service
+    from result_cache import RESULTS
+    dedup = THRESHOLD if DEDUP_ENABLED else None
+    chunks = RESULTS.get_or_compute("chunks", text, {"chunk_size": 800, "overlap": 150, "dedup": dedup},
+                                    lambda: dedup_chunks(chunk_text(text), site="chunk_embeddings")[0])
+
+    def _encode() -> bytes:
+        buf = io.BytesIO()
+        np.save(buf, get_service().embed(model, chunks, normalize=True), allow_pickle=False)
+        return buf.getvalue()
+    blob = RESULTS.get_or_compute("embeddings", text, {"model": model, "chunks": "800/150", "dedup": dedup}, _encode)
+    return chunks, np.load(io.BytesIO(blob), allow_pickle=False)
+
+def _embeddings_available() -> bool:
+    return importlib.util.find_spec("sentence_transformers") is not None
+
+def _stages(text: str) -> List[Tuple[str, Callable[[], Any]]]:
+    from result_cache import cached_summary, cached_mcq, cached_flashcards, cached_deadlines
+    s, q, f = PAGE_DEFAULTS["summary"], PAGE_DEFAULTS["quiz"], PAGE_DEFAULTS["flashcards"]
+    stages = [
+        ("summary", lambda: cached_summary(re.sub(r"\s+", " ", text).strip(), **s)),
+        ("deadlines", lambda: cached_deadlines(text, llm=False)),
+        ("quiz", lambda: cached_mcq(re.sub(r"\s+", " ", text), q["num_questions"], q["seed"])),
+        ("flashcards", lambda: cached_flashcards(text, f["num_cards"])),
+        ("chunks", lambda: chunk_text(text)),
+    ]
+    if _embeddings_available():
+        stages.append(("embeddings", lambda: chunk_embeddings(text)))
+    return stages
+
+def _speculative_job(ctx: JobContext, text: str) -> Dict[str, str]:
+    stages = _stages(text)
+    done: Dict[str, str] = {}
+    for i, (name, fn) in enumerate(stages):
+        ctx.progress(name, i / len(stages))
+        try:
+            fn()
+            done[name] = "ok"
+        except Exception as e:            # best effort: the page computes it on click instead
+            done[name] = f"skipped ({type(e).__name__})"
+    return done
+
+def speculate(text: str, previous_job: Optional[str] = None) -> Optional[str]:
+    """Cancel the previous speculative job (if any) and start one for text. Returns the job id."""
+    SPECULATIVE.cancel(previous_job)
+    if not (text or "").strip():
+        return None
+    return SPECULATIVE.submit("speculative", _speculative_job, text)
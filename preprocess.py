@@ -1,6 +1,8 @@
 import re
 from typing import List, Tuple
 
+from metrics import traced
+
 SENT_SPLIT = re.compile(r'(?<=[.!?])\s+')
 
 def clean_text(t: str) -> str:
@@ -14,6 +16,7 @@ def split_sentences(t: str) -> List[str]:
     sents = SENT_SPLIT.split(t)
     return [s.strip() for s in sents if s.strip()]
 
+@traced("chunk")
 def make_chunks(text: str, chunk_size: int = 800, overlap: int = 150) -> List[str]:
     sents = split_sentences(text)
     chunks, cur = [], ""
@@ -0,0 +1,182 @@
+# quiz_report.py — quiz statistics + in-memory PDF report (no Streamlit)
+# ----------------------------------------------------------
+#  - infer_topic_from_question(): 2-3 keyword topic label
+#  - quiz_stats(): score, per-topic accuracy, question review
+#  - chart_*_png(): matplotlib Figure on the Agg canvas -> PNG bytes (no pyplot state, thread-safe)
+#  - build_quiz_pdf_bytes(): PDF straight into a BytesIO, cached per (results hash, export day)
+
+import io, re, json, hashlib, threading
+from collections import OrderedDict, defaultdict
+from datetime import date, datetime
+from typing import Any, Dict, List, Optional
+
+from metrics import traced
+
+_STOP = {
+    "the","a","an","and","or","but","if","while","with","into","onto","from","of","in","on","for","to",
+    "is","are","was","were","be","been","being","this","that","these","those","it","its","their","his",
+    "her","your","our","they","you","we","as","at","by","not","no","do","does","did","so","such","than",
+    "then","there","here","over","under","between","within","without","about","above","below","out"
+}
+
+def infer_topic_from_question(q: str) -> str:
+    toks = re.findall(r"[A-Za-z][A-Za-z\-']+", q or "")
+    toks = [t for t in toks if t.lower() not in _STOP]
+    return " ".join(toks[:3]) if toks else "General"
+
+def quiz_stats(qs: List[Dict[str, Any]], answers_map: Dict[str, Optional[str]]) -> Dict[str, Any]:
+    total = len(qs)
+    correct, wrong = 0, 0
+    topic_stats = defaultdict(lambda: {"correct": 0, "total": 0})
+    q_review = []  # (qtext, your, corr, right, topic)
+
+    for i, q in enumerate(qs, start=1):
+        topic = q.get("topic") or infer_topic_from_question(q["question"])
+        your_ans = answers_map.get(f"q_{i}")
+        right = (your_ans == q["answer"])
+        topic_stats[topic]["total"] += 1
+        if right:
+            topic_stats[topic]["correct"] += 1
+            correct += 1
+        else:
+            wrong += 1
+        q_review.append((q["question"], your_ans or "—", q["answer"], right, topic))
+        q["topic"] = topic
+
+    strong = [t for t, v in topic_stats.items() if v["correct"] / v["total"] >= 0.8]
+    weak   = [t for t, v in topic_stats.items() if v["correct"] / v["total"] < 0.5]
+    return {"total": total, "correct": correct, "wrong": wrong, "topic_stats": dict(topic_stats),
+            "q_review": q_review, "strong": strong, "weak": weak}
+
+def summary_text(strong: List[str], weak: List[str]) -> str:
+    out = []
+    if strong: out.append(f"Strong topics: {', '.join(strong)}.")
+    if weak:   out.append(f"Needs improvement: {', '.join(weak)}.")
+    if not out: out.append("Performance balanced across topics.")
+    return " ".join(out)
+
+# =========================
+# Charts (Agg, in memory)
+# =========================
+def _figure(figsize):
+    # Figure + Agg canvas directly: no pyplot global state, safe from worker threads
+    from matplotlib.figure import Figure
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+    fig = Figure(figsize=figsize)
+    FigureCanvasAgg(fig)
+    return fig
+
+def _png(fig) -> bytes:
+    buf = io.BytesIO()
+    fig.tight_layout()
+    fig.savefig(buf, format="png", dpi=150)
+    return buf.getvalue()
+
+def chart_overall_png(correct: int, wrong: int) -> bytes:
+    fig = _figure((3.8, 3))
+    ax = fig.add_subplot()
+    ax.bar(["Correct", "Wrong"], [correct, wrong], color=["#43e97b", "#ff758c"])
+    ax.set_title("Overall Performance")
+    return _png(fig)
+
+def chart_topics_png(topic_stats: Dict[str, Dict[str, int]]) -> bytes:
+    topics = list(topic_stats.keys())
+    acc = [round(100 * v["correct"] / v["total"], 1) for v in topic_stats.values()]
+    fig = _figure((5, 3.5))
+    ax = fig.add_subplot()
+    ax.barh(topics, acc, color="#00c6ff")
+    ax.set_xlabel("Accuracy (%)")
+    ax.set_title("Topic-wise Accuracy")
+    return _png(fig)
+
+# =========================
+# PDF
+# =========================
+@traced("render")
+def render_quiz_pdf(student_name: str, stats: Dict[str, Any], when: Optional[str] = None) -> bytes:
+    """
+    Detailed PDF ("Date:" line is `when`, default now):
+     • Overall correct/wrong bar
+     • Topic-wise accuracy bar
+     • Summary of strong/weak topics
+     • Question review
+    """
+    from reportlab.pdfgen import canvas
+    from reportlab.lib.pagesizes import A4
+    from reportlab.lib.units import cm
+    from reportlab.lib.utils import ImageReader
+
+    total, correct = stats["total"], stats["correct"]
+    buf = io.BytesIO()
+    c = canvas.Canvas(buf, pagesize=A4)
+    W, H = A4
+    x, y = 2*cm, H - 2*cm
+
+    c.setFont("Helvetica-Bold", 16); c.drawString(x, y, "StudyMate — Quiz Performance Report")
+    y -= 20
+    c.setFont("Helvetica", 11)
+    c.drawString(x, y, f"Student: {student_name or '—'}"); y -= 14
+    c.drawString(x, y, f"Date: {when or datetime.now().strftime('%Y-%m-%d %H:%M')}"); y -= 18
+    pct = round(100*correct/total, 1) if total else 0.0
+    c.setFont("Helvetica-Bold", 12); c.drawString(x, y, f"Score: {correct}/{total}  ({pct}%)"); y -= 18
+
+    # charts
+    try:
+        img = ImageReader(io.BytesIO(chart_overall_png(correct, stats["wrong"])))
+        c.drawImage(img, x, y-7*cm, width=8*cm, height=6*cm, preserveAspectRatio=True); y -= 7*cm + 12
+    except Exception: pass
+    try:
+        img = ImageReader(io.BytesIO(chart_topics_png(stats["topic_stats"])))
+        c.drawImage(img, x, y-7*cm, width=10*cm, height=6*cm, preserveAspectRatio=True); y -= 7*cm + 16
+    except Exception: pass
+
+    c.setFont("Helvetica-Bold", 12); c.drawString(x, y, "Summary:"); y -= 14
+    c.setFont("Helvetica", 11)
+    for line in summary_text(stats["strong"], stats["weak"]).split(". "):
+        c.drawString(x, y, line.strip()); y -= 14
+        if y < 3*cm: c.showPage(); y = H - 3*cm; c.setFont("Helvetica", 11)
+
+    # question review
+    c.showPage(); y = H - 2*cm
+    c.setFont("Helvetica-Bold", 14); c.drawString(x, y, "Question Review"); y -= 18
+    c.setFont("Helvetica", 10)
+    for qtext, your, corr, right, topic in stats["q_review"]:
+        mark = "✅" if right else "❌"
+        line = f"{mark} {topic} | Your: {your} | Ans: {corr}"
+        for seg in [qtext, line]:
+            for chunk in [seg[i:i+95] for i in range(0, len(seg), 95)]:
+                c.drawString(x, y, chunk); y -= 12
+                if y < 3*cm: c.showPage(); y = H - 2*cm; c.setFont("Helvetica", 10)
+        y -= 8
+
+    c.save()
+    return buf.getvalue()
+
+_PDF_CACHE: "OrderedDict[str, bytes]" = OrderedDict()
+_PDF_CACHE_MAX = 64
+_PDF_LOCK = threading.Lock()
+
+def results_hash(student_name: str, qs: List[Dict[str, Any]], answers_map: Dict[str, Optional[str]]) -> str:
+    payload = {
+        "student": student_name or "",
+        "qs": [{"q": q.get("question"), "o": q.get("options"), "a": q.get("answer"),
+                "t": q.get("topic") or infer_topic_from_question(q.get("question", ""))} for q in qs],
+        "answers": {k: v for k, v in sorted(answers_map.items()) if k.startswith("q_")},
+    }
+    return hashlib.sha256(json.dumps(payload, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
+def build_quiz_pdf_bytes(student_name: str, qs: List[Dict[str, Any]], answers_map: Dict[str, Optional[str]]) -> bytes:
+    """Quiz report PDF as bytes; identical results exported on the same day reuse the rendered document."""
+    day = date.today().isoformat()          # the PDF is dated: a later export must not show an old stamp
+    key = f"{results_hash(student_name, qs, answers_map)}:{day}"
+    with _PDF_LOCK:
+        hit = _PDF_CACHE.get(key)
+        if hit is not None:
+            _PDF_CACHE.move_to_end(key)
+            return hit
+    pdf = render_quiz_pdf(student_name, quiz_stats(qs, answers_map), when=day)
+    with _PDF_LOCK:
+        _PDF_CACHE[key] = pdf
+        while len(_PDF_CACHE) > _PDF_CACHE_MAX:
+            _PDF_CACHE.popitem(last=False)
+    return pdf
@@ -0,0 +1,168 @@
+# research.py — concurrent web research stage for make_report_llm
+# ----------------------------------------------------------
+#  - collect_sources(): searches all topics in parallel, fetches + extracts
+#    articles concurrently as results arrive, de-duplicates URLs (and mirrored / syndicated
+#    copies of an article already picked, see dedup.py), stops early once max_sources good
+#    articles are in, and respects a global deadline
+#  - serve_standin(): local search + article server for offline testing
+#      python research.py --standin 8765
+#      STUDYMATE_SEARCH_URL=http://127.0.0.1:8765/search streamlit run app.py
+
+import os, re, time, json, threading
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from typing import Callable, Dict, List, Optional
+from urllib.parse import urlsplit, urlunsplit, parse_qsl, urlencode
+
+RESEARCH_DEADLINE_S = float(os.getenv("STUDYMATE_RESEARCH_DEADLINE", "20"))
+RESEARCH_WORKERS = int(os.getenv("STUDYMATE_RESEARCH_WORKERS", "8"))
+
+def normalize_url(url: str) -> str:
+    """Canonical form for de-duplication: lowercase host, no fragment / tracking params / trailing slash."""
+    try:
+        p = urlsplit(url.strip())
+    except Exception:
+        return url
+    query = urlencode([(k, v) for k, v in parse_qsl(p.query) if not k.lower().startswith(("utm_", "ref"))])
+    path = p.path.rstrip("/") or "/"
+    return urlunsplit((p.scheme.lower(), p.netloc.lower().removeprefix("www."), path, query, ""))
+
+def collect_sources(
+    topics: List[str],
+    search_fn: Callable[[str, int], List[Dict[str, str]]],
+    fetch_fn: Callable[[str], str],
+    max_sources: int = 5,
+    per_topic: int = 3,
+    min_chars: int = 400,
+    deadline_s: Optional[float] = None,
+    max_workers: Optional[int] = None,
+) -> List[Dict[str, str]]:
+    """
+    Returns up to max_sources [{"title","url","text"}], ordered by (topic order, search rank)
+    so citations are stable regardless of which fetch finished first.
+    """
+    if max_sources <= 0 or not topics:
+        return []
+    t_end = time.monotonic() + (RESEARCH_DEADLINE_S if deadline_s is None else deadline_s)
+    ex = ThreadPoolExecutor(max_workers=max_workers or RESEARCH_WORKERS, thread_name_prefix="research")
+    searches = {ex.submit(search_fn, t, per_topic): ti for ti, t in enumerate(topics)}
+    fetches: Dict[object, tuple] = {}
+    seen, picked = set(), []
+    from dedup import DEDUP_ENABLED, NearDupFilter, record
+    copies, owners, n_fetched, n_copies, chars, chars_copies = NearDupFilter(), {}, 0, 0, 0, 0
+    pending = set(searches)
+    try:
+        while pending and len(picked) < max_sources:
+            left = t_end - time.monotonic()
+            if left <= 0:
+                break
+            done, pending = wait(pending, timeout=left, return_when=FIRST_COMPLETED)
+            for fut in done:
+                if fut in searches:
+                    ti = searches[fut]
+                    try:
+                        hits = fut.result() or []
+                    except Exception:
+                        hits = []
+                    for rank, r in enumerate(hits):
+                        url = (r or {}).get("url")
+                        if not url:
+                            continue
+                        key = normalize_url(url)
+                        if key in seen:
+                            continue
+                        seen.add(key)
+                        f2 = ex.submit(fetch_fn, url)
+                        fetches[f2] = (ti, rank, r.get("title", ""), url)
+                        pending.add(f2)
+                else:
+                    ti, rank, title, url = fetches[fut]
+                    try:
+                        art = fut.result() or ""
+                    except Exception:
+                        art = ""
+                    if len(art) <= min_chars or len(picked) >= max_sources:
+                        continue
+                    entry = {"title": title, "url": url, "text": art, "_order": (ti, rank)}
+                    dup = copies.add(art) if DEDUP_ENABLED else None
+                    n_fetched += 1
+                    chars += len(art)
+                    if dup is not None:                  # same article under another URL
+                        n_copies += 1
+                        chars_copies += len(art)
+                        if entry["_order"] < owners[dup]["_order"]:   # cite the better-ranked copy
+                            owners[dup].update(entry)
+                        continue
+                    owners[n_fetched - 1] = entry
+                    picked.append(entry)
+    finally:
+        # don't wait for stragglers: late fetches still finish (and fill the cache) in the background
+        ex.shutdown(wait=False, cancel_futures=True)
+    record("sources", n_fetched, n_copies, chars, chars_copies)
+    picked.sort(key=lambda s: s["_order"])
+    for s in picked:
+        s.pop("_order", None)
+    return picked
+
+# =========================
+# Local stand-in search / article server
+# =========================
+def serve_standin(port: int = 8765, host: str = "127.0.0.1", latency_s: float = 0.0, articles_per_query: int = 3):
+    """
+    GET /search?q=<topic>&n=<k>  -> JSON [{"title","url"}] pointing at /article/... on this server
+    GET /article/<slug>           -> HTML page with deterministic paragraphs about the slug
+    """
+    from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+    class Handler(BaseHTTPRequestHandler):
+        def log_message(self, *args):
+            pass
+
+        def _send(self, code: int, body: bytes, ctype: str):
+            self.send_response(code)
+            self.send_header("Content-Type", ctype)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self):
+            if latency_s:
+                time.sleep(latency_s)
+            p = urlsplit(self.path)
+            q = dict(parse_qsl(p.query))
+            if p.path == "/search":
+                topic = q.get("q", "")
+                n = int(q.get("n", articles_per_query))
+                slug = re.sub(r"[^a-z0-9]+", "-", topic.lower()).strip("-") or "topic"
+                base = f"http://{host}:{port}"
+                hits = [{"title": f"{topic} — part {i + 1}", "url": f"{base}/article/{slug}-{i + 1}"} for i in range(n)]
+                self._send(200, json.dumps(hits).encode("utf-8"), "application/json")
+            elif p.path.startswith("/article/"):
+                slug = p.path.rsplit("/", 1)[-1]
+                words = slug.replace("-", " ")
+                paras = "".join(
+                    f"<p>Section {i + 1} about {words}. This paragraph explains {words} in plain terms, "
+                    f"with a definition, an example and a common misconception students have about {words}.</p>"
+                    for i in range(8))
+                html = f"<html><head><title>{words}</title></head><body><article><h1>{words}</h1>{paras}</article></body></html>"
+                self._send(200, html.encode("utf-8"), "text/html; charset=utf-8")
+            else:
+                self._send(404, b"not found", "text/plain")
+
+    srv = ThreadingHTTPServer((host, port), Handler)
+    t = threading.Thread(target=srv.serve_forever, daemon=True)
+    t.start()
+    return srv
+
+if __name__ == "__main__":
+    import argparse
+    ap = argparse.ArgumentParser(description="Local stand-in search/article server for report tests.")
+    ap.add_argument("--standin", type=int, default=8765, metavar="PORT")
+    ap.add_argument("--latency", type=float, default=0.0, help="seconds of delay per request")
+    args = ap.parse_args()
+    serve_standin(args.standin, latency_s=args.latency)
+    print(f"stand-in search at http://127.0.0.1:{args.standin}/search?q=...  (Ctrl+C to stop)")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,183 @@
+# result_cache.py — cross-session cache for page actions (summary, quiz, flashcards, deadlines)
+# ----------------------------------------------------------
+#  - key = (action, text hash, params, backend version): a new OPENAI_MODEL, neural model
+#    or local-algorithm version gives new keys, so stale results are never served
+#  - two tiers: in-process LRU (shared by every Streamlit session) over a SQLite DiskCache
+#  - get_or_compute(): concurrent identical requests run once (single-flight)
+#  - stats(): memory / disk hits and misses per action
+
+import os, copy, threading
+from collections import OrderedDict, defaultdict
+from typing import Any, Callable, Dict, Optional
+
+import metrics
+from cache_store import DiskCache, SingleFlight, make_key, text_hash
+
+RESULT_CACHE_ENABLED = os.getenv("STUDYMATE_RESULT_CACHE", "1") != "0"
+RESULT_MEMORY_ITEMS = int(os.getenv("STUDYMATE_RESULT_MEMORY_ITEMS", "256"))
+RESULT_DISK_MB = float(os.getenv("STUDYMATE_RESULT_CACHE_MB", "100"))
+RESULT_TTL_S = float(os.getenv("STUDYMATE_RESULT_TTL", str(30 * 24 * 3600)))
+
+# bump when a local (non-model) algorithm changes its output
+LOCAL_VERSION = "1"
+
+def backend_version(action: str, params: Dict[str, Any]) -> str:
+    import nlp_tasks
+    if action == "summarize":
+        mode = params.get("mode")
+        if mode == "llm":
+            return f"llm:{nlp_tasks.llm_version()}"
+        if mode == "neural":
+            return f"neural:{nlp_tasks._NEURAL_MODEL}"
+        return f"local:{LOCAL_VERSION}"
+    if params.get("llm"):
+        return f"llm:{nlp_tasks.llm_version()}"
+    return f"local:{LOCAL_VERSION}"
+
+def action_key(action: str, text: str, **params: Any) -> str:
+    return make_key("result", action, text_hash(text), params, backend_version(action, params))
+
+class ResultCache:
+    def __init__(self, memory_items: int = RESULT_MEMORY_ITEMS, disk: Optional[DiskCache] = None):
+        self.memory_items = memory_items
+        self._mem: "OrderedDict[str, Any]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._disk = disk
+        self._flight = SingleFlight()
+        self._stats: Dict[str, Dict[str, int]] = defaultdict(lambda: {"memory_hits": 0, "disk_hits": 0, "misses": 0})
+
+    @property
+    def disk(self) -> DiskCache:
+        if self._disk is None:
+            with self._lock:
+                if self._disk is None:
+                    self._disk = DiskCache("results", max_entries=None, max_bytes=int(RESULT_DISK_MB * 1024 * 1024),
+                                           ttl_s=RESULT_TTL_S)
+        return self._disk
+
+    def _remember(self, key: str, value: Any) -> None:
+        with self._lock:
+            self._mem[key] = value
+            self._mem.move_to_end(key)
+            while len(self._mem) > self.memory_items:
+                self._mem.popitem(last=False)
+
+    def lookup(self, action: str, key: str) -> Any:
+        """Cached value or None (and counts the hit / miss)."""
+        with self._lock:
+            if key in self._mem:
+                self._mem.move_to_end(key)
+                self._stats[action]["memory_hits"] += 1
+                metrics.inc("studymate_cache_total", cache="result", action=action, outcome="memory_hit")
+                # callers (and other sessions) get their own copy: pages annotate results in place
+                return copy.deepcopy(self._mem[key])
+        value = self.disk.get(key)
+        with self._lock:
+            self._stats[action]["disk_hits" if value is not None else "misses"] += 1
+        metrics.inc("studymate_cache_total", cache="result", action=action,
+                    outcome="disk_hit" if value is not None else "miss")
+        if value is not None:
+            self._remember(key, copy.deepcopy(value))
+        return value
+
+    def peek(self, key: str) -> bool:
+        """True if key is cached (no stats, no LRU update of the disk tier)."""
+        with self._lock:
+            if key in self._mem:
+                return True
+        return key in self.disk
+
+    def store(self, key: str, value: Any) -> None:
+        if value is None:
+            return
+        self._remember(key, value)
+        self.disk.set(key, value)
+
+    def get_or_compute(self, action: str, text: str, params: Dict[str, Any], compute: Callable[[], Any],
+                       cacheable: Optional[Callable[[Any], bool]] = None) -> Any:
+        """
+        compute() on a miss; its result is stored when `cacheable(result)` allows
+        (e.g. not for an LLM call that fell back to the extractive summary).
+        """
+        if not RESULT_CACHE_ENABLED:
+            return compute()
+        key = action_key(action, text, **params)
+        hit = self.lookup(action, key)
+        if hit is not None:
+            return hit
+
+        def _run():
+            value = compute()
+            if value is not None and (cacheable is None or cacheable(value)):
+                self.store(key, copy.deepcopy(value))
+            return value
+        return copy.deepcopy(self._flight.do(key, _run))
+
+    def clear(self) -> None:
+        with self._lock:
+            self._mem.clear()
+        self.disk.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            per_action = {a: dict(s) for a, s in self._stats.items()}
+            mem = len(self._mem)
+        for s in per_action.values():
+            total = s["memory_hits"] + s["disk_hits"] + s["misses"]
+            s["hit_rate"] = round((s["memory_hits"] + s["disk_hits"]) / total, 3) if total else None
+        return {"actions": per_action, "memory_items": mem, "disk": self.disk.stats()}
+
+RESULTS = ResultCache()
+
+# =========================
+# Page actions
+# =========================
+# Shared by the app pages and background precompute, so both produce identical keys.
+def _summary_params(mode: str, target_words: int, max_chars_input: int) -> Dict[str, Any]:
+    params: Dict[str, Any] = {"mode": mode, "target_words": int(target_words)}
+    if mode != "llm":
+        params["max_chars_input"] = int(max_chars_input)    # the LLM path reads the whole text
+    return params
+
+def summary_key(text: str, mode: str, target_words: int, max_chars_input: int) -> str:
+    return action_key("summarize", text, **_summary_params(mode, target_words, max_chars_input))
+
+def cached_summary(text: str, mode: str, target_words: int, max_chars_input: int, timeout_s: float,
+                   progress=None) -> Dict[str, Any]:
+    from nlp_tasks import summarize
+    params = _summary_params(mode, target_words, max_chars_input)
+    return RESULTS.get_or_compute(
+        "summarize", text, params,
+        lambda: summarize(text=text, mode=mode, target_words=target_words,
+                          max_chars_input=max_chars_input, timeout_s=timeout_s, progress=progress),
+        cacheable=lambda out: not str(out.get("backend", "")).startswith("fallback"))
+
+def mcq_key(text: str, num_questions: int, seed: int, llm: bool) -> str:
+    return action_key("mcq", text, num_questions=int(num_questions), seed=int(seed), llm=bool(llm))
+
+def flashcards_key(text: str, num_cards: int, llm: bool) -> str:
+    return action_key("flashcards", text, num_cards=int(num_cards), llm=bool(llm))
+
+def cached_mcq(text: str, num_questions: int, seed: int, llm: bool = False):
+    from nlp_tasks import make_mcq, make_mcq_llm
+    fn = make_mcq_llm if llm else make_mcq
+    params = {"num_questions": int(num_questions), "seed": int(seed), "llm": bool(llm)}
+    return RESULTS.get_or_compute("mcq", text, params, lambda: fn(text, num_questions=int(num_questions), seed=int(seed)))
+
+def cached_flashcards(text: str, num_cards: int, llm: bool = False):
+    from nlp_tasks import make_flashcards, make_flashcards_llm
+    fn = make_flashcards_llm if llm else make_flashcards
+    return RESULTS.get_or_compute("flashcards", text, {"num_cards": int(num_cards), "llm": bool(llm)},
+                                  lambda: fn(text, num_cards=int(num_cards)))
+
+def cached_deadlines(text: str, llm: bool = False):
+    from nlp_tasks import extract_deadlines, extract_deadlines_llm
+    fn = extract_deadlines_llm if llm else extract_deadlines
+    params: Dict[str, Any] = {"llm": bool(llm)}
+    if not llm:
+        # relative dates ("Friday at 5pm") resolve against today: yesterday's result is stale
+        from datetime import date
+        params["base_day"] = date.today().isoformat()
+    return RESULTS.get_or_compute(
+        "deadlines", text, params, lambda: fn(text),
+        cacheable=lambda dl: not any(isinstance(d, dict) and d.get("context") == "INSTALL_DATEPARSER" for d in dl))
@@ -0,0 +1,212 @@
+# studypack.py — pre-generate study packs for a whole course (non-interactive)
+# ----------------------------------------------------------
+# Usage:
+#   python studypack.py --input data/uploads --out data/studypacks [--workers 8] [--llm]
+#
+#  inputs   *.pdf, *.txt / *.md, and *.urls (one URL per line, "#" comments) anywhere under --input
+#  output   <out>/studypack.jsonl — one line per source: summary, MCQs, flashcards, deadlines
+#           <out>/studypack.parquet — same rows (nested fields as JSON text), when pyarrow is installed
+#
+#  - every source is ingested and processed in its own worker process (all cores by default);
+#    at most workers*2 sources are in flight, rows are appended as they finish
+#  - resumable: the JSONL is the checkpoint — rerunning skips sources whose row is already "ok"
+#    for the same file (size/mtime) and settings; failed sources are retried
+#  - results go through the shared result cache, so the app serves them instantly afterwards
+
+import os, re, sys, json, time, argparse
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+from typing import Any, Callable, Dict, Iterator, List, Optional, Set
+
+from cache_store import make_key
+from utils import ensure_dirs
+
+TEXT_EXTS = (".txt", ".md")
+URL_LIST_EXTS = (".urls",)
+JSONL_NAME = "studypack.jsonl"
+PARQUET_NAME = "studypack.parquet"
+
+# =========================
+# Sources
+# =========================
+def _file_source(path: str) -> Dict[str, Any]:
+    st = os.stat(path)
+    return {"source": os.path.abspath(path), "kind": "pdf" if path.lower().endswith(".pdf") else "text",
+            "version": f"{st.st_size}:{int(st.st_mtime)}"}
+
+def iter_sources(root: str) -> Iterator[Dict[str, Any]]:
+    """Files under root (sorted, so runs are reproducible) and the URLs listed in *.urls files."""
+    for dirpath, dirnames, filenames in os.walk(root):
+        dirnames.sort()
+        for fn in sorted(filenames):
+            path = os.path.join(dirpath, fn)
+            low = fn.lower()
+            if low.endswith(".pdf") or low.endswith(TEXT_EXTS):
+                yield _file_source(path)
+            elif low.endswith(URL_LIST_EXTS):
+                with open(path, "r", encoding="utf-8") as f:
+                    for line in f:
+                        url = line.split("#", 1)[0].strip()
+                        if url:
+                            yield {"source": url, "kind": "url", "version": ""}
+
+def _ingest(src: Dict[str, Any]):
+    from ingest import from_pdf, from_text_string, from_url
+    if src["kind"] == "pdf":
+        return from_pdf(src["source"])
+    if src["kind"] == "url":
+        return from_url(src["source"])
+    with open(src["source"], "r", encoding="utf-8", errors="replace") as f:
+        return from_text_string(os.path.basename(src["source"]), f.read())
+
+# =========================
+# Worker
+# =========================
+def _settings_key(settings: Dict[str, Any]) -> str:
+    return make_key("studypack", settings)[:16]
+
+def _checkpoint_id(src: Dict[str, Any], settings_key: str) -> str:
+    return make_key(src["source"], src["version"], settings_key)[:24]
+
+def build_pack(src: Dict[str, Any], settings: Dict[str, Any]) -> Dict[str, Any]:
+    """Runs in a worker process: ingest one source and generate its study pack row."""
+    from result_cache import cached_summary, cached_mcq, cached_flashcards, cached_deadlines
+    t0 = time.perf_counter()
+    row: Dict[str, Any] = {"id": _checkpoint_id(src, _settings_key(settings)), "source": src["source"],
+                           "kind": src["kind"], "status": "ok"}
+    try:
+        name, text = _ingest(src)
+        row.update(name=name, chars=len(text))
+        if not text.strip():
+            raise ValueError("no text extracted")
+        llm = settings["llm"]
+        flat = re.sub(r"\s+", " ", text).strip()          # same normalization as the pages
+        row["summary"] = cached_summary(flat, mode="llm" if llm else settings["summary_mode"],
+                                        target_words=settings["target_words"], max_chars_input=12000,
+                                        timeout_s=25.0)
+        row["questions"] = cached_mcq(flat, settings["num_questions"], 42, llm=llm)
+        row["flashcards"] = cached_flashcards(text, settings["num_cards"], llm=llm)
+        row["deadlines"] = cached_deadlines(text, llm=llm)
+    except Exception as e:
+        row.update(status="error", error=f"{type(e).__name__}: {e}")
+    row["elapsed_s"] = round(time.perf_counter() - t0, 2)
+    return row
+
+# =========================
+# Checkpoint / output
+# =========================
+def load_done(jsonl_path: str) -> Set[str]:
+    """Ids of rows already written with status ok (a torn last line from a crash is ignored)."""
+    done: Set[str] = set()
+    if not os.path.exists(jsonl_path):
+        return done
+    with open(jsonl_path, "r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                row = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            if row.get("status") == "ok":
+                done.add(row.get("id"))
+    return done
+
+def write_parquet(jsonl_path: str, parquet_path: str) -> Optional[str]:
+    """Latest row per source as Parquet; None when pyarrow isn't installed."""
+    try:
+        import pyarrow  # noqa: F401
+    except ImportError:
+        return None
+    import pandas as pd
+    rows = {}
+    with open(jsonl_path, "r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                row = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            rows[row["source"]] = row
+    df = pd.DataFrame(list(rows.values()))
+    for col in ("summary", "questions", "flashcards", "deadlines"):
+        if col in df:
+            df[col] = df[col].map(lambda v: None if v is None or v != v else json.dumps(v, ensure_ascii=False))
+    df.to_parquet(parquet_path, index=False)
+    return parquet_path
+
+# =========================
+# Driver
+# =========================
+def generate_studypacks(
+    input_dir: str,
+    out_dir: str,
+    settings: Dict[str, Any],
+    workers: Optional[int] = None,
+    progress: Optional[Callable[[int, int, Dict[str, Any]], None]] = None,
+) -> Dict[str, Any]:
+    os.makedirs(out_dir, exist_ok=True)
+    jsonl_path = os.path.join(out_dir, JSONL_NAME)
+    skey = _settings_key(settings)
+    done_ids = load_done(jsonl_path)
+    sources = list(iter_sources(input_dir))
+    todo = [s for s in sources if _checkpoint_id(s, skey) not in done_ids]
+
+    workers = workers or os.cpu_count() or 1
+    max_in_flight = workers * 2
+    ok = failed = n = 0
+
+    with open(jsonl_path, "a", encoding="utf-8") as out, ProcessPoolExecutor(max_workers=workers) as ex:
+        def _collect(finished):
+            nonlocal ok, failed, n
+            for f in finished:
+                row = f.result()
+                out.write(json.dumps(row, ensure_ascii=False) + "\n")
+                out.flush()                            # each finished source is checkpointed
+                n += 1
+                if row["status"] == "ok":
+                    ok += 1
+                else:
+                    failed += 1
+                if progress:
+                    progress(n, len(todo), row)
+
+        pending = set()
+        for src in todo:
+            if len(pending) >= max_in_flight:
+                finished, pending = wait(pending, return_when=FIRST_COMPLETED)
+                _collect(finished)
+            pending.add(ex.submit(build_pack, src, settings))
+        _collect(wait(pending).done)
+
+    parquet = write_parquet(jsonl_path, os.path.join(out_dir, PARQUET_NAME)) if sources else None
+    return {"sources": len(sources), "skipped": len(sources) - len(todo), "ok": ok, "failed": failed,
+            "jsonl": jsonl_path, "parquet": parquet}
+
+def main(argv: Optional[List[str]] = None) -> int:
+    ap = argparse.ArgumentParser(description="Pre-generate study packs (summary, MCQs, flashcards, deadlines).")
+    ap.add_argument("--input", default=os.path.join("data", "uploads"),
+                    help="directory of PDFs, .txt/.md files and .urls lists")
+    ap.add_argument("--out", default=os.path.join("data", "studypacks"), help="output directory")
+    ap.add_argument("--workers", type=int, default=None, help="processes (default: all cores)")
+    ap.add_argument("--llm", action="store_true", help="use the LLM for every task")
+    ap.add_argument("--summary-mode", default="extractive", choices=["extractive", "neural"],
+                    help="local summarizer when --llm is not set")
+    ap.add_argument("--target-words", type=int, default=150)
+    ap.add_argument("--questions", type=int, default=6)
+    ap.add_argument("--cards", type=int, default=6)
+    args = ap.parse_args(argv)
+
+    ensure_dirs()
+    settings = {"llm": args.llm, "summary_mode": args.summary_mode, "target_words": args.target_words,
+                "num_questions": args.questions, "num_cards": args.cards}
+
+    def _progress(i: int, total: int, row: Dict[str, Any]):
+        mark = "ok " if row["status"] == "ok" else "ERR"
+        sys.stderr.write(f"[{i}/{total}] {mark} {row['elapsed_s']:>6.1f}s  {os.path.basename(row['source'])[:60]}\n")
+        if row["status"] != "ok":
+            sys.stderr.write(f"        {row['error']}\n")
+
+    res = generate_studypacks(args.input, args.out, settings, workers=args.workers, progress=_progress)
+    print(f"{res['sources']} sources • {res['skipped']} already done • {res['ok']} ok • {res['failed']} failed"
+          f" • {res['jsonl']}" + (f" • {res['parquet']}" if res["parquet"] else ""))
+    return 0 if res["failed"] == 0 else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,148 @@
+# token_budget.py — token counting + prompt budgeting for LLM call sites
+# ----------------------------------------------------------
+#  - count_tokens(): tiktoken when installed, ~4 chars/token otherwise
+#  - truncate_to_tokens(): cut text to a token budget (sentence-aligned when possible)
+#  - output_tokens(): max_output_tokens from the requested length (words / items)
+#  - allocate(): split an input budget across sources by relevance (water-filling)
+#  - record(): log planned budget vs actual usage per call site
+
+import re, logging, threading
+from collections import defaultdict, deque
+from functools import lru_cache
+from typing import Any, Dict, List, Optional
+
+log = logging.getLogger("studymate.budget")
+
+TOKENS_PER_WORD = 1.35   # English prose, cl100k/o200k-ish
+
+# per-item output cost (tokens) for JSON generators, incl. keys/quotes
+_ITEM_TOKENS = {"mcq": 90, "flashcards": 55, "deadlines": 60, "topics": 12}
+_OUTPUT_SLACK = 60
+
+@lru_cache(maxsize=8)
+def _encoder(model: Optional[str]):
+    try:
+        import tiktoken
+    except Exception:
+        return None
+    try:
+        return tiktoken.encoding_for_model(model) if model else tiktoken.get_encoding("o200k_base")
+    except Exception:
+        try:
+            return tiktoken.get_encoding("o200k_base")
+        except Exception:
+            return None
+
+def count_tokens(text: str, model: Optional[str] = None) -> int:
+    if not text:
+        return 0
+    enc = _encoder(model)
+    if enc is None:
+        return max(1, len(text) // 4)
+    return len(enc.encode(text, disallowed_special=()))
+
+def truncate_to_tokens(text: str, max_tokens: int, model: Optional[str] = None) -> str:
+    if max_tokens <= 0 or not text:
+        return ""
+    if count_tokens(text, model) <= max_tokens:
+        return text
+    enc = _encoder(model)
+    if enc is None:
+        cut = text[:max_tokens * 4]
+    else:
+        cut = enc.decode(enc.encode(text, disallowed_special=())[:max_tokens])
+    # prefer ending on a sentence boundary if one is reasonably close
+    m = re.search(r"^(.*[.!?])\s", cut, flags=re.S)
+    if m and len(m.group(1)) > len(cut) * 0.7:
+        return m.group(1)
+    return cut
+
+def output_tokens(kind: str = "text", target_words: Optional[int] = None, num_items: Optional[int] = None,
+                  floor: int = 64, cap: int = 4000) -> int:
+    """max_output_tokens sized to what was asked for, not a fixed ceiling."""
+    if target_words:
+        est = int(target_words * TOKENS_PER_WORD * 1.25) + _OUTPUT_SLACK   # ±20% length tolerance
+    elif num_items:
+        est = int(num_items * _ITEM_TOKENS.get(kind, 60) * 1.2) + _OUTPUT_SLACK
+    else:
+        est = floor
+    return max(floor, min(cap, est))
+
+# =========================
+# Relevance-weighted allocation
+# =========================
+_WORD = re.compile(r"[a-z0-9']{3,}")
+
+def relevance(query: str, text: str) -> float:
+    """Cheap lexical overlap (share of distinct query terms that occur in text)."""
+    q = set(_WORD.findall((query or "").lower()))
+    if not q:
+        return 1.0
+    t = set(_WORD.findall((text or "").lower()))
+    return len(q & t) / len(q)
+
+def allocate(budget: int, texts: List[str], weights: Optional[List[float]] = None,
+             floor: int = 0, model: Optional[str] = None) -> List[int]:
+    """
+    Split `budget` tokens across texts proportionally to weights, never giving a text more
+    than it needs; leftover from short texts is redistributed to the others.
+    """
+    n = len(texts)
+    if n == 0 or budget <= 0:
+        return [0] * n
+    need = [count_tokens(t, model) for t in texts]
+    w = [max(1e-6, x) for x in (weights or [1.0] * n)]
+    alloc = [0] * n
+    open_ = [i for i in range(n) if need[i] > 0]
+    left = budget
+    while open_ and left > 0:
+        total_w = sum(w[i] for i in open_)
+        share = {i: max(floor, int(left * w[i] / total_w)) for i in open_}
+        done = [i for i in open_ if need[i] - alloc[i] <= share[i]]
+        if not done:
+            for i in open_:
+                give = min(share[i], left)
+                alloc[i] += give; left -= give
+            break
+        for i in done:
+            give = min(need[i] - alloc[i], left)
+            alloc[i] += give; left -= give
+        open_ = [i for i in open_ if i not in done]
+    return alloc
+
+def fit_sources(budget: int, query: str, texts: List[str], floor: int = 80,
+                model: Optional[str] = None) -> List[str]:
+    """Trim each source to its relevance-weighted share of the budget."""
+    weights = [0.25 + relevance(query, t) for t in texts]
+    shares = allocate(budget, texts, weights, floor=floor, model=model)
+    return [truncate_to_tokens(t, k, model) for t, k in zip(texts, shares)]
+
+# =========================
+# Planned vs actual
+# =========================
+_LOCK = threading.Lock()
+_HISTORY: Dict[str, deque] = defaultdict(lambda: deque(maxlen=200))
+
+def record(site: str, planned_in: int, planned_out: int, usage: Any = None) -> None:
+    actual_in = int(getattr(usage, "input_tokens", 0) or 0) if usage is not None else None
+    actual_out = int(getattr(usage, "output_tokens", 0) or 0) if usage is not None else None
+    with _LOCK:
+        _HISTORY[site].append((planned_in, planned_out, actual_in, actual_out))
+    log.debug("[%s] tokens in %s (planned %s) out %s (budget %s)", site, actual_in, planned_in, actual_out, planned_out)
+
+def report() -> Dict[str, Dict[str, Any]]:
+    """Per site: mean planned/actual tokens and how much of the output budget was used."""
+    out = {}
+    with _LOCK:
+        for site, rows in _HISTORY.items():
+            rows = list(rows)
+            seen = [r for r in rows if r[2] is not None]
+            out[site] = {
+                "calls": len(rows),
+                "planned_in": round(sum(r[0] for r in rows) / len(rows), 1),
+                "planned_out": round(sum(r[1] for r in rows) / len(rows), 1),
+                "actual_in": round(sum(r[2] for r in seen) / len(seen), 1) if seen else None,
+                "actual_out": round(sum(r[3] for r in seen) / len(seen), 1) if seen else None,
+                "out_budget_used": round(sum(r[3] / max(1, r[1]) for r in seen) / len(seen), 3) if seen else None,
+            }
+    return out
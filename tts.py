@@ -0,0 +1,306 @@
+# tts.py — text-to-speech with a content-addressed audio cache
+# ----------------------------------------------------------
+#  - synthesize(): audio bytes for (engine, voice, rate, text), served from disk when seen before
+#  - one long-lived pyttsx3 engine owned by a single worker thread (pyttsx3 is not thread-safe
+#    and init() costs hundreds of ms), gTTS rendered straight into memory
+#  - prefetch(): fill the cache in the background (e.g. the next flashcard) so "Speak" is instant
+#  - no temp files are left behind: the cache is bounded by bytes, least-recently-played evicted
+#  - synthesize_progressive(): long text in sentence chunks rendered by a worker pool; the first
+#    chunk is handed back as soon as it exists, the rest are concatenated into one file
+
+import io, os, queue, wave, tempfile, threading
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Callable, Iterator, List, Optional
+
+from cache_store import DiskCache, SingleFlight, make_key, text_hash
+
+TTS_ENGINE = os.getenv("STUDYMATE_TTS_ENGINE", "pyttsx3")        # "pyttsx3" (offline WAV) | "gtts" (MP3)
+TTS_RATE = int(os.getenv("STUDYMATE_TTS_RATE", "180"))
+TTS_VOICE = os.getenv("STUDYMATE_TTS_VOICE") or None             # pyttsx3 voice id / gTTS language
+TTS_CACHE_MB = float(os.getenv("STUDYMATE_TTS_CACHE_MB", "200"))
+TTS_CHUNK_CHARS = int(os.getenv("STUDYMATE_TTS_CHUNK_CHARS", "300"))
+TTS_WORKERS = int(os.getenv("STUDYMATE_TTS_WORKERS", "3"))
+
+_FORMATS = {"pyttsx3": "audio/wav", "gtts": "audio/mp3"}
+
+def audio_format(engine: Optional[str] = None) -> str:
+    return _FORMATS.get(engine or TTS_ENGINE, "audio/wav")
+
+# =========================
+# Cache
+# =========================
+_CACHE: Optional[DiskCache] = None
+_CACHE_LOCK = threading.Lock()
+_FLIGHT = SingleFlight()
+
+def _get_cache() -> DiskCache:
+    global _CACHE
+    if _CACHE is None:
+        with _CACHE_LOCK:
+            if _CACHE is None:
+                _CACHE = DiskCache("tts_audio", max_entries=None, max_bytes=int(TTS_CACHE_MB * 1024 * 1024))
+    return _CACHE
+
+def audio_key(text: str, engine: str, voice: Optional[str], rate: int) -> str:
+    return make_key("tts", engine, voice or "", rate, text_hash(text))
+
+def cache_stats() -> dict:
+    return _get_cache().stats()
+
+# =========================
+# pyttsx3 worker (one engine per process)
+# =========================
+class _Pyttsx3Worker:
+    def __init__(self):
+        self._q: "queue.Queue" = queue.Queue()
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+
+    def submit(self, text: str, voice: Optional[str], rate: int) -> Future:
+        fut: Future = Future()
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="tts-pyttsx3", daemon=True)
+                self._thread.start()
+        self._q.put((text, voice, rate, fut))
+        return fut
+
+    def _run(self):
+        engine = None
+        while True:
+            text, voice, rate, fut = self._q.get()
+            if not fut.set_running_or_notify_cancel():
+                continue
+            fd, path = tempfile.mkstemp(prefix="studymate_tts_", suffix=".wav")
+            os.close(fd)
+            try:
+                if engine is None:
+                    import pyttsx3
+                    engine = pyttsx3.init()
+                    engine.setProperty("volume", 1.0)
+                engine.setProperty("rate", rate)
+                if voice:
+                    engine.setProperty("voice", voice)
+                engine.save_to_file(text, path)
+                engine.runAndWait()
+                with open(path, "rb") as f:
+                    data = f.read()
+                if not data:
+                    raise RuntimeError("pyttsx3 produced no audio")
+                fut.set_result(data)
+            except Exception as e:
+                engine = None   # re-init on the next request
+                fut.set_exception(e)
+            finally:
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+
+_WORKER = _Pyttsx3Worker()
+
+def _render(text: str, engine: str, voice: Optional[str], rate: int) -> bytes:
+    if engine == "gtts":
+        from gtts import gTTS
+        buf = io.BytesIO()
+        gTTS(text, lang=voice or "en").write_to_fp(buf)
+        return buf.getvalue()
+    if engine == "pyttsx3":
+        return _WORKER.submit(text, voice, rate).result()
+    raise ValueError(f"unknown TTS engine: {engine}")
+
+# =========================
+# Public API
+# =========================
+def synthesize(text: str, engine: Optional[str] = None, voice: Optional[str] = None,
+               rate: Optional[int] = None) -> Optional[bytes]:
+    """Audio bytes for text (WAV for pyttsx3, MP3 for gTTS); None for empty text. Raises on engine errors."""
+    text = (text or "").strip()
+    if not text:
+        return None
+    engine = engine or TTS_ENGINE
+    voice = voice or TTS_VOICE
+    rate = rate or TTS_RATE
+    key = audio_key(text, engine, voice, rate)
+    cache = _get_cache()
+    hit = cache.get(key)
+    if hit is not None:
+        return hit
+
+    def _compute() -> bytes:
+        again = cache.get(key)
+        if again is not None:
+            return again
+        data = _render(text, engine, voice, rate)
+        cache.set(key, data)
+        return data
+
+    # a click that lands while the prefetch is still rendering waits for it instead of rendering twice
+    return _FLIGHT.do(key, _compute)
+
+_PREFETCH = ThreadPoolExecutor(max_workers=2, thread_name_prefix="tts-prefetch")
+
+def prefetch(text: str, engine: Optional[str] = None, voice: Optional[str] = None,
+             rate: Optional[int] = None) -> None:
+    """Render in the background so a later synthesize() is a cache hit. Errors are ignored."""
+    if not (text or "").strip():
+        return
+    def _job():
+        try:
+            synthesize(text, engine, voice, rate)
+        except Exception:
+            pass
+    _PREFETCH.submit(_job)
+
+# =========================
+# Chunked / progressive synthesis
+# =========================
+def split_for_speech(text: str, max_chars: Optional[int] = None) -> List[str]:
+    """
+    Sentence-aligned chunks. The first chunk is a single sentence so it renders fast
+    (time-to-first-audio does not depend on text length); later ones pack up to max_chars.
+    """
+    from preprocess import split_sentences
+    max_chars = max_chars or TTS_CHUNK_CHARS
+    sents = []
+    for s in split_sentences(text or ""):
+        while len(s) > max_chars:              # run-on sentence: cut at the last space/comma
+            cut = max(s.rfind(",", 0, max_chars), s.rfind(" ", 0, max_chars))
+            cut = cut if cut > max_chars // 3 else max_chars
+            sents.append(s[:cut + 1].strip()); s = s[cut + 1:].strip()
+        if s:
+            sents.append(s)
+    if not sents:
+        return []
+    chunks, cur = [sents[0]], ""
+    for s in sents[1:]:
+        if cur and len(cur) + len(s) + 1 > max_chars:
+            chunks.append(cur); cur = s
+        else:
+            cur = (cur + " " + s).strip()
+    if cur:
+        chunks.append(cur)
+    return chunks
+
+# pyttsx3 keeps one engine per driver per process, so parallel rendering needs processes;
+# each pool process lazily creates and keeps its own engine.
+_PROC_ENGINE = None
+
+def _pyttsx3_render_in_process(text: str, voice: Optional[str], rate: int) -> bytes:
+    global _PROC_ENGINE
+    fd, path = tempfile.mkstemp(prefix="studymate_tts_", suffix=".wav")
+    os.close(fd)
+    try:
+        if _PROC_ENGINE is None:
+            import pyttsx3
+            _PROC_ENGINE = pyttsx3.init()
+            _PROC_ENGINE.setProperty("volume", 1.0)
+        _PROC_ENGINE.setProperty("rate", rate)
+        if voice:
+            _PROC_ENGINE.setProperty("voice", voice)
+        _PROC_ENGINE.save_to_file(text, path)
+        _PROC_ENGINE.runAndWait()
+        with open(path, "rb") as f:
+            return f.read()
+    except Exception:
+        _PROC_ENGINE = None
+        raise
+    finally:
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+_POOLS = {}
+_POOLS_LOCK = threading.Lock()
+
+def _chunk_pool(engine: str):
+    with _POOLS_LOCK:
+        pool = _POOLS.get(engine)
+        if pool is None:
+            if engine == "pyttsx3":
+                import multiprocessing as mp
+                # spawn: the parent is a threaded Streamlit server, forking it is not safe
+                pool = ProcessPoolExecutor(max_workers=TTS_WORKERS, mp_context=mp.get_context("spawn"))
+            else:
+                pool = ThreadPoolExecutor(max_workers=TTS_WORKERS, thread_name_prefix=f"tts-{engine}")
+            _POOLS[engine] = pool
+    return pool
+
+def _submit_chunk(chunk: str, engine: str, voice: Optional[str], rate: int, first: bool) -> Future:
+    cache = _get_cache()
+    key = audio_key(chunk, engine, voice, rate)
+    hit = cache.get(key)
+    if hit is not None:
+        fut: Future = Future(); fut.set_result(hit)
+        return fut
+    if engine == "pyttsx3" and first:
+        fut = _WORKER.submit(chunk, voice, rate)            # warm engine, no process start-up on the critical path
+    elif engine == "pyttsx3":
+        fut = _chunk_pool(engine).submit(_pyttsx3_render_in_process, chunk, voice, rate)
+    else:
+        fut = _chunk_pool(engine).submit(_render, chunk, engine, voice, rate)
+    def _store(f: Future):
+        if not f.cancelled() and f.exception() is None and f.result():
+            cache.set(key, f.result())
+    fut.add_done_callback(_store)
+    return fut
+
+def synthesize_chunks(text: str, engine: Optional[str] = None, voice: Optional[str] = None,
+                      rate: Optional[int] = None) -> Iterator[bytes]:
+    """Yields audio for each speech chunk in order; all chunks render concurrently."""
+    engine = engine or TTS_ENGINE
+    voice = voice or TTS_VOICE
+    rate = rate or TTS_RATE
+    futs = [_submit_chunk(c, engine, voice, rate, i == 0) for i, c in enumerate(split_for_speech(text))]
+    try:
+        for f in futs:
+            yield f.result()
+    finally:
+        for f in futs:
+            f.cancel()
+
+def concat_audio(parts: List[bytes], engine: Optional[str] = None) -> bytes:
+    """Join chunk audio into one file: WAV frames re-wrapped under one header, MP3 frames appended."""
+    parts = [p for p in parts if p]
+    if len(parts) <= 1:
+        return parts[0] if parts else b""
+    if audio_format(engine) != "audio/wav":
+        return b"".join(parts)
+    out = io.BytesIO()
+    with wave.open(io.BytesIO(parts[0]), "rb") as w0:
+        params = w0.getparams()
+    with wave.open(out, "wb") as w:
+        w.setparams(params)
+        for p in parts:
+            with wave.open(io.BytesIO(p), "rb") as r:
+                w.writeframes(r.readframes(r.getnframes()))
+    return out.getvalue()
+
+def synthesize_progressive(text: str, on_first: Optional[Callable[[bytes], None]] = None,
+                           engine: Optional[str] = None, voice: Optional[str] = None,
+                           rate: Optional[int] = None) -> Optional[bytes]:
+    """
+    Full audio for text, built from sentence chunks. `on_first(audio)` is called with the
+    first chunk as soon as it is ready so playback can start while the rest renders.
+    A text heard before is returned whole from the cache.
+    """
+    text = (text or "").strip()
+    if not text:
+        return None
+    engine = engine or TTS_ENGINE
+    voice = voice or TTS_VOICE
+    rate = rate or TTS_RATE
+    cache = _get_cache()
+    key = audio_key(text, engine, voice, rate)
+    hit = cache.get(key)
+    if hit is not None:
+        return hit
+    parts = []
+    for i, part in enumerate(synthesize_chunks(text, engine, voice, rate)):
+        parts.append(part)
+        if i == 0 and on_first is not None:
+            on_first(part)
+    full = concat_audio(parts, engine)
+    cache.set(key, full)
+    return full
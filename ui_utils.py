@@ -2,7 +2,7 @@
 import streamlit as st
 import tempfile, re
 from typing import Tuple, Optional
-from nlp_tasks import extract_text_from_pdf  # your existing function
+from metrics import span
 
 CSS = """
 <style>
@@ -77,14 +77,18 @@ def uploader_block(label: str="📂 Upload a PDF or paste text") -> Tuple[str, O
     with col1:
         uploaded = st.file_uploader("Upload PDF", type=["pdf"], label_visibility="collapsed")
         if uploaded is not None:
-            with st.spinner("Reading PDF…"):
-                with tempfile.NamedTemporaryFile(delete=False, suffix=".pdf") as tmp:
+            with st.spinner("Reading PDF…"), span("upload", size=getattr(uploaded, "size", None)):
+                with span("upload_read"), tempfile.NamedTemporaryFile(delete=False, suffix=".pdf") as tmp:
                     tmp.write(uploaded.read())
                     path = tmp.name
-                pdf_text = extract_text_from_pdf(path)
-                pdf_text = re.sub(r"\s+", " ", (pdf_text or "")).strip()
+                with span("pdf_extract"):
+                    from nlp_tasks import extract_text_from_pdf
+                    pdf_text = extract_text_from_pdf(path)
+                with span("normalize"):
+                    pdf_text = re.sub(r"\s+", " ", (pdf_text or "")).strip()
                 if pdf_text:
                     text, source = pdf_text, "pdf"
+                    st.session_state["upload_name"] = uploaded.name
                     st.success(f"Extracted {len(pdf_text)} characters from PDF.")
                 else:
                     st.warning("PDF seems to contain little/no extractable text (maybe scanned images).")
@@ -93,5 +97,36 @@ def uploader_block(label: str="📂 Upload a PDF or paste text") -> Tuple[str, O
         manual = st.text_area("Or paste text here", height=200, placeholder="Paste notes / transcript / paper text...")
         if manual and manual.strip():
             text, source = manual.strip(), "manual"
+    if source != "pdf":
+        st.session_state.pop("upload_name", None)
 
+    _speculative_block(text)
+    import lazy_imports
+    lazy_imports.start_preload()        # the uploader is drawn: warm the libraries the first click needs
     return text, source
+
+def _speculative_block(text: str):
+    """Opt-in: precompute cheap results for this text in the background; a new text cancels the old run."""
+    from precompute import SPECULATIVE, SPECULATIVE_DEFAULT, speculate
+    from cache_store import text_hash
+    ss = st.session_state
+    on = st.toggle("⚡ Precompute after upload", value=ss.get("speculative_on", SPECULATIVE_DEFAULT),
+                   key="speculative_on", help="Extractive summary, deadlines, baseline quiz/flashcards and "
+                                              "chunking start in the background so the first click is instant.")
+    job_id = ss.get("speculative_job")
+    if not on or not (text or "").strip():
+        if job_id:
+            SPECULATIVE.cancel(job_id)
+            ss.speculative_job = ss.speculative_hash = None
+        return
+    h = text_hash(text)
+    if ss.get("speculative_hash") != h:
+        ss.speculative_job = speculate(text, previous_job=job_id)
+        ss.speculative_hash = h
+    job = SPECULATIVE.get(ss.get("speculative_job"))
+    if job is not None:
+        snap = job.snapshot()
+        if snap["status"] in ("queued", "running"):
+            st.caption(f"⚡ Precomputing… ({snap['stage']})")
+        elif snap["status"] == "done":
+            st.caption("⚡ Precomputed: first clicks will be instant.")
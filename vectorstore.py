@@ -1,26 +1,35 @@
 import os
-import faiss
-import numpy as np
 import pickle
 from typing import List, Dict, Tuple
-from sentence_transformers import SentenceTransformer
+from lazy_imports import lazy
+from model_registry import get_service
+
+faiss = lazy("faiss")   # imported on first build/load, not when the page imports this module
 
 class VectorStore:
     def __init__(self, model_name: str, index_dir: str = "data/index"):
         self.model_name = model_name
         self.index_dir = index_dir
         os.makedirs(index_dir, exist_ok=True)
-        self.model = SentenceTransformer(model_name)
-        self.dim = self.model.get_sentence_embedding_dimension()
+        # encoder is shared process-wide (or served by the model server), not loaded per store
+        self.models = get_service()
+        self.dim = self.models.embedding_dim(model_name)
         self.index = None
         self.meta: List[Dict] = []
+        self.ids: List[int] = []   # index row -> position in the docs / metadatas given to build()
 
     def _paths(self):
         return (os.path.join(self.index_dir, "faiss.index"),
                 os.path.join(self.index_dir, "meta.pkl"))
 
-    def build(self, docs: List[str], metadatas: List[Dict]):
-        embs = self.model.encode(docs, show_progress_bar=True, convert_to_numpy=True, normalize_embeddings=True)
+    def build(self, docs: List[str], metadatas: List[Dict], dedup: bool = True):
+        # near-duplicate chunks (overlapping decks / notes) are embedded and indexed once
+        if dedup:
+            from dedup import dedup_chunks
+            kept, self.ids = dedup_chunks(docs, site="vectorstore")
+        else:
+            kept, self.ids = docs, list(range(len(docs)))
+        embs = self.models.embed(self.model_name, kept, normalize=True, show_progress_bar=True)
         self.index = faiss.IndexFlatIP(self.dim)  # cosine via normalized vectors
         self.index.add(embs)
         self.meta = metadatas
@@ -29,7 +38,7 @@ class VectorStore:
         ipath, mpath = self._paths()
         faiss.write_index(self.index, ipath)
         with open(mpath, "wb") as f:
-            pickle.dump({"meta": self.meta, "model": self.model_name}, f)
+            pickle.dump({"meta": self.meta, "model": self.model_name, "ids": self.ids}, f)
 
     def load(self):
         ipath, mpath = self._paths()
@@ -37,6 +46,7 @@ class VectorStore:
         with open(mpath, "rb") as f:
             d = pickle.load(f)
             self.meta = d["meta"]
+            self.ids = d.get("ids") or list(range(len(self.meta)))   # indexes saved before dedup
             assert d["model"] == self.model_name
 
     def is_built(self) -> bool:
@@ -44,9 +54,12 @@ class VectorStore:
         return os.path.exists(ipath) and os.path.exists(mpath)
 
     def search(self, query: str, docs: List[str], k: int = 6) -> List[Tuple[str, Dict, float]]:
-        q = self.model.encode([query], convert_to_numpy=True, normalize_embeddings=True)
+        q = self.models.embed(self.model_name, [query], normalize=True)
         sims, idxs = self.index.search(q, k)
         out = []
         for i, score in zip(idxs[0], sims[0]):
-            out.append((docs[i], self.meta[i], float(score)))
+            if i < 0:   # fewer than k vectors in the index
+                continue
+            j = self.ids[i]
+            out.append((docs[j], self.meta[j], float(score)))
         return out